@@ -1,12 +1,19 @@
 """
 AI-Powered YouTube Search Service
-Uses Groq LLM to optimize search queries and rank YouTube results
+Uses Groq LLM to optimize search queries; results are re-ranked locally (video_ranker),
+with LLM ranking as an opt-in quality mode
 """
 import os
+import re
 import json
-import requests
-from typing import Dict, Any, List, Optional
+import time
+import asyncio
+import httpx
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 from dotenv import load_dotenv
+from cache import TTLCache, SQLiteCache
+from video_metadata import get_video_metadata
+from video_ranker import rank_videos_locally
 
 load_dotenv()
 
@@ -17,8 +24,169 @@ YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 # Groq API endpoint
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
+# Per-stage timeouts and overall budget (seconds) - a slow stage degrades, never blocks
+SEARCH_OPTIMIZE_TIMEOUT_SECONDS = float(os.getenv("SEARCH_OPTIMIZE_TIMEOUT_SECONDS", "2.5"))
+SEARCH_YOUTUBE_TIMEOUT_SECONDS = float(os.getenv("SEARCH_YOUTUBE_TIMEOUT_SECONDS", "3"))
+SEARCH_RANK_TIMEOUT_SECONDS = float(os.getenv("SEARCH_RANK_TIMEOUT_SECONDS", "3"))
+SEARCH_TOTAL_BUDGET_SECONDS = float(os.getenv("SEARCH_TOTAL_BUDGET_SECONDS", "8"))
 
-def call_groq_llm(messages: List[Dict[str, str]], response_format: Optional[Dict] = None) -> str:
+# Rank with the Groq LLM by default (true) or only when a request asks for quality mode
+SEARCH_LLM_RANKING = os.getenv("SEARCH_LLM_RANKING", "false").lower() == "true"
+
+# Shared connection pool for Groq + YouTube calls (keep-alive across searches)
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(SEARCH_TOTAL_BUDGET_SECONDS, connect=2.0),
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
+
+# Search result cache: fresh for SEARCH_CACHE_FRESH_SECONDS, then served stale (and
+# refreshed in the background) until SEARCH_CACHE_MAX_AGE_SECONDS
+SEARCH_CACHE_FRESH_SECONDS = float(os.getenv("SEARCH_CACHE_FRESH_SECONDS", "3600"))
+SEARCH_CACHE_MAX_AGE_SECONDS = float(os.getenv("SEARCH_CACHE_MAX_AGE_SECONDS", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+SEARCH_CACHE_DB_PATH = os.getenv("SEARCH_CACHE_DB_PATH", "search_cache.db")  # Empty = memory only
+
+
+async def close_search_client() -> None:
+    """Release pooled search connections (called on app shutdown)"""
+    await http_client.aclose()
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercase, punctuation-free, single spaces"""
+    return " ".join(re.sub(r"[^\w\s+#]", " ", query.lower()).split())
+
+
+class SearchCache:
+    """
+    Two-tier search result cache
+    - Memory: LRU of (payload, stored_at)
+    - Disk (optional): SQLite, survives restarts; disk hits are promoted to memory
+      (sqlite3 calls run in worker threads, never on the event loop)
+    Stale entries are served immediately while one background refresh per key runs
+    """
+
+    def __init__(self, maxsize: int, fresh_ttl: float, max_age: float, db_path: Optional[str]):
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self.memory = TTLCache(maxsize=maxsize, ttl=max_age)
+        self.disk = None
+        if db_path:
+            try:
+                self.disk = SQLiteCache(db_path, max_age=max_age, table="search_results")
+            except Exception as e:
+                print(f"⚠️ Search disk cache disabled: {e}")
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "disk_hits": 0, "refreshes": 0, "refresh_failures": 0}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def lookup(self, key: str) -> Optional[tuple]:
+        """Return (payload, age_seconds) from memory, then disk"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            payload, stored_at = entry
+            return payload, time.time() - stored_at
+
+        if self.disk is not None:
+            try:
+                found = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                print(f"⚠️ Search disk cache read failed: {e}")
+                found = None
+            if found is not None:
+                payload, age = found
+                self.counters["disk_hits"] += 1
+                self.memory.set(key, (payload, time.time() - age), ttl=self.max_age - age)
+                return payload, age
+
+        return None
+
+    async def store(self, key: str, payload: Any, degraded: bool = False) -> None:
+        """Save a result; degraded results (timeouts/fallbacks) are stored already stale"""
+        stored_at = time.time() - (self.fresh_ttl if degraded else 0)
+        self.memory.set(key, (payload, stored_at))
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, payload, stored_at)
+            except Exception as e:
+                print(f"⚠️ Search disk cache write failed: {e}")
+
+    def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], is_degraded: Callable[[Any], Optional[bool]]) -> asyncio.Task:
+        """One shared upstream fetch per key (concurrent misses/refreshes join it)"""
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+
+        async def run():
+            try:
+                payload = await fetch()
+                degraded = is_degraded(payload)
+                if degraded is not None:  # None = don't cache (errors / empty)
+                    await self.store(key, payload, degraded)
+                return payload
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        return task
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_degraded: Callable[[Any], Optional[bool]]
+    ) -> tuple:
+        """Return (payload, "hit" | "stale" | "miss")"""
+        found = await self.lookup(key)
+
+        if found is not None:
+            payload, age = found
+            if age < self.fresh_ttl:
+                self.counters["hits"] += 1
+                return payload, "hit"
+
+            # Stale-while-revalidate
+            self.counters["stale_hits"] += 1
+            if key not in self._inflight:
+                self.counters["refreshes"] += 1
+                task = self._fetch(key, fetch, is_degraded)
+                self._background.add(task)
+                task.add_done_callback(self._refresh_done)
+            return payload, "stale"
+
+        self.counters["misses"] += 1
+        return await asyncio.shield(self._fetch(key, fetch, is_degraded)), "miss"
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["refresh_failures"] += 1
+            print(f"⚠️ Background search refresh failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        served = self.counters["hits"] + self.counters["stale_hits"]
+        return {
+            **self.counters,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None,
+            "refreshing": len(self._inflight)
+        }
+
+
+search_cache = SearchCache(
+    maxsize=SEARCH_CACHE_MAX_ENTRIES,
+    fresh_ttl=SEARCH_CACHE_FRESH_SECONDS,
+    max_age=SEARCH_CACHE_MAX_AGE_SECONDS,
+    db_path=SEARCH_CACHE_DB_PATH
+)
+
+
+async def call_groq_llm(messages: List[Dict[str, str]], response_format: Optional[Dict] = None) -> str:
     """
     Call Groq LLM API with the given messages
     """
@@ -40,13 +208,13 @@ def call_groq_llm(messages: List[Dict[str, str]], response_format: Optional[Dict
     if response_format:
         payload["response_format"] = response_format
     
-    response = requests.post(GROQ_API_URL, headers=headers, json=payload)
+    response = await http_client.post(GROQ_API_URL, headers=headers, json=payload)
     response.raise_for_status()
     
     return response.json()["choices"][0]["message"]["content"]
 
 
-def optimize_search_query(user_query: str) -> Dict[str, Any]:
+async def optimize_search_query(user_query: str) -> Dict[str, Any]:
     """
     Use LLM to generate optimized YouTube search parameters
     """
@@ -68,7 +236,7 @@ Always return valid JSON."""
     ]
     
     try:
-        response = call_groq_llm(messages, {"type": "json_object"})
+        response = await call_groq_llm(messages, {"type": "json_object"})
         return json.loads(response)
     except json.JSONDecodeError:
         # Fallback if JSON parsing fails
@@ -88,9 +256,10 @@ Always return valid JSON."""
         }
 
 
-def search_youtube(query: str, duration: str = "any", max_results: int = 8) -> List[Dict[str, Any]]:
+async def search_youtube(query: str, duration: str = "any", max_results: int = 8, enrich: bool = True) -> List[Dict[str, Any]]:
     """
     Search YouTube using the Data API v3
+    enrich=False skips the durations/views lookup (for speculative searches)
     """
     if not YOUTUBE_API_KEY:
         print("⚠️ YouTube API key not configured")
@@ -123,7 +292,7 @@ def search_youtube(query: str, duration: str = "any", max_results: int = 8) -> L
         params["videoDuration"] = video_duration
     
     try:
-        response = requests.get(api_url, params=params)
+        response = await http_client.get(api_url, params=params)
         response.raise_for_status()
         data = response.json()
         
@@ -145,8 +314,8 @@ def search_youtube(query: str, duration: str = "any", max_results: int = 8) -> L
             })
         
         # Get video durations and view counts
-        if video_ids:
-            videos = enrich_video_data(videos, video_ids)
+        if video_ids and enrich:
+            videos = await enrich_video_data(videos, video_ids)
         
         return videos
         
@@ -155,43 +324,28 @@ def search_youtube(query: str, duration: str = "any", max_results: int = 8) -> L
         return []
 
 
-def enrich_video_data(videos: List[Dict], video_ids: List[str]) -> List[Dict]:
+async def enrich_video_data(videos: List[Dict], video_ids: List[str]) -> List[Dict]:
     """
     Enrich video data with duration and statistics
+    Served from the shared video metadata store; only uncached IDs hit the API
     """
     if not YOUTUBE_API_KEY or not video_ids:
         return videos
     
-    api_url = "https://www.googleapis.com/youtube/v3/videos"
-    params = {
-        "part": "contentDetails,statistics",
-        "id": ",".join(video_ids),
-        "key": YOUTUBE_API_KEY
-    }
-    
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Create lookup dict
-        video_details = {}
-        for item in data.get("items", []):
-            video_id = item["id"]
-            duration = parse_duration(item["contentDetails"]["duration"])
-            views = int(item["statistics"].get("viewCount", 0))
-            video_details[video_id] = {
-                "duration": duration,
-                "duration_text": format_duration(duration),
-                "views": views,
-                "views_text": format_views(views)
-            }
+        metadata = await get_video_metadata(video_ids, YOUTUBE_API_KEY)
         
         # Enrich videos
         for video in videos:
-            vid = video["video_id"]
-            if vid in video_details:
-                video.update(video_details[vid])
+            meta = metadata.get(video["video_id"])
+            if meta:
+                duration = parse_duration(meta["duration_iso"])
+                video.update({
+                    "duration": duration,
+                    "duration_text": format_duration(duration),
+                    "views": meta["views"],
+                    "views_text": format_views(meta["views"])
+                })
         
         return videos
         
@@ -244,7 +398,7 @@ def format_views(views: int) -> str:
         return f"{views} views"
 
 
-def rank_videos_with_ai(videos: List[Dict], user_query: str, search_type: str) -> List[Dict]:
+async def rank_videos_with_ai(videos: List[Dict], user_query: str, search_type: str) -> List[Dict]:
     """
     Use AI to re-rank videos based on relevance to user intent
     """
@@ -272,7 +426,7 @@ Only return the JSON, nothing else."""
     ]
     
     try:
-        response = call_groq_llm(messages, {"type": "json_object"})
+        response = await call_groq_llm(messages, {"type": "json_object"})
         ranking = json.loads(response)
         
         indices = ranking.get("ranked_indices", list(range(len(videos))))
@@ -288,18 +442,66 @@ Only return the JSON, nothing else."""
         return [videos[i] for i in valid_indices]
         
     except Exception as e:
-        print(f"Error ranking videos: {e}")
-        return videos
+        # Caller keeps the local order
+        raise ValueError(f"Failed to rank videos: {str(e)}")
 
 
-async def ai_youtube_search(user_query: str, max_results: int = 8) -> Dict[str, Any]:
+async def run_stage(coro, timeout: float, stage: str, default: Any) -> Any:
+    """
+    Await a pipeline stage within its timeout
+    Returns `default` (and logs) if the stage times out or fails
     """
-    Main AI-enhanced YouTube search function
+    if timeout <= 0:
+        if asyncio.iscoroutine(coro):
+            coro.close()
+        else:
+            coro.cancel()
+        print(f"⏱️ Search stage '{stage}' skipped: budget exhausted")
+        return default
     
-    1. Uses LLM to optimize the search query
-    2. Searches YouTube with optimized parameters
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Search stage '{stage}' timed out after {timeout:.1f}s")
+        return default
+    except Exception as e:
+        print(f"❌ Search stage '{stage}' failed: {e}")
+        return default
+
+
+async def ai_youtube_search(user_query: str, max_results: int = 8, llm_rank: bool = SEARCH_LLM_RANKING) -> Dict[str, Any]:
+    """
+    Cached AI-enhanced YouTube search (see SearchCache)
+    Adds "cache": "hit" | "stale" | "miss" to the result
+    """
+    if not user_query or len(user_query.strip()) < 2:
+        return {"videos": [], "optimized_query": "", "error": "Query too short"}
+    
+    def is_degraded(result: Dict[str, Any]) -> Optional[bool]:
+        if result.get("error") or not result.get("videos"):
+            return None
+        llm_missing = llm_rank and result.get("ranker") != "llm" and result["total"] > 2
+        return result.get("fallback", False) or llm_missing
+    
+    key = f"ai:{'llm' if llm_rank else 'local'}:{max_results}:{normalize_query(user_query)}"
+    result, status = await search_cache.get_or_fetch(
+        key,
+        lambda: run_ai_youtube_search(user_query, max_results, llm_rank),
+        is_degraded
+    )
+    return {**result, "cache": status}
+
+
+async def run_ai_youtube_search(user_query: str, max_results: int = 8, llm_rank: bool = SEARCH_LLM_RANKING) -> Dict[str, Any]:
+    """
+    Main AI-enhanced YouTube search function (uncached)
+    
+    1. Starts LLM query optimization and a raw-query YouTube search concurrently
+    2. Searches YouTube with optimized parameters (raw results are the fallback)
     3. Enriches results with duration/views
-    4. Re-ranks results using AI for educational relevance
+    4. Re-ranks results locally for educational relevance; with llm_rank the LLM
+       ordering replaces it when it arrives within budget
+    Every stage has its own timeout inside SEARCH_TOTAL_BUDGET_SECONDS
     """
     if not user_query or len(user_query.strip()) < 2:
         return {"videos": [], "optimized_query": "", "error": "Query too short"}
@@ -311,45 +513,92 @@ async def ai_youtube_search(user_query: str, max_results: int = 8) -> Dict[str,
     if not YOUTUBE_API_KEY:
         return {"videos": [], "optimized_query": user_query, "error": "YouTube API not configured"}
     
-    try:
-        # Step 1: Optimize search query with AI
-        search_params = optimize_search_query(user_query)
-        optimized_query = search_params.get("optimized_query", user_query)
-        duration = search_params.get("duration", "any")
-        search_type = search_params.get("search_type", "educational")
-        
-        # Step 2: Search YouTube
-        videos = search_youtube(optimized_query, duration, max_results)
-        
-        if not videos:
-            # Try with original query if optimized query returns nothing
-            videos = search_youtube(user_query, "any", max_results)
-        
-        # Step 3: Re-rank with AI (only if we have results)
-        if videos and len(videos) > 2:
-            videos = rank_videos_with_ai(videos, user_query, search_type)
-        
-        return {
-            "videos": videos,
-            "optimized_query": optimized_query,
-            "search_type": search_type,
-            "total": len(videos)
-        }
-        
-    except Exception as e:
-        print(f"❌ AI YouTube search error: {e}")
-        # Fallback to basic YouTube search
-        try:
-            videos = search_youtube(user_query, "any", max_results)
-            return {
-                "videos": videos,
-                "optimized_query": user_query,
-                "search_type": "general",
-                "total": len(videos),
-                "fallback": True
-            }
-        except:
-            return {"videos": [], "optimized_query": user_query, "error": str(e)}
+    started = time.monotonic()
+    deadline = started + SEARCH_TOTAL_BUDGET_SECONDS
+    timings = {}
+    
+    def remaining(stage_timeout: float) -> float:
+        return min(stage_timeout, deadline - time.monotonic())
+    
+    def mark(stage: str) -> None:
+        timings[stage] = round((time.monotonic() - started) * 1000)
+    
+    default_params = {
+        "optimized_query": user_query,
+        "duration": "any",
+        "search_type": "educational",
+        "keywords": []
+    }
+    
+    # Step 1: Optimize with AI while the raw query is already searching (hedge)
+    raw_search = asyncio.create_task(search_youtube(user_query, "any", max_results, enrich=False))
+    search_params = await run_stage(
+        optimize_search_query(user_query),
+        remaining(SEARCH_OPTIMIZE_TIMEOUT_SECONDS),
+        "optimize",
+        default_params
+    )
+    mark("optimize")
+    
+    optimized_query = search_params.get("optimized_query") or user_query
+    duration = search_params.get("duration", "any")
+    search_type = search_params.get("search_type", "educational")
+    keywords = search_params.get("keywords") or []
+    
+    # Step 2: Search YouTube with the optimized query (unless it adds nothing)
+    videos = []
+    fallback = False
+    if optimized_query.strip().lower() != user_query.strip().lower() or duration != "any":
+        videos = await run_stage(
+            search_youtube(optimized_query, duration, max_results),
+            remaining(SEARCH_YOUTUBE_TIMEOUT_SECONDS),
+            "search",
+            []
+        )
+    
+    if videos:
+        raw_search.cancel()
+    else:
+        # Use the raw-query results (usually already finished by now)
+        fallback = optimized_query != user_query
+        videos = await run_stage(raw_search, remaining(SEARCH_YOUTUBE_TIMEOUT_SECONDS), "raw_search", [])
+        if videos:
+            videos = await run_stage(
+                enrich_video_data(videos, [v["video_id"] for v in videos]),
+                remaining(SEARCH_YOUTUBE_TIMEOUT_SECONDS),
+                "enrich",
+                videos
+            )
+    mark("search")
+    
+    # Step 3: Re-rank locally; in quality mode the LLM ordering wins if it arrives in time
+    ranker = None
+    if videos and len(videos) > 2:
+        videos, ranker = rank_videos_locally(videos, user_query, search_type, keywords), "local"
+        if llm_rank:
+            reranked = await run_stage(
+                rank_videos_with_ai(videos, user_query, search_type),
+                remaining(SEARCH_RANK_TIMEOUT_SECONDS),
+                "rank",
+                None
+            )
+            if reranked is not None:
+                videos, ranker = reranked, "llm"
+        mark("rank")
+    
+    result = {
+        "videos": videos,
+        "optimized_query": optimized_query,
+        "search_type": search_type,
+        "total": len(videos),
+        "ranked": ranker is not None,
+        "ranker": ranker,
+        "timings_ms": timings
+    }
+    if fallback:
+        result["fallback"] = True
+    
+    return result
 
 
 # Quick search without AI ranking (faster for real-time suggestions)
@@ -363,4 +612,10 @@ async def quick_youtube_search(query: str, max_results: int = 5) -> List[Dict]:
     if not YOUTUBE_API_KEY:
         return []
     
-    return search_youtube(query, "any", max_results)
+    key = f"quick:{max_results}:{normalize_query(query)}"
+    videos, _ = await search_cache.get_or_fetch(
+        key,
+        lambda: search_youtube(query, "any", max_results),
+        lambda result: False if result else None
+    )
+    return videos
@@ -2,15 +2,22 @@
 Analytics Service - Provides user statistics and activity data
 Calculates watch streaks, domain analytics, and session history
 """
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Set
+from cache import TTLCache
 from database import supabase
+from streak_tracker import StreakState, valid_timezone
+from wallet_service import WalletService
 from collections import defaultdict
 
 
 # Mock data for test user (development only)
 TEST_USER_ID = "test-admin-001"
 
+# user_id -> timezone last written to user_streaks (skips the write on every session start)
+_stored_timezones = TTLCache(maxsize=10000, ttl=3600)
+
 
 class AnalyticsService:
     """Manages user analytics and statistics"""
@@ -32,16 +39,13 @@ class AnalyticsService:
             }
         
         try:
-            # Fetch all completed sessions for the user
-            sessions_response = supabase.table("sessions")\
-                .select("*, courses(category, title)")\
-                .eq("student_id", user_id)\
-                .eq("status", "completed")\
-                .execute()
-            
-            sessions = sessions_response.data or []
+            # One rollup row per active day (see migrations/005) + O(1) streak row
+            activity, streak_data = await asyncio.gather(
+                AnalyticsService.get_daily_activity(user_id),
+                AnalyticsService.get_streak(user_id)
+            )
             
-            if not sessions:
+            if not activity:
                 return {
                     "total_hours_watched": 0,
                     "total_videos_watched": 0,
@@ -51,20 +55,16 @@ class AnalyticsService:
                 }
             
             # Calculate total watch time (sum of duration_seconds)
-            total_seconds = sum(s.get("duration_seconds", 0) for s in sessions)
+            total_seconds = sum(day.get("seconds_watched", 0) for day in activity)
             total_hours = round(total_seconds / 3600, 1)
             
-            # Count unique videos/courses
-            total_videos = len(sessions)
-            
-            # Calculate watch streak
-            streak_data = await AnalyticsService.calculate_streak(sessions)
+            # Count completed sessions
+            total_videos = sum(day.get("sessions_completed", 0) for day in activity)
             
             # Count active domains (unique categories)
             unique_domains = set()
-            for session in sessions:
-                if session.get("courses") and session["courses"].get("category"):
-                    unique_domains.add(session["courses"]["category"])
+            for day in activity:
+                unique_domains.update((day.get("category_seconds") or {}).keys())
             
             return {
                 "total_hours_watched": total_hours,
@@ -77,11 +77,91 @@ class AnalyticsService:
         except Exception as e:
             raise ValueError(f"Failed to get user analytics: {str(e)}")
     
+    @staticmethod
+    async def get_daily_activity(user_id: str, since: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch the student's daily activity rollup (optionally only days >= since)
+        Rows: activity_date, seconds_watched, sessions_completed, category_seconds
+        """
+        query = supabase.table("student_daily_activity")\
+            .select("activity_date, seconds_watched, sessions_completed, category_seconds")\
+            .eq("student_id", user_id)\
+            .order("activity_date", desc=True)
+        
+        if since:
+            query = query.gte("activity_date", since.isoformat())
+        
+        result = await query.execute()
+        
+        return result.data or []
+    
+    @staticmethod
+    async def get_streak_state(user_id: str) -> StreakState:
+        """
+        Read incrementally maintained streak state (see migrations/006)
+        Its timezone is also the day boundary of student_daily_activity
+        """
+        result = await supabase.table("user_streaks")\
+            .select("current_streak, longest_streak, last_active_date, timezone")\
+            .eq("user_id", user_id)\
+            .limit(1)\
+            .execute()
+        
+        return StreakState.from_row(result.data[0] if result.data else None)
+    
+    @staticmethod
+    async def get_streak(user_id: str) -> Dict[str, int]:
+        """
+        Current and longest streak
+        Current streak resets to 0 once the last active day is older than yesterday
+        """
+        return (await AnalyticsService.get_streak_state(user_id)).to_dict()
+    
+    @staticmethod
+    async def set_timezone(user_id: str, timezone_name: Optional[str]) -> Optional[str]:
+        """
+        Store the user's IANA timezone (sent by the browser) for streak and daily activity day boundaries
+        Invalid names are ignored; best-effort so starting a session never fails on it
+        """
+        tz_name = valid_timezone(timezone_name)
+        if not tz_name or not WalletService.is_valid_uuid(user_id) or _stored_timezones.get(user_id) == tz_name:
+            return tz_name
+        
+        try:
+            await supabase.table("user_streaks")\
+                .upsert({"user_id": user_id, "timezone": tz_name}, on_conflict="user_id")\
+                .execute()
+            _stored_timezones.set(user_id, tz_name)
+        except Exception as e:
+            print(f"⚠️ Failed to store timezone for {user_id}: {str(e)}")
+        return tz_name
+    
+    @staticmethod
+    def activity_dates(activity: List[Dict[str, Any]]) -> Set[date]:
+        """Parse rollup activity_date values into a set of dates"""
+        return {date.fromisoformat(day["activity_date"]) for day in activity}
+    
+    @staticmethod
+    async def backfill_daily_activity() -> int:
+        """
+        Rebuild the daily activity rollup from all completed sessions
+        New sessions are folded in by settle_session itself (migrations/009)
+        """
+        result = await supabase.rpc("backfill_student_daily_activity", {}).execute()
+        return result.data or 0
+    
+    @staticmethod
+    async def backfill_streaks() -> int:
+        """Recompute user_streaks from all completed sessions"""
+        result = await supabase.rpc("backfill_user_streaks", {}).execute()
+        return result.data or 0
+    
     @staticmethod
     async def calculate_streak(sessions: List[Dict[str, Any]]) -> Dict[str, int]:
         """
         Calculate current and longest watch streak from sessions
         A streak is consecutive days with at least one completed session
+        Full-history recomputation - kept as the verification path for user_streaks
         """
         if not sessions:
             return {"current_streak": 0, "longest_streak": 0}
@@ -94,6 +174,13 @@ class AnalyticsService:
                 date_obj = datetime.fromisoformat(session["end_time"].replace('Z', '+00:00'))
                 watch_dates.add(date_obj.date())
         
+        return AnalyticsService.calculate_streak_from_dates(watch_dates)
+    
+    @staticmethod
+    def calculate_streak_from_dates(watch_dates: Set[date]) -> Dict[str, int]:
+        """
+        Calculate current and longest streak from a set of active days
+        """
         if not watch_dates:
             return {"current_streak": 0, "longest_streak": 0}
         
@@ -161,37 +248,19 @@ class AnalyticsService:
             }
         
         try:
-            # Fetch sessions from last N days
-            start_date = datetime.utcnow() - timedelta(days=days - 1)
-            
-            sessions_response = supabase.table("sessions")\
-                .select("end_time")\
-                .eq("student_id", user_id)\
-                .eq("status", "completed")\
-                .gte("end_time", start_date.isoformat())\
-                .execute()
-            
-            sessions = sessions_response.data or []
-            
-            # Extract watched dates
-            watched_dates = set()
-            for session in sessions:
-                if session.get("end_time"):
-                    date_obj = datetime.fromisoformat(session["end_time"].replace('Z', '+00:00'))
-                    watched_dates.add(date_obj.date())
-            
-            # Calculate streak
-            all_sessions = supabase.table("sessions")\
-                .select("end_time")\
-                .eq("student_id", user_id)\
-                .eq("status", "completed")\
-                .execute()
-            
-            streak_info = await AnalyticsService.calculate_streak(all_sessions.data or [])
+            # Only the calendar window is read; the streak comes from user_streaks.
+            # Rollup days are in the student's timezone, which is at most a day ahead of UTC
+            start_date = datetime.utcnow().date() - timedelta(days=days)
+            activity, streak = await asyncio.gather(
+                AnalyticsService.get_daily_activity(user_id, since=start_date),
+                AnalyticsService.get_streak_state(user_id)
+            )
+            watched_dates = AnalyticsService.activity_dates(activity)
+            streak_info = streak.to_dict()
             
             # Build calendar array
             calendar_days = []
-            today = datetime.utcnow().date()
+            today = streak.today()
             
             for i in range(days - 1, -1, -1):
                 date = today - timedelta(days=i)
@@ -238,16 +307,12 @@ class AnalyticsService:
             }
         
         try:
-            # Fetch completed sessions with course data
-            sessions_response = supabase.table("sessions")\
-                .select("duration_seconds, end_time, courses(category, title)")\
-                .eq("student_id", user_id)\
-                .eq("status", "completed")\
-                .execute()
-            
-            sessions = sessions_response.data or []
+            activity, streak = await asyncio.gather(
+                AnalyticsService.get_daily_activity(user_id),
+                AnalyticsService.get_streak_state(user_id)
+            )
             
-            if not sessions:
+            if not activity:
                 return {
                     "domains": [],
                     "weekly_data": []
@@ -255,11 +320,9 @@ class AnalyticsService:
             
             # Calculate domain-wise hours
             domain_hours = defaultdict(float)
-            for session in sessions:
-                if session.get("courses") and session["courses"].get("category"):
-                    category = session["courses"]["category"]
-                    hours = session.get("duration_seconds", 0) / 3600
-                    domain_hours[category] += hours
+            for day in activity:
+                for category, seconds in (day.get("category_seconds") or {}).items():
+                    domain_hours[category] += seconds / 3600
             
             domains = [
                 {
@@ -273,18 +336,15 @@ class AnalyticsService:
             # Calculate weekly data (last 7 days)
             weekly_hours = defaultdict(float)
             days_of_week = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-            today = datetime.utcnow().date()
+            today = streak.today()  # Rollup days are in the student's timezone
             
-            for session in sessions:
-                if session.get("end_time"):
-                    date_obj = datetime.fromisoformat(session["end_time"].replace('Z', '+00:00'))
-                    session_date = date_obj.date()
-                    
-                    # Only include last 7 days
-                    if (today - session_date).days < 7:
-                        day_name = days_of_week[session_date.weekday()]
-                        hours = session.get("duration_seconds", 0) / 3600
-                        weekly_hours[day_name] += hours
+            for day in activity:
+                session_date = date.fromisoformat(day["activity_date"])
+                
+                # Only include last 7 days
+                if (today - session_date).days < 7:
+                    day_name = days_of_week[session_date.weekday()]
+                    weekly_hours[day_name] += day.get("seconds_watched", 0) / 3600
             
             # Build weekly array (always 7 days)
             weekly_data = [
@@ -379,7 +439,7 @@ class AnalyticsService:
         
         try:
             # Fetch sessions with course information
-            sessions_response = supabase.table("sessions")\
+            sessions_response = await supabase.table("sessions")\
                 .select("*, courses(id, title, category, total_duration_minutes)")\
                 .eq("student_id", user_id)\
                 .order("created_at", desc=True)\
@@ -5,8 +5,10 @@ Handles user registration, login, OAuth, and session management
 import os
 from typing import Dict, Any, Optional
 from datetime import datetime
+import jwt
 from supabase import Client
 from database import supabase
+from token_verifier import KeyUnavailable, verify_locally, remember
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,7 +30,7 @@ class AuthService:
         """
         try:
             # Create auth user in Supabase Auth
-            auth_response = supabase.auth.sign_up({
+            auth_response = await supabase.auth.sign_up({
                 "email": email,
                 "password": password,
                 "options": {
@@ -53,7 +55,7 @@ class AuthService:
                 "is_active": True
             }
             
-            supabase.table("users").insert(user_data).execute()
+            await supabase.table("users").insert(user_data).execute()
             
             # If teacher, create teacher profile
             if role == "teacher":
@@ -63,7 +65,7 @@ class AuthService:
                     "expertise_areas": [],
                     "is_verified": False
                 }
-                supabase.table("teachers").insert(teacher_data).execute()
+                await supabase.table("teachers").insert(teacher_data).execute()
             
             return {
                 "user": {
@@ -114,7 +116,7 @@ class AuthService:
                 }
             
             # Authenticate with Supabase
-            auth_response = supabase.auth.sign_in_with_password({
+            auth_response = await supabase.auth.sign_in_with_password({
                 "email": email,
                 "password": password
             })
@@ -123,7 +125,7 @@ class AuthService:
                 raise ValueError("Invalid email or password")
             
             # Get user profile from database
-            user_profile = supabase.table("users")\
+            user_profile = await supabase.table("users")\
                 .select("*")\
                 .eq("id", auth_response.user.id)\
                 .single()\
@@ -154,7 +156,7 @@ class AuthService:
         """
         try:
             # Exchange Google token for Supabase session
-            auth_response = supabase.auth.sign_in_with_id_token({
+            auth_response = await supabase.auth.sign_in_with_id_token({
                 "provider": "google",
                 "token": google_token
             })
@@ -167,7 +169,7 @@ class AuthService:
             name = auth_response.user.user_metadata.get("full_name", email.split("@")[0])
             
             # Check if user profile exists
-            existing_user = supabase.table("users")\
+            existing_user = await supabase.table("users")\
                 .select("*")\
                 .eq("id", user_id)\
                 .execute()
@@ -183,7 +185,7 @@ class AuthService:
                     "is_active": True
                 }
                 
-                supabase.table("users").insert(user_data).execute()
+                await supabase.table("users").insert(user_data).execute()
                 
                 user_profile = user_data
             else:
@@ -224,7 +226,7 @@ class AuthService:
                 }
             
             # Get full user profile
-            user_profile = supabase.table("users")\
+            user_profile = await supabase.table("users")\
                 .select("*")\
                 .eq("id", user_id)\
                 .single()\
@@ -245,7 +247,7 @@ class AuthService:
         """
         try:
             # Sign out from Supabase
-            supabase.auth.sign_out()
+            await supabase.auth.sign_out()
             
             return {"message": "Logout successful"}
             
@@ -257,15 +259,24 @@ class AuthService:
         """
         Verify JWT token and return user_id if valid
         Used for middleware authentication
+        Verified locally (cached signing key + token LRU); the auth server is only
+        asked when the local key can't decide, e.g. right after a key rotation
         """
         try:
             # Handle test token for development
             if access_token == "test-token-admin":
                 return "test-admin-001"
             
-            user_response = supabase.auth.get_user(access_token)
+            try:
+                return await verify_locally(access_token)
+            except KeyUnavailable:
+                pass
+            
+            user_response = await supabase.auth.get_user(access_token)
             
             if user_response.user:
+                claims = jwt.decode(access_token, options={"verify_signature": False})
+                remember(access_token, user_response.user.id, claims.get("exp"))
                 return user_response.user.id
             
             return None
@@ -284,14 +295,14 @@ class AuthService:
                 raise ValueError("Invalid role. Must be 'student' or 'teacher'")
             
             # Update user role
-            supabase.table("users")\
+            await supabase.table("users")\
                 .update({"role": new_role})\
                 .eq("id", user_id)\
                 .execute()
             
             # If upgrading to teacher, create teacher profile
             if new_role == "teacher":
-                existing_teacher = supabase.table("teachers")\
+                existing_teacher = await supabase.table("teachers")\
                     .select("id")\
                     .eq("user_id", user_id)\
                     .execute()
@@ -303,7 +314,7 @@ class AuthService:
                         "expertise_areas": [],
                         "is_verified": False
                     }
-                    supabase.table("teachers").insert(teacher_data).execute()
+                    await supabase.table("teachers").insert(teacher_data).execute()
             
             return {"message": f"Role updated to {new_role}"}
             
@@ -0,0 +1,144 @@
+"""
+In-process caching utilities
+Size-bounded LRU cache with per-entry TTL, shared by hot read paths,
+plus a small SQLite-backed tier for entries that should survive restarts
+"""
+import time
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU cache with expiry
+    - Entries expire `ttl` seconds after being set
+    - Least recently used entries are evicted once `maxsize` is reached
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value or default if missing/expired"""
+        entry = self._data.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Drop a single entry if present"""
+        self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate, returns count removed"""
+        stale = [key for key in self._data if predicate(key)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class SQLiteCache:
+    """
+    Persistent key -> JSON value store with write timestamps
+    Callers decide freshness from the returned age; entries older than
+    `max_age` are treated as missing and purged opportunistically
+    """
+
+    def __init__(self, path: str, max_age: float, table: str = "cache_entries"):
+        self.path = path
+        self.max_age = max_age
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, age_seconds) or None if missing/too old"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        age = time.time() - row[1]
+        if age >= self.max_age:
+            return None
+        return json.loads(row[0]), age
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        """Upsert value (stored_at defaults to now)"""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time() if stored_at is None else stored_at)
+            )
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE stored_at < ?", (time.time() - self.max_age,)
+                )
+
+    def delete(self, key: str) -> None:
+        """Drop a single entry if present"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,134 @@
+"""
+Course Service - Public course catalog reads
+Caches already-shaped course payloads (with ETags) since the catalog rarely changes
+"""
+import os
+import json
+import hashlib
+from typing import Dict, Any, Optional, Tuple
+from database import supabase
+from cache import TTLCache
+from typeahead import schedule_course_refresh
+
+
+# Catalog cache configuration
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512"))
+
+# Keys: ("list", category, limit) or ("course", course_id) -> (payload, etag)
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_MAX_ENTRIES, ttl=CATALOG_CACHE_TTL_SECONDS)
+
+COURSE_SELECT = "*, teachers!inner(id, user_id, bio, is_verified, users!inner(name, email))"
+
+
+def compute_etag(payload: Any) -> str:
+    """Stable strong ETag for a JSON payload"""
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def format_course(course: Dict[str, Any], detailed: bool = False) -> Dict[str, Any]:
+    """Shape a courses row (with joined teacher/user) into the API payload"""
+    teacher_info = course.get("teachers", {})
+    user_info = teacher_info.get("users", {})
+    content = course.get("content_structure", {})
+
+    instructor = {
+        "id": teacher_info.get("id"),
+        "name": user_info.get("name", "Unknown Instructor"),
+        "is_verified": teacher_info.get("is_verified", False)
+    }
+
+    payload = {
+        "id": course["id"],
+        "title": course["title"],
+        "description": course["description"],
+        "category": course["category"],
+        "price_per_minute": float(course["price_per_minute"]),
+        "total_duration_minutes": course["total_duration_minutes"],
+        "video_id": content.get("video_id"),
+        "video_url": content.get("video_url"),
+        "lectures": content.get("lectures", []),
+        "instructor": instructor,
+        "thumbnail": f"https://img.youtube.com/vi/{content.get('video_id', '')}/mqdefault.jpg",
+        "created_at": course["created_at"]
+    }
+
+    if detailed:
+        instructor["bio"] = teacher_info.get("bio")
+        payload["is_active"] = course["is_active"]
+
+    return payload
+
+
+class CourseService:
+    """Cached reads for the public course catalog"""
+
+    @staticmethod
+    async def get_courses(category: Optional[str] = None, limit: int = 20) -> Tuple[Dict[str, Any], str]:
+        """
+        Get active courses, optionally filtered by category
+        Returns (payload, etag); served from cache when fresh
+        """
+        key = ("list", (category or "").strip().lower(), limit)
+        cached = catalog_cache.get(key)
+        if cached is not None:
+            return cached
+
+        query = supabase.table("courses")\
+            .select(COURSE_SELECT)\
+            .eq("is_active", True)\
+            .limit(limit)
+
+        if category:
+            query = query.ilike("category", f"%{category}%")
+
+        result = await query.execute()
+
+        courses = [format_course(course) for course in result.data or []]
+        payload = {"courses": courses, "total": len(courses)}
+
+        entry = (payload, compute_etag(payload))
+        catalog_cache.set(key, entry)
+        return entry
+
+    @staticmethod
+    async def get_course(course_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Get single course with full details
+        Returns (payload, etag) or None if the course doesn't exist
+        """
+        key = ("course", course_id)
+        cached = catalog_cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = await supabase.table("courses")\
+            .select(COURSE_SELECT)\
+            .eq("id", course_id)\
+            .limit(1)\
+            .execute()
+
+        if not result.data:
+            return None
+
+        payload = format_course(result.data[0], detailed=True)
+
+        entry = (payload, compute_etag(payload))
+        catalog_cache.set(key, entry)
+        return entry
+
+    @staticmethod
+    def invalidate_course(course_id: Optional[str] = None) -> None:
+        """
+        Invalidation hook - call whenever a course is edited or re-rated
+        Drops the course detail entry and every list page (any list may contain it)
+        and re-indexes the course for typeahead
+        """
+        if course_id is None:
+            catalog_cache.clear()
+            return
+
+        catalog_cache.delete(("course", course_id))
+        catalog_cache.delete_where(lambda key: key[0] == "list")
+        schedule_course_refresh(course_id)
@@ -1,8 +1,10 @@
 """
 Supabase database client initialization
+Async client so PostgREST/Auth round trips never block the uvicorn event loop
 """
 import os
-from supabase import create_client, Client
+import httpx
+from supabase import AsyncClient, AsyncClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,5 +16,30 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables")
 
+# Connection pool + per-call timeouts (override via env for tuning under load)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "50"))
+DB_TIMEOUT_SECONDS = float(os.getenv("DB_TIMEOUT_SECONDS", "10"))
+DB_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+
+# Shared pooled HTTP client - reused by PostgREST and Auth calls
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(DB_TIMEOUT_SECONDS, connect=DB_CONNECT_TIMEOUT_SECONDS),
+    limits=httpx.Limits(
+        max_connections=DB_POOL_SIZE,
+        max_keepalive_connections=DB_POOL_SIZE
+    ),
+    follow_redirects=True
+)
+
 # Service client has full access bypassing RLS policies
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Every query must be awaited: `await supabase.table(...).select(...).execute()`
+supabase: AsyncClient = AsyncClient(
+    SUPABASE_URL,
+    SUPABASE_SERVICE_KEY,
+    AsyncClientOptions(httpx_client=http_client)
+)
+
+
+async def close_database() -> None:
+    """Release pooled HTTP connections (called on app shutdown)"""
+    await http_client.aclose()
@@ -0,0 +1,307 @@
+"""
+Drop-off Monitor - Live drop-off risk for every session that is currently playing
+Heartbeats (HTTP metrics endpoint and the metering WebSocket, both through MetricsService)
+update rolling per-session features in preallocated numpy columns. Every DROPOFF_TICK_SECONDS
+the monitor scores the active sessions with one vectorized call to the dropoff_risk model
+and keeps the scores in memory; teachers poll the at-risk ones for their own courses.
+
+Each tick has a fixed CPU budget (DROPOFF_TICK_BUDGET_MS). The cost per row is measured
+every tick; when more sessions are active than fit, the ones scored longest ago go first
+and the rest wait for the next tick.
+"""
+import os
+import time
+import asyncio
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import supabase
+from wallet_service import WalletService
+import ml_inference
+
+
+DROPOFF_MODEL = "dropoff_risk"
+DROPOFF_TICK_SECONDS = float(os.getenv("DROPOFF_TICK_SECONDS", "10"))
+DROPOFF_TICK_BUDGET_MS = float(os.getenv("DROPOFF_TICK_BUDGET_MS", "250"))
+DROPOFF_RISK_THRESHOLD = float(os.getenv("DROPOFF_RISK_THRESHOLD", "0.6"))
+# Sessions without a heartbeat for this long are no longer active and are forgotten
+DROPOFF_IDLE_SECONDS = float(os.getenv("DROPOFF_IDLE_SECONDS", "120"))
+# Weight of the newest heartbeat in the rolling progress rate
+DROPOFF_RATE_ALPHA = 0.3
+# Rows scored on the first tick, before the per-row cost is known
+DROPOFF_CALIBRATION_ROWS = 1000
+# Session ids per sessions-table lookup (kept short enough for the query string)
+DROPOFF_LOOKUP_BATCH = 200
+
+# Per-session numeric state, one preallocated float64 column each
+COLUMNS = [
+    "watch_time_sec",        # Latest (monotonic) watched duration
+    "completion_pct",        # Latest completion percentage
+    "progress_rate",         # Rolling completion points gained per watched minute
+    "video_length_sec",      # Course length once looked up, 0 until then
+    "device_encoded",
+    "hour_of_day",           # Session start (first heartbeat until looked up)
+    "day_of_week",
+    "heartbeats",
+    "last_heartbeat",        # time.monotonic() of the latest heartbeat
+    "last_progress",         # time.monotonic() when duration or completion last moved
+    "scored_at",             # time.monotonic() of the latest score, 0 = never
+    "risk",
+]
+
+
+class DropoffMonitor:
+    """Rolling features for active sessions (slot per session) and their latest scores"""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity) for name in COLUMNS}
+        self.in_use = np.zeros(capacity, dtype=bool)
+        self.generation = np.zeros(capacity, dtype=np.int64)  # Bumped whenever a slot is reused
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = list(range(capacity - 1, -1, -1))
+        # Per-slot Python values: session id, student, current lecture and the sessions-row lookup
+        self.session_ids: List[Optional[str]] = [None] * capacity
+        self.info: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.unresolved: Dict[str, int] = {}
+        self.ms_per_row: Optional[float] = None
+        self.counters = {"ticks": 0, "scored": 0, "deferred": 0, "evicted": 0, "last_tick_ms": 0.0}
+
+    def _grow(self) -> None:
+        extra = self.capacity
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate([column, np.zeros(extra)])
+        self.in_use = np.concatenate([self.in_use, np.zeros(extra, dtype=bool)])
+        self.generation = np.concatenate([self.generation, np.zeros(extra, dtype=np.int64)])
+        self.session_ids.extend([None] * extra)
+        self.info.extend([None] * extra)
+        self.free.extend(range(self.capacity + extra - 1, self.capacity - 1, -1))
+        self.capacity += extra
+
+    def observe(
+        self,
+        session_id: str,
+        user_id: str,
+        duration_seconds: int,
+        completion_pct: float,
+        current_lecture: Optional[int] = None
+    ) -> None:
+        """Fold one heartbeat into the session's rolling features (O(1), no I/O)"""
+        now = time.monotonic()
+        c = self.columns
+        slot = self.slots.get(session_id)
+
+        if slot is None:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.slots[session_id] = slot
+            self.in_use[slot] = True
+            self.generation[slot] += 1
+            self.session_ids[slot] = session_id
+            self.info[slot] = {"student_id": user_id, "current_lecture": current_lecture, "teacher_id": None}
+            started = datetime.utcnow()
+            for name in COLUMNS:
+                c[name][slot] = 0.0
+            c["hour_of_day"][slot] = started.hour
+            c["day_of_week"][slot] = started.weekday()
+            c["watch_time_sec"][slot] = duration_seconds
+            c["completion_pct"][slot] = completion_pct
+            c["last_progress"][slot] = now
+            if WalletService.is_valid_uuid(session_id):
+                self.unresolved[session_id] = slot
+        else:
+            watched = duration_seconds - c["watch_time_sec"][slot]
+            gained = completion_pct - c["completion_pct"][slot]
+            if watched > 0:
+                rate = gained / watched * 60
+                previous = c["progress_rate"][slot]
+                c["progress_rate"][slot] = rate if c["heartbeats"][slot] <= 1 else \
+                    DROPOFF_RATE_ALPHA * rate + (1 - DROPOFF_RATE_ALPHA) * previous
+                c["watch_time_sec"][slot] = duration_seconds
+            if watched > 0 or gained > 0:
+                c["last_progress"][slot] = now
+            c["completion_pct"][slot] = completion_pct
+            if current_lecture is not None:
+                self.info[slot]["current_lecture"] = current_lecture
+
+        c["heartbeats"][slot] += 1
+        c["last_heartbeat"][slot] = now
+
+    def forget(self, session_id: str) -> None:
+        """Stop tracking a session (settled, or idle too long)"""
+        slot = self.slots.pop(session_id, None)
+        if slot is None:
+            return
+        self.in_use[slot] = False
+        self.session_ids[slot] = None
+        self.info[slot] = None
+        self.unresolved.pop(session_id, None)
+        self.free.append(slot)
+
+    async def resolve_sessions(self) -> int:
+        """Course length, device, start time and teacher for sessions seen since the last lookup"""
+        pending = list(self.unresolved.items())
+        resolved = 0
+        for start in range(0, len(pending), DROPOFF_LOOKUP_BATCH):
+            chunk = dict(pending[start:start + DROPOFF_LOOKUP_BATCH])
+            try:
+                result = await supabase.table("sessions")\
+                    .select("id, teacher_id, course_id, start_time, created_at, content_progress, "
+                            "courses(total_duration_minutes)")\
+                    .in_("id", list(chunk))\
+                    .execute()
+            except Exception as e:
+                print(f"⚠️ Drop-off session lookup failed for {len(chunk)} session(s): {str(e)}")
+                continue
+
+            rows = {row["id"]: row for row in result.data or []}
+            for session_id, slot in chunk.items():
+                self.unresolved.pop(session_id, None)
+                row = rows.get(session_id)
+                if row is None or self.slots.get(session_id) != slot:
+                    continue  # Not in the sessions table (yet), or already forgotten
+                features = ml_inference.session_to_row(row)
+                c = self.columns
+                c["video_length_sec"][slot] = features["video_length_sec"]
+                c["device_encoded"][slot] = ml_inference.encode_device([features["device"]])[0]
+                c["hour_of_day"][slot] = features["hour_of_day"]
+                c["day_of_week"][slot] = features["day_of_week"]
+                self.info[slot]["teacher_id"] = row.get("teacher_id")
+                self.info[slot]["course_id"] = row.get("course_id")
+                resolved += 1
+        return resolved
+
+    def evict_idle(self, now: float) -> int:
+        idle = np.flatnonzero(self.in_use & (now - self.columns["last_heartbeat"] > DROPOFF_IDLE_SECONDS))
+        for slot in idle:
+            self.forget(self.session_ids[slot])
+        self.counters["evicted"] += len(idle)
+        return len(idle)
+
+    def pick_slots(self) -> np.ndarray:
+        """Active slots to score this tick: all of them, or the least recently scored that fit the budget"""
+        active = np.flatnonzero(self.in_use)
+        limit = DROPOFF_CALIBRATION_ROWS if self.ms_per_row is None else \
+            max(1, int(DROPOFF_TICK_BUDGET_MS / self.ms_per_row))
+        if len(active) <= limit:
+            return active
+        self.counters["deferred"] += len(active) - limit
+        oldest = np.argpartition(self.columns["scored_at"][active], limit - 1)[:limit]
+        return np.sort(active[oldest])
+
+    def feature_matrix(self, slots: np.ndarray, columns: List[str]) -> np.ndarray:
+        """Model inputs in the model's column order; course length falls back to watched / completion"""
+        c = self.columns
+        watched = c["watch_time_sec"][slots]
+        completion = c["completion_pct"][slots]
+        length = c["video_length_sec"][slots]
+        estimate = np.where(completion >= 1, watched * 100 / np.maximum(completion, 1), 0.0)
+        features = {
+            "watch_time_sec": watched,
+            "video_length_sec": np.where(length > 0, length, estimate),
+            "completion_percentage_video": completion,
+            "device_encoded": c["device_encoded"][slots],
+            "hour_of_day": c["hour_of_day"][slots],
+            "day_of_week": c["day_of_week"][slots],
+        }
+        unknown = [name for name in columns if name not in features]
+        if unknown:
+            raise ValueError(f"Drop-off model needs features the monitor does not track: {unknown}")
+        return np.column_stack([features[name] for name in columns])
+
+    async def tick(self) -> int:
+        """Score one batch of active sessions; returns how many were scored"""
+        now = time.monotonic()
+        self.evict_idle(now)
+        if self.unresolved:
+            await self.resolve_sessions()
+        slots = self.pick_slots()
+        if not len(slots):
+            return 0
+
+        batcher = await ml_inference.loaded_batcher(DROPOFF_MODEL)
+        generation = self.generation[slots].copy()
+        cpu_started = time.thread_time()
+        matrix = self.feature_matrix(slots, batcher.columns)
+        build_ms = (time.thread_time() - cpu_started) * 1000
+
+        def run_model():
+            started = time.thread_time()
+            return batcher._predict(matrix), (time.thread_time() - started) * 1000
+
+        risk, predict_ms = await asyncio.to_thread(run_model)
+        # Slots handed to a new session while the model ran don't get the old session's score
+        same = self.generation[slots] == generation
+        self.columns["risk"][slots[same]] = risk[same]
+        self.columns["scored_at"][slots[same]] = now
+
+        tick_ms = build_ms + predict_ms
+        self.ms_per_row = tick_ms / len(slots) if self.ms_per_row is None else \
+            0.5 * self.ms_per_row + 0.5 * tick_ms / len(slots)
+        self.counters["ticks"] += 1
+        self.counters["scored"] += len(slots)
+        self.counters["last_tick_ms"] = round(tick_ms, 2)
+        return len(slots)
+
+    def at_risk(
+        self,
+        teacher_id: Optional[str] = None,
+        course_id: Optional[str] = None,
+        threshold: float = DROPOFF_RISK_THRESHOLD,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Scored sessions at or above `threshold`, riskiest first"""
+        c = self.columns
+        slots = np.flatnonzero(self.in_use & (c["scored_at"] > 0) & (c["risk"] >= threshold))
+        slots = slots[np.argsort(-c["risk"][slots], kind="stable")]
+        now = time.monotonic()
+
+        sessions = []
+        for slot in slots:
+            info = self.info[slot]
+            if teacher_id is not None and info["teacher_id"] != teacher_id:
+                continue
+            if course_id is not None and info.get("course_id") != course_id:
+                continue
+            sessions.append({
+                "session_id": self.session_ids[slot],
+                "student_id": info["student_id"],
+                "course_id": info.get("course_id"),
+                "current_lecture": info["current_lecture"],
+                "risk": round(float(c["risk"][slot]), 4),
+                "watch_time_sec": int(c["watch_time_sec"][slot]),
+                "completion_pct": round(float(c["completion_pct"][slot]), 2),
+                "progress_rate": round(float(c["progress_rate"][slot]), 3),
+                "seconds_since_progress": round(now - c["last_progress"][slot], 1),
+                "scored_seconds_ago": round(now - c["scored_at"][slot], 1)
+            })
+            if len(sessions) >= limit:
+                break
+        return sessions
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self.slots),
+            "capacity": self.capacity,
+            "unresolved": len(self.unresolved),
+            "ms_per_row": round(self.ms_per_row, 5) if self.ms_per_row is not None else None,
+            "tick_seconds": DROPOFF_TICK_SECONDS,
+            "tick_budget_ms": DROPOFF_TICK_BUDGET_MS,
+            **self.counters
+        }
+
+
+dropoff_monitor = DropoffMonitor()
+
+
+async def run_scoring_loop(interval: float = DROPOFF_TICK_SECONDS) -> None:
+    """Background task: score active sessions every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await dropoff_monitor.tick()
+        except ml_inference.ModelUnavailable:
+            pass  # Nothing to score with; ml_inference.stats() reports why
+        except Exception as e:
+            print(f"⚠️ Drop-off scoring failed: {str(e)}")
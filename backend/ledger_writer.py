@@ -0,0 +1,177 @@
+"""
+Ledger Writer - Batched inserts into the payments ledger
+Payment rows from concurrent requests are collected for up to LEDGER_BATCH_WAIT_MS and
+inserted with one multi-row request. Every caller still waits for its own batch to commit
+and gets its own inserted row back (with its id), so nothing returns before the row is
+durable. Rows missing from the insert response are read back by gateway_tx_id.
+If PostgREST rejects a batch (one bad row fails the whole statement) its rows are retried
+one by one, so only the offending caller sees the error. Transport errors fail the whole
+batch without a retry, as a single insert would.
+"""
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from database import supabase
+
+
+LEDGER_BATCH_WAIT_MS = float(os.getenv("LEDGER_BATCH_WAIT_MS", "5"))
+LEDGER_BATCH_MAX_ROWS = int(os.getenv("LEDGER_BATCH_MAX_ROWS", "500"))
+
+
+class LedgerWriter:
+    """Coalesces concurrent payments inserts into time-windowed multi-row inserts"""
+
+    def __init__(self, table: str = "payments"):
+        self.table = table
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.counters = {"rows": 0, "batches": 0, "largest_batch": 0, "retried_rows": 0, "failed_rows": 0}
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:  # New event loop (app restart, scripts): fresh queue and worker
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.worker = None
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+
+    async def write(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Insert one payment row; returns the inserted row (with "id") once its batch has committed
+        Rows should carry a gateway_tx_id (it is how batch results are matched to callers)
+        Raises ValueError if the insert fails or the stored row can't be returned
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            pending = [await self.queue.get()]
+            deadline = time.monotonic() + LEDGER_BATCH_WAIT_MS / 1000
+            while len(pending) < LEDGER_BATCH_MAX_ROWS:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while len(pending) < LEDGER_BATCH_MAX_ROWS and not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+
+            try:
+                await self._insert_batch(pending)
+            finally:
+                for _ in pending:
+                    self.queue.task_done()
+
+    async def _insert_batch(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        rows = [row for row, _ in pending]
+        try:
+            # default_to_null=False: keys a row leaves out get the column default, as in a single insert
+            result = await supabase.table(self.table)\
+                .insert(rows, default_to_null=False)\
+                .execute()
+        except APIError as e:
+            # Statement rejected, nothing was written: find the bad row(s) by inserting one at a time
+            if len(pending) == 1:
+                self._fail(pending[0][1], e)
+                return
+            print(f"⚠️ Ledger batch of {len(pending)} rejected, retrying rows one by one: {str(e)}")
+            self.counters["retried_rows"] += len(pending)
+            await asyncio.gather(*(self._insert_one(row, future) for row, future in pending))
+            return
+        except Exception as e:
+            # Timeout / connection error: the batch may have committed, so it is never retried here
+            for _, future in pending:
+                self._fail(future, e)
+            return
+
+        self.counters["rows"] += len(pending)
+        self.counters["batches"] += 1
+        self.counters["largest_batch"] = max(self.counters["largest_batch"], len(pending))
+
+        inserted = result.data or []
+        by_tx_id = {item.get("gateway_tx_id"): item for item in inserted}
+        unmatched = []
+        for index, (row, future) in enumerate(pending):
+            item = by_tx_id.get(row.get("gateway_tx_id")) if row.get("gateway_tx_id") else None
+            if item is None and len(inserted) == len(pending):
+                item = inserted[index]  # RETURNING keeps insert order
+            if item is None:
+                unmatched.append((row, future))
+            elif not future.done():
+                future.set_result(item)
+
+        if unmatched:
+            await self._read_back(unmatched)
+
+    async def _insert_one(self, row: Dict[str, Any], future: asyncio.Future) -> None:
+        try:
+            result = await supabase.table(self.table).insert(row).execute()
+        except Exception as e:
+            self._fail(future, e)
+            return
+        self.counters["rows"] += 1
+        self.counters["batches"] += 1
+        if not result.data:
+            await self._read_back([(row, future)])
+        elif not future.done():
+            future.set_result(result.data[0])
+
+    async def _read_back(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        """
+        Committed rows the insert response didn't include: select them by gateway_tx_id
+        Never re-inserts (the rows are already written); a row that can't be found fails its caller
+        """
+        tx_ids = [row["gateway_tx_id"] for row, _ in pending if row.get("gateway_tx_id")]
+        found: Dict[str, Dict[str, Any]] = {}
+        error: Optional[Exception] = None
+        if tx_ids:
+            try:
+                result = await supabase.table(self.table)\
+                    .select("*")\
+                    .in_("gateway_tx_id", tx_ids)\
+                    .execute()
+                found = {item["gateway_tx_id"]: item for item in result.data or []}
+            except Exception as e:
+                error = e
+
+        for row, future in pending:
+            item = found.get(row.get("gateway_tx_id"))
+            if item is not None:
+                if not future.done():
+                    future.set_result(item)
+            else:
+                self._fail(future, error or LookupError(
+                    f"row {row.get('gateway_tx_id') or '(no gateway_tx_id)'} was written but not returned"
+                ))
+
+    def _fail(self, future: asyncio.Future, error: Exception) -> None:
+        self.counters["failed_rows"] += 1
+        if not future.done():
+            future.set_exception(ValueError(f"Failed to record payment: {str(error)}"))
+
+    async def close(self) -> None:
+        """Wait for queued rows to commit, then stop the worker (app shutdown)"""
+        if self.worker is None or self.worker.done() or self.loop is not asyncio.get_running_loop():
+            return
+        await self.queue.join()
+        self.worker.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "batch_wait_ms": LEDGER_BATCH_WAIT_MS,
+            "batch_max_rows": LEDGER_BATCH_MAX_ROWS
+        }
+
+
+ledger_writer = LedgerWriter()
@@ -1,6 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+import time
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Optional
+from pydantic import ValidationError
 from models import (
     # Auth models
     SignupRequest, LoginRequest, GoogleLoginRequest, AuthResponse,
@@ -8,21 +14,66 @@ from models import (
     # Session models
     SessionCreateRequest, SessionCreateResponse, SessionStartRequest,
     SessionCompleteRequest, PaymentResponse, SessionStatusResponse,
+    SessionMetricsUpdate, SessionMetricsResponse,
     WalletBalanceResponse, WalletDepositRequest, WalletDepositResponse,
     VideoSessionStartRequest, VideoSessionStartResponse,
     VideoSessionEndRequest, VideoSessionEndResponse,
     # Analytics models
     UserAnalyticsResponse, WatchCalendarResponse, DomainAnalyticsResponse,
-    SessionHistoryResponse
+    SessionHistoryResponse,
+    # Review models
+    ReviewCreateRequest, ReviewCreateResponse,
+    # ML inference models
+    PredictionRequest, PredictionResponse, SessionPredictionRequest
 )
 from payment_service import SessionService, PaymentService
 from wallet_service import WalletService, VideoSessionService
 from auth_service import AuthService
 from analytics_service import AnalyticsService
 from teacher_analytics_service import TeacherAnalyticsService
-from ai_search_service import ai_youtube_search, quick_youtube_search
-
-app = FastAPI(title="Murph Learning Platform API", version="1.0.0")
+from course_service import CourseService
+from metrics_service import MetricsService
+from metering_service import LiveMeter, run_settle_loop as run_metering_settle, settle_abandoned
+from rating_service import RatingService
+from ai_search_service import (
+    ai_youtube_search, quick_youtube_search, close_search_client, search_cache, SEARCH_LLM_RANKING
+)
+from video_metadata import close_video_metadata_client, stats as video_metadata_stats
+from typeahead import course_typeahead, run_refresh_loop as run_typeahead_refresh
+from semantic_search import course_vectors, run_refresh_loop as run_semantic_refresh
+import ml_inference
+from dropoff_monitor import (
+    dropoff_monitor, run_scoring_loop as run_dropoff_scoring, DROPOFF_RISK_THRESHOLD, DROPOFF_TICK_SECONDS
+)
+from ledger_writer import ledger_writer
+from database import close_database
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks for shared resources"""
+    metrics_flusher = asyncio.create_task(MetricsService.run_flush_loop())
+    typeahead_refresher = asyncio.create_task(run_typeahead_refresh())
+    semantic_refresher = asyncio.create_task(run_semantic_refresh())
+    dropoff_scorer = asyncio.create_task(run_dropoff_scoring())
+    metering_settler = asyncio.create_task(run_metering_settle())
+    await asyncio.to_thread(ml_inference.load_models)  # Load once, keep warm
+    yield
+    metrics_flusher.cancel()
+    typeahead_refresher.cancel()
+    semantic_refresher.cancel()
+    dropoff_scorer.cancel()
+    metering_settler.cancel()
+    ml_inference.shutdown_models()
+    await settle_abandoned(grace=0)  # Refund locks of sockets that already dropped
+    await MetricsService.flush()  # Don't lose buffered heartbeats on shutdown
+    await ledger_writer.close()  # Let queued payment rows commit
+    await close_search_client()
+    await close_video_metadata_client()
+    await close_database()
+
+
+app = FastAPI(title="Murph Learning Platform API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for frontend communication
 app.add_middleware(
@@ -192,21 +243,22 @@ async def health_check():
 # ============================================================================
 
 @app.get("/api/search/youtube")
-async def search_youtube_videos(q: str, max_results: int = 8):
+async def search_youtube_videos(q: str, max_results: int = 8, quality: bool = False):
     """
     AI-powered YouTube search
-    Uses LLM to optimize query and rank results for educational content
+    Uses LLM to optimize query; results are ranked locally for educational content
     PUBLIC: No authentication required
     
     Query Parameters:
     - q: Search query string
     - max_results: Maximum number of results (default 8)
+    - quality: Also rank with the LLM (slower; on by default when SEARCH_LLM_RANKING=true)
     """
     if not q or len(q.strip()) < 2:
         raise HTTPException(status_code=400, detail="Search query must be at least 2 characters")
     
     try:
-        result = await ai_youtube_search(q.strip(), max_results)
+        result = await ai_youtube_search(q.strip(), max_results, quality or SEARCH_LLM_RANKING)
         return result
     except Exception as e:
         print(f"❌ Search error: {e}")
@@ -231,57 +283,113 @@ async def quick_search_youtube(q: str, max_results: int = 5):
         return {"videos": []}
 
 
+@app.get("/api/search/suggest")
+async def search_suggestions(q: str, limit: int = 8, fallback: bool = True):
+    """
+    Instant typeahead suggestions from the local course index
+    (course titles, lecture titles, categories); YouTube fills in only
+    when local matches run out
+    PUBLIC: No authentication required
+    """
+    limit = max(1, min(limit, 20))
+    
+    started = time.perf_counter()
+    suggestions = course_typeahead.suggest(q, limit)
+    local_micros = round((time.perf_counter() - started) * 1_000_000)
+    local_count = len(suggestions)
+    
+    if fallback and local_count < limit and len(q.strip()) >= 2:
+        try:
+            videos = await quick_youtube_search(q.strip(), limit - local_count)
+            suggestions = suggestions + [
+                {"text": video["title"], "kind": "youtube", "video_id": video["video_id"]}
+                for video in videos
+            ]
+        except Exception as e:
+            print(f"⚠️ Suggestion fallback error: {e}")
+    
+    return {
+        "suggestions": suggestions,
+        "local_count": local_count,
+        "local_lookup_us": local_micros
+    }
+
+
+@app.get("/api/search/courses")
+async def semantic_course_search(q: str, limit: int = 10, exact: bool = False):
+    """
+    Semantic search over the local course catalog
+    Matches titles, descriptions and lecture titles by meaning, not just category
+    PUBLIC: No authentication required
+    
+    Query Parameters:
+    - q: Search query string
+    - limit: Maximum number of courses (default 10, max 50)
+    - exact: Scan every course instead of the closest IVF lists
+    """
+    if not q or len(q.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Search query must be at least 2 characters")
+    
+    started = time.perf_counter()
+    results = course_vectors.search(q.strip(), max(1, min(limit, 50)), exact)
+    
+    return {
+        "query": q.strip(),
+        "courses": results,
+        "total": len(results),
+        "lookup_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+@app.get("/api/search/cache/stats")
+async def search_cache_stats():
+    """
+    Search result cache counters (hits, stale hits, misses, refreshes)
+    plus video metadata store counters (YouTube `videos` calls saved)
+    PUBLIC: No authentication required
+    """
+    return {
+        **search_cache.stats(),
+        "video_metadata": video_metadata_stats(),
+        "typeahead": course_typeahead.stats(),
+        "semantic_index": course_vectors.stats()
+    }
+
+
 # ============================================================================
 # COURSES ENDPOINTS (PUBLIC - For browsing courses)
 # ============================================================================
 
+CATALOG_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+def catalog_response(request: Request, payload: dict, etag: str) -> Response:
+    """
+    Build a cacheable catalog response with ETag/Cache-Control headers
+    Returns 304 Not Modified when the client already has this version
+    """
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in client_etags or "*" in client_etags:
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(content=payload, headers=headers)
+
+
 @app.get("/api/courses")
-async def get_all_courses(category: Optional[str] = None, limit: int = 20):
+async def get_all_courses(request: Request, category: Optional[str] = None, limit: int = 20):
     """
     Get all active courses for students to browse
     Optionally filter by category
     Returns course info with video details for player
+    Served from the in-process catalog cache, supports If-None-Match
     PUBLIC: No authentication required
     """
-    from database import supabase
-    
     try:
-        query = supabase.table("courses")\
-            .select("*, teachers!inner(id, user_id, bio, is_verified, users!inner(name, email))")\
-            .eq("is_active", True)\
-            .limit(limit)
-        
-        if category:
-            query = query.ilike("category", f"%{category}%")
-        
-        result = query.execute()
-        
-        courses = []
-        for course in result.data or []:
-            teacher_info = course.get("teachers", {})
-            user_info = teacher_info.get("users", {})
-            content = course.get("content_structure", {})
-            
-            courses.append({
-                "id": course["id"],
-                "title": course["title"],
-                "description": course["description"],
-                "category": course["category"],
-                "price_per_minute": float(course["price_per_minute"]),
-                "total_duration_minutes": course["total_duration_minutes"],
-                "video_id": content.get("video_id"),
-                "video_url": content.get("video_url"),
-                "lectures": content.get("lectures", []),
-                "instructor": {
-                    "id": teacher_info.get("id"),
-                    "name": user_info.get("name", "Unknown Instructor"),
-                    "is_verified": teacher_info.get("is_verified", False)
-                },
-                "thumbnail": f"https://img.youtube.com/vi/{content.get('video_id', '')}/mqdefault.jpg",
-                "created_at": course["created_at"]
-            })
-        
-        return {"courses": courses, "total": len(courses)}
+        payload, etag = await CourseService.get_courses(category, limit)
+        return catalog_response(request, payload, etag)
     
     except Exception as e:
         print(f"Error fetching courses: {e}")
@@ -289,49 +397,21 @@ async def get_all_courses(category: Optional[str] = None, limit: int = 20):
 
 
 @app.get("/api/courses/{course_id}")
-async def get_course_by_id(course_id: str):
+async def get_course_by_id(course_id: str, request: Request):
     """
     Get single course details by ID
     Returns full course info including lecture structure
+    Served from the in-process catalog cache, supports If-None-Match
     PUBLIC: No authentication required
     """
-    from database import supabase
-    
     try:
-        result = supabase.table("courses")\
-            .select("*, teachers!inner(id, user_id, bio, is_verified, users!inner(name, email))")\
-            .eq("id", course_id)\
-            .single()\
-            .execute()
+        cached = await CourseService.get_course(course_id)
         
-        if not result.data:
+        if not cached:
             raise HTTPException(status_code=404, detail="Course not found")
         
-        course = result.data
-        teacher_info = course.get("teachers", {})
-        user_info = teacher_info.get("users", {})
-        content = course.get("content_structure", {})
-        
-        return {
-            "id": course["id"],
-            "title": course["title"],
-            "description": course["description"],
-            "category": course["category"],
-            "price_per_minute": float(course["price_per_minute"]),
-            "total_duration_minutes": course["total_duration_minutes"],
-            "video_id": content.get("video_id"),
-            "video_url": content.get("video_url"),
-            "lectures": content.get("lectures", []),
-            "instructor": {
-                "id": teacher_info.get("id"),
-                "name": user_info.get("name", "Unknown Instructor"),
-                "bio": teacher_info.get("bio"),
-                "is_verified": teacher_info.get("is_verified", False)
-            },
-            "thumbnail": f"https://img.youtube.com/vi/{content.get('video_id', '')}/mqdefault.jpg",
-            "is_active": course["is_active"],
-            "created_at": course["created_at"]
-        }
+        payload, etag = cached
+        return catalog_response(request, payload, etag)
     
     except HTTPException:
         raise
@@ -360,6 +440,8 @@ async def create_session(
             student_id=request.student_id,
             locked_amount=request.locked_amount
         )
+        if request.timezone:
+            await AnalyticsService.set_timezone(user_id, request.timezone)
         
         return SessionCreateResponse(
             session_id=session["id"],
@@ -408,6 +490,8 @@ async def complete_session(session_id: str, request: SessionCompleteRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
+        MetricsService.discard(session_id)
+        
         return {
             "session_id": session["id"],
             "status": session["status"],
@@ -420,6 +504,42 @@ async def complete_session(session_id: str, request: SessionCompleteRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.patch("/api/sessions/{session_id}/metrics", response_model=SessionMetricsResponse)
+async def update_session_metrics(
+    session_id: str,
+    request: SessionMetricsUpdate,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Record a playback heartbeat (every ~5 seconds per viewer)
+    Buffered in memory and flushed to the sessions table in batches
+    PROTECTED: Requires valid JWT token
+    """
+    try:
+        entry = MetricsService.record_heartbeat(
+            session_id=session_id,
+            user_id=user_id,
+            duration_seconds=request.duration_seconds,
+            completion_pct=request.completion_pct,
+            current_lecture=request.current_lecture
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    
+    running_cost = 0.0
+    if request.price_per_minute:
+        running_cost = round(entry["duration_seconds"] / 60 * request.price_per_minute, 2)
+    
+    return SessionMetricsResponse(
+        session_id=session_id,
+        duration_seconds=entry["duration_seconds"],
+        completion_pct=entry["completion_pct"],
+        current_lecture=entry["current_lecture"],
+        final_cost=running_cost,
+        updated_at=entry["updated_at"]
+    )
+
+
 @app.get("/api/sessions/{session_id}/status", response_model=SessionStatusResponse)
 async def get_session_status(session_id: str):
     """
@@ -560,6 +680,8 @@ async def start_video_session(
             lock_amount=request.lock_amount,
             price_per_minute=request.price_per_minute
         )
+        if request.timezone:
+            await AnalyticsService.set_timezone(request.user_id, request.timezone)
         
         return VideoSessionStartResponse(
             session_id=result["session_id"],
@@ -587,6 +709,7 @@ async def end_video_session_beacon(request: dict):
         duration_seconds = request.get("duration_seconds", 0)
         price_per_minute = request.get("price_per_minute", 2.0)
         locked_amount = request.get("locked_amount", 30.0)
+        idempotency_key = request.get("idempotency_key")  # sendBeacon can't set headers
         
         if not user_id:
             return {"status": "error", "message": "Missing user_id"}
@@ -596,14 +719,17 @@ async def end_video_session_beacon(request: dict):
             session_id=session_id,
             duration_seconds=duration_seconds,
             price_per_minute=price_per_minute,
-            locked_amount=locked_amount
+            locked_amount=locked_amount,
+            idempotency_key=idempotency_key
         )
+        MetricsService.discard(result["session_id"])
         
         return {
             "status": "success",
             "session_id": result["session_id"],
             "amount_charged": result["amount_charged"],
-            "refund": result["refund"]
+            "refund": result["refund"],
+            "replayed": result["replayed"]
         }
     except Exception as e:
         # Log error but don't fail - this is best-effort cleanup
@@ -614,12 +740,15 @@ async def end_video_session_beacon(request: dict):
 @app.post("/session/end", response_model=VideoSessionEndResponse)
 async def end_video_session(
     request: VideoSessionEndRequest,
-    authenticated_user_id: str = Depends(get_current_user_id)
+    authenticated_user_id: str = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     End video session and process payment
     Frontend sends: duration watched, price rate, locked amount
     Backend calculates: final charge, refund
+    Settles once per session; repeats, e.g. after the unload beacon, return the first result
+    (a repeat with a different Idempotency-Key is rejected)
     PROTECTED: Users can only end their own sessions
     """
     # Verify user can only end their own session
@@ -632,8 +761,10 @@ async def end_video_session(
             session_id=request.session_id,
             duration_seconds=request.duration_seconds,
             price_per_minute=request.price_per_minute,
-            locked_amount=request.locked_amount
+            locked_amount=request.locked_amount,
+            idempotency_key=idempotency_key or request.idempotency_key
         )
+        MetricsService.discard(result["session_id"])
         
         return VideoSessionEndResponse(
             session_id=result["session_id"],
@@ -644,7 +775,8 @@ async def end_video_session(
             amount_locked=result["amount_locked"],
             refund=result["refund"],
             final_balance=result["final_balance"],
-            ended_at=result["ended_at"]
+            ended_at=result["ended_at"],
+            replayed=result["replayed"]
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -678,6 +810,121 @@ async def get_active_video_session(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.websocket("/ws/session/{session_id}")
+async def live_session_meter(
+    websocket: WebSocket,
+    session_id: str,
+    token: str,
+    price_per_minute: float = 2.0,
+    locked_amount: float = 30.0
+):
+    """
+    Live metering channel for a playing session (replaces heartbeat/balance polling)
+    Auth: ?token=<access token> (browsers can't set headers on WebSocket upgrades)
+    Client -> {"type": "heartbeat", "duration_seconds", "completion_pct", "current_lecture"}
+              {"type": "end", "duration_seconds"}
+    Server -> {"type": "meter", ...cost and balance...} / {"type": "settled", ...}
+    The session is settled through end_session on "end". A dropped socket is only settled
+    once it stays gone for METERING_DISCONNECT_GRACE_SECONDS; reconnecting resumes the meter
+    """
+    user_id = await AuthService.verify_token(token)
+    if not user_id:
+        await websocket.close(code=4401)
+        return
+    
+    await websocket.accept()
+    
+    try:
+        meter = await LiveMeter.open(user_id, session_id, price_per_minute, locked_amount)
+    except Exception as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1011)
+        return
+    
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"type": "error", "message": "Messages must be JSON"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            kind = message.get("type")
+            
+            if kind not in ("heartbeat", "end"):
+                await websocket.send_json({"type": "error", "message": f"Unknown message type: {kind}"})
+                continue
+            
+            try:
+                # Same rules as the HTTP heartbeat (completion 0-100, integer lecture, no NaN)
+                heartbeat = SessionMetricsUpdate.model_validate({
+                    "duration_seconds": message.get("duration_seconds", meter.duration_seconds),
+                    "completion_pct": message.get("completion_pct", 0.0),
+                    "current_lecture": message.get("current_lecture")
+                })
+            except ValidationError as e:
+                error = e.errors()[0]
+                field = ".".join(str(part) for part in error["loc"])
+                await websocket.send_json({"type": "error", "message": f"Invalid {field}: {error['msg']}"})
+                continue
+            
+            try:
+                update = meter.apply_heartbeat(
+                    duration_seconds=heartbeat.duration_seconds,
+                    completion_pct=heartbeat.completion_pct,
+                    current_lecture=heartbeat.current_lecture
+                )
+            except (PermissionError, TypeError, ValueError) as e:
+                await websocket.send_json({"type": "error", "message": str(e)})
+                continue
+            
+            if kind == "heartbeat":
+                await websocket.send_json(update)
+                continue
+            
+            result = await meter.settle()
+            await websocket.send_json({"type": "settled", **result})
+            await websocket.close()
+            return
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Network blip / tab switch / proxy timeout: keep billing open for a reconnect;
+        # run_metering_settle refunds the unused lock if the client never comes back
+        meter.detach()
+
+
+# ============================================================================
+# REVIEW ENDPOINTS (PROTECTED)
+# ============================================================================
+
+@app.post("/api/reviews", response_model=ReviewCreateResponse)
+async def create_review(
+    request: ReviewCreateRequest,
+    authenticated_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Review a completed session
+    The review is weighted by its credibility score (engagement during the session) in the
+    course and teacher average_rating, which update immediately
+    PROTECTED: Students can only review their own sessions
+    """
+    try:
+        return await RatingService.submit_review(
+            user_id=authenticated_user_id,
+            session_id=request.session_id,
+            rating=request.rating,
+            review_text=request.review_text
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ============================================================================
 # ANALYTICS ENDPOINTS (PROTECTED - For Dashboard)
 # ============================================================================
@@ -859,6 +1106,81 @@ async def get_teacher_popular_lectures(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/api/teacher/at-risk-sessions")
+async def get_teacher_at_risk_sessions(
+    course_id: Optional[str] = None,
+    threshold: Optional[float] = None,
+    limit: int = 100,
+    authenticated_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Students watching right now who are likely to drop off, riskiest first
+    Scores come from the live drop-off monitor (refreshed every few seconds, no DB reads)
+    PROTECTED: Teachers only see sessions of their own courses
+    """
+    teacher_id = await TeacherAnalyticsService.get_teacher_id_from_user_id(authenticated_user_id)
+    if not teacher_id:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    
+    threshold = DROPOFF_RISK_THRESHOLD if threshold is None else threshold
+    sessions = dropoff_monitor.at_risk(teacher_id, course_id, threshold, max(1, min(limit, 500)))
+    return {"sessions": sessions, "threshold": threshold, "tick_seconds": DROPOFF_TICK_SECONDS}
+
+
+# ============================================================================
+# ML INFERENCE ENDPOINTS (PROTECTED - Require Authentication)
+# ============================================================================
+
+@app.post("/api/ml/predict/{model_name}", response_model=PredictionResponse)
+async def predict_with_model(
+    model_name: str,
+    request: PredictionRequest,
+    authenticated_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Batched predictions from one model: learning_success, credibility or dropoff_risk
+    Rows carry raw engagement inputs; concurrent requests share one model call
+    PROTECTED: Requires authentication
+    """
+    try:
+        predictions = await ml_inference.predict(model_name, [row.model_dump() for row in request.rows])
+        return {"model": model_name, "predictions": predictions}
+    except ml_inference.ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/ml/predict-sessions")
+async def predict_for_sessions(
+    request: SessionPredictionRequest,
+    authenticated_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Every loaded model's output for each session, features built from the sessions rows
+    PROTECTED: Requires authentication - only sessions the user is the student or teacher of;
+    any other id (including virtual vs_ sessions) is listed in "missing"
+    """
+    if not ml_inference.batchers:
+        raise HTTPException(status_code=503, detail="No ML models loaded")
+    
+    try:
+        results, missing = await ml_inference.predict_sessions(request.session_ids, authenticated_user_id)
+        return {"predictions": results, "missing": missing}
+    except Exception as e:
+        print(f"❌ Session prediction error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/ml/stats")
+async def ml_stats():
+    """
+    Loaded models, load errors, micro-batching and live drop-off scoring counters
+    PUBLIC: No authentication required
+    """
+    return {**ml_inference.stats(), "dropoff_monitor": dropoff_monitor.stats()}
+
+
 # ============================================================================
 # FINTERNET PAYMENT GATEWAY ENDPOINTS
 # ============================================================================
@@ -0,0 +1,150 @@
+"""
+Metering Service - Live per-session billing state for the WebSocket channel
+One LiveMeter per playing session: heartbeats come in, cost/balance updates go out,
+and the session settles exactly once through VideoSessionService.end_session.
+Only an explicit "end" settles right away. A dropped socket detaches the meter; a
+reconnect picks it up again, and one left detached for METERING_DISCONNECT_GRACE_SECONDS
+is settled by the background loop (the tab is really gone).
+"""
+import os
+import time
+import asyncio
+from typing import Dict, Any, Optional
+from metrics_service import MetricsService
+from wallet_service import WalletService, VideoSessionService
+
+
+METERING_DISCONNECT_GRACE_SECONDS = float(os.getenv("METERING_DISCONNECT_GRACE_SECONDS", "120"))
+METERING_SWEEP_SECONDS = 15.0
+
+# session_id -> meter, connected or waiting out the grace period
+live_meters: Dict[str, "LiveMeter"] = {}
+
+
+class LiveMeter:
+    """Billing state for one metered session (shared by its connections)"""
+
+    def __init__(
+        self,
+        user_id: str,
+        session_id: str,
+        price_per_minute: float,
+        locked_amount: float,
+        starting_balance: float
+    ):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.price_per_minute = price_per_minute
+        self.locked_amount = locked_amount
+        self.starting_balance = starting_balance
+        self.duration_seconds = 0
+        self.settlement: Optional[Dict[str, Any]] = None
+        self.connections = 0
+        self.detached_at: Optional[float] = None
+
+    @classmethod
+    async def open(
+        cls,
+        user_id: str,
+        session_id: str,
+        price_per_minute: float,
+        locked_amount: float
+    ) -> "LiveMeter":
+        """
+        Attach a connection to the session's meter, reusing the one a dropped socket left
+        behind (billing continues where it stopped); the wallet balance is read once per meter
+        """
+        meter = live_meters.get(session_id)
+        if meter is not None and meter.settlement is None:
+            if meter.user_id != user_id:
+                raise PermissionError("Cannot meter another user's session")
+        else:
+            balance = await WalletService.get_balance(user_id)
+            meter = live_meters.get(session_id)  # Another connection may have opened it meanwhile
+            if meter is None or meter.settlement is not None:
+                meter = cls(user_id, session_id, price_per_minute, locked_amount, balance)
+                live_meters[session_id] = meter
+        meter.connections += 1
+        meter.detached_at = None
+        return meter
+
+    def detach(self) -> None:
+        """Socket closed without "end": start the grace period instead of settling"""
+        self.connections = max(0, self.connections - 1)
+        if self.connections == 0 and self.settlement is None:
+            self.detached_at = time.monotonic()
+
+    def current_cost(self) -> float:
+        """Running charge, capped at the locked amount"""
+        return min(round(self.duration_seconds / 60 * self.price_per_minute, 2), self.locked_amount)
+
+    def apply_heartbeat(
+        self,
+        duration_seconds: int,
+        completion_pct: float = 0.0,
+        current_lecture: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a heartbeat and build the update pushed back to the client
+        Goes through the same coalescing buffer as the HTTP metrics endpoint
+        """
+        entry = MetricsService.record_heartbeat(
+            session_id=self.session_id,
+            user_id=self.user_id,
+            duration_seconds=max(0, int(duration_seconds)),
+            completion_pct=completion_pct,
+            current_lecture=current_lecture
+        )
+        self.duration_seconds = entry["duration_seconds"]
+
+        cost = self.current_cost()
+        return {
+            "type": "meter",
+            "session_id": self.session_id,
+            "duration_seconds": self.duration_seconds,
+            "current_cost": cost,
+            "remaining_lock": round(self.locked_amount - cost, 2),
+            "balance": round(self.starting_balance - cost, 2),
+            "limit_reached": cost >= self.locked_amount
+        }
+
+    async def settle(self) -> Dict[str, Any]:
+        """Settle the session once ("end" message, or the grace period ran out after a drop)"""
+        if self.settlement is None:
+            self.settlement = await VideoSessionService.end_session(
+                user_id=self.user_id,
+                session_id=self.session_id,
+                duration_seconds=self.duration_seconds,
+                price_per_minute=self.price_per_minute,
+                locked_amount=self.locked_amount
+            )
+            MetricsService.discard(self.session_id)
+            if live_meters.get(self.session_id) is self:
+                del live_meters[self.session_id]
+
+        return self.settlement
+
+
+async def settle_abandoned(grace: float = METERING_DISCONNECT_GRACE_SECONDS) -> int:
+    """Settle meters detached for longer than `grace` seconds; returns how many settled"""
+    now = time.monotonic()
+    settled = 0
+    for session_id, meter in list(live_meters.items()):
+        if meter.detached_at is None or now - meter.detached_at < grace:
+            continue
+        try:
+            await meter.settle()
+            settled += 1
+        except Exception as e:
+            print(f"⚠️ Live meter settlement failed for {session_id}: {str(e)}")  # Retried next sweep
+    return settled
+
+
+async def run_settle_loop(interval: float = METERING_SWEEP_SECONDS) -> None:
+    """Background task: settle sessions whose socket dropped and never came back"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await settle_abandoned()
+        except Exception as e:
+            print(f"⚠️ Metering settle loop error: {str(e)}")
@@ -0,0 +1,134 @@
+"""
+Metrics Service - Coalesces playback heartbeats before they reach the database
+Viewers send metrics every 5 seconds; only the latest values per session are kept in
+memory and flushed in one batched RPC per interval (see migrations/007)
+"""
+import os
+import math
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from database import supabase
+from wallet_service import WalletService
+from dropoff_monitor import dropoff_monitor
+
+
+# Flush configuration
+METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "15"))
+METRICS_FLUSH_BATCH_SIZE = int(os.getenv("METRICS_FLUSH_BATCH_SIZE", "500"))
+METRICS_IDLE_EVICT_SECONDS = float(os.getenv("METRICS_IDLE_EVICT_SECONDS", "3600"))
+
+# session_id -> latest metrics (+ "dirty" flag while not yet flushed)
+session_metrics: Dict[str, Dict[str, Any]] = {}
+
+
+class MetricsService:
+    """In-memory heartbeat buffer with batched, monotonic flushes"""
+
+    @staticmethod
+    def record_heartbeat(
+        session_id: str,
+        user_id: str,
+        duration_seconds: int,
+        completion_pct: float,
+        current_lecture: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Merge one heartbeat into the session's buffered metrics
+        Duration never goes backwards (late or reordered heartbeats are ignored for it)
+        Values are checked before the entry is touched: a bad one would fail every flush
+        chunk it lands in (the RPC casts them)
+        """
+        if isinstance(duration_seconds, bool) or not isinstance(duration_seconds, int) or duration_seconds < 0:
+            raise ValueError("duration_seconds must be a non-negative integer")
+        if isinstance(completion_pct, bool) or not isinstance(completion_pct, (int, float)) \
+                or not math.isfinite(completion_pct) or not 0 <= completion_pct <= 100:
+            raise ValueError("completion_pct must be a number between 0 and 100")
+        if current_lecture is not None and (isinstance(current_lecture, bool) or not isinstance(current_lecture, int)):
+            raise ValueError("current_lecture must be an integer")
+
+        entry = session_metrics.get(session_id)
+
+        if entry is None:
+            entry = {
+                "session_id": session_id,
+                "student_id": user_id,
+                "duration_seconds": 0,
+                "completion_pct": 0.0,
+                "current_lecture": None
+            }
+            session_metrics[session_id] = entry
+        elif entry["student_id"] != user_id:
+            raise PermissionError("Cannot update metrics for another user's session")
+
+        entry["duration_seconds"] = max(entry["duration_seconds"], duration_seconds)
+        entry["completion_pct"] = float(completion_pct)
+        if current_lecture is not None:
+            entry["current_lecture"] = current_lecture
+        entry["updated_at"] = datetime.utcnow()
+        entry["last_seen"] = time.monotonic()
+        entry["dirty"] = True
+        dropoff_monitor.observe(
+            session_id, user_id, entry["duration_seconds"], completion_pct, entry["current_lecture"]
+        )
+
+        return entry
+
+    @staticmethod
+    def discard(session_id: str) -> None:
+        """Drop buffered metrics once a session is settled (settlement is authoritative)"""
+        session_metrics.pop(session_id, None)
+        dropoff_monitor.forget(session_id)
+
+    @staticmethod
+    async def flush() -> int:
+        """
+        Write every dirty session in batched RPC calls
+        Returns number of sessions sent; failed batches stay dirty for the next flush
+        """
+        now = time.monotonic()
+        batch: List[Dict[str, Any]] = []
+
+        for session_id, entry in list(session_metrics.items()):
+            if entry["dirty"]:
+                entry["dirty"] = False
+                # Sessions outside the sessions table (non-UUID ids / test users) stay in memory only
+                if WalletService.is_valid_uuid(session_id) and WalletService.is_valid_uuid(entry["student_id"]):
+                    batch.append(entry)
+            elif now - entry["last_seen"] > METRICS_IDLE_EVICT_SECONDS:
+                del session_metrics[session_id]
+
+        sent = 0
+        for start in range(0, len(batch), METRICS_FLUSH_BATCH_SIZE):
+            chunk = batch[start:start + METRICS_FLUSH_BATCH_SIZE]
+            updates = [
+                {
+                    "session_id": entry["session_id"],
+                    "student_id": entry["student_id"],
+                    "duration_seconds": entry["duration_seconds"],
+                    "completion_pct": entry["completion_pct"],
+                    "current_lecture": entry["current_lecture"]
+                }
+                for entry in chunk
+            ]
+
+            try:
+                await supabase.rpc("flush_session_metrics", {"p_updates": updates}).execute()
+                sent += len(chunk)
+            except Exception as e:
+                print(f"⚠️ Metrics flush failed for {len(chunk)} session(s): {str(e)}")
+                for entry in chunk:
+                    entry["dirty"] = True
+
+        return sent
+
+    @staticmethod
+    async def run_flush_loop(interval: float = METRICS_FLUSH_INTERVAL_SECONDS) -> None:
+        """Background task: flush buffered metrics every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await MetricsService.flush()
+            except Exception as e:
+                print(f"⚠️ Metrics flush loop error: {str(e)}")
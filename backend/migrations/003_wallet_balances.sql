@@ -0,0 +1,132 @@
+-- =====================================================
+-- Migration: Materialized Wallet Balances
+-- Date: 2026-10-17
+-- Purpose: O(1) balance reads instead of scanning every
+--          deposit/charge/refund row on each request
+-- =====================================================
+
+-- Running balance per user (same formula as the ledger:
+-- deposits - charges + refunds, locks are temporary holds and ignored)
+CREATE TABLE IF NOT EXISTS public.wallet_balances (
+    user_id UUID PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+    balance DECIMAL(14, 6) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+COMMENT ON TABLE public.wallet_balances IS 'Incrementally maintained wallet balance, kept in sync by trg_payments_wallet_balance';
+
+-- =====================================================
+-- Trigger: Apply each payments insert to the running balance
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.apply_payment_to_wallet_balance()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    target_user UUID;
+    delta DECIMAL(14, 6);
+BEGIN
+    IF NEW.payment_type IN ('deposit', 'refund') THEN
+        target_user := NEW.to_user_id;
+        delta := NEW.amount;
+    ELSIF NEW.payment_type = 'charge' THEN
+        target_user := NEW.from_user_id;
+        delta := -NEW.amount;
+    ELSE
+        RETURN NEW;  -- locks / bonuses don't move the wallet balance
+    END IF;
+
+    IF target_user IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    -- Upsert takes a row lock, so concurrent inserts for one user serialize here
+    INSERT INTO public.wallet_balances (user_id, balance, updated_at)
+    VALUES (target_user, delta, NOW())
+    ON CONFLICT (user_id) DO UPDATE
+    SET balance = public.wallet_balances.balance + EXCLUDED.balance,
+        updated_at = NOW();
+
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_payments_wallet_balance ON public.payments;
+CREATE TRIGGER trg_payments_wallet_balance
+AFTER INSERT ON public.payments
+FOR EACH ROW
+EXECUTE FUNCTION public.apply_payment_to_wallet_balance();
+
+-- =====================================================
+-- Reconciliation: Compare running balances with the full ledger
+-- Returns only mismatched users; pass fix => TRUE to repair them
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.reconcile_wallet_balances(fix BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (
+    user_id UUID,
+    stored_balance DECIMAL(14, 6),
+    ledger_balance DECIMAL(14, 6)
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+#variable_conflict use_column
+DECLARE
+    mismatch RECORD;
+BEGIN
+    FOR mismatch IN
+        WITH ledger AS (
+            SELECT entries.user_id, SUM(entries.delta)::DECIMAL(14, 6) AS balance
+            FROM (
+                SELECT p.to_user_id AS user_id, p.amount AS delta
+                FROM public.payments p
+                WHERE p.payment_type IN ('deposit', 'refund') AND p.to_user_id IS NOT NULL
+                UNION ALL
+                SELECT p.from_user_id AS user_id, -p.amount AS delta
+                FROM public.payments p
+                WHERE p.payment_type = 'charge' AND p.from_user_id IS NOT NULL
+            ) entries
+            GROUP BY entries.user_id
+        )
+        SELECT COALESCE(l.user_id, w.user_id) AS user_id,
+               w.balance AS stored_balance,
+               COALESCE(l.balance, 0)::DECIMAL(14, 6) AS ledger_balance
+        FROM ledger l
+        FULL OUTER JOIN public.wallet_balances w ON w.user_id = l.user_id
+        WHERE w.balance IS DISTINCT FROM COALESCE(l.balance, 0)
+    LOOP
+        user_id := mismatch.user_id;
+        stored_balance := mismatch.stored_balance;
+        ledger_balance := mismatch.ledger_balance;
+        RETURN NEXT;
+
+        IF fix THEN
+            INSERT INTO public.wallet_balances AS wb (user_id, balance, updated_at)
+            VALUES (mismatch.user_id, mismatch.ledger_balance, NOW())
+            ON CONFLICT (user_id) DO UPDATE
+            SET balance = EXCLUDED.balance,
+                updated_at = NOW();
+        END IF;
+    END LOOP;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.reconcile_wallet_balances TO service_role;
+
+COMMENT ON FUNCTION public.reconcile_wallet_balances IS 'Lists wallet_balances rows that disagree with the payments ledger; fix => TRUE rewrites them';
+
+-- =====================================================
+-- Backfill existing ledger history
+-- =====================================================
+
+SELECT * FROM public.reconcile_wallet_balances(TRUE);
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Should return zero rows after backfill
+SELECT * FROM public.reconcile_wallet_balances(FALSE);
@@ -0,0 +1,69 @@
+-- =====================================================
+-- Migration: Grouped Per-Course Stats for Teacher Dashboard
+-- Date: 2026-10-17
+-- Purpose: Replace one sessions query per course (N+1) with a
+--          single grouped aggregation over all teacher courses
+-- =====================================================
+
+-- Index backing the grouped scan (sessions by course + status)
+CREATE INDEX IF NOT EXISTS idx_sessions_course_status ON public.sessions(course_id, status);
+
+-- =====================================================
+-- PostgreSQL Function: Per-course session aggregates for one teacher
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.get_teacher_course_stats(teacher_row_id UUID)
+RETURNS TABLE (
+    course_id UUID,
+    title TEXT,
+    category TEXT,
+    price_per_minute DECIMAL,
+    num_lectures INTEGER,
+    average_rating DECIMAL,
+    total_reviews INTEGER,
+    is_active BOOLEAN,
+    total_sessions BIGINT,
+    completed_sessions BIGINT,
+    unique_students BIGINT,
+    completed_students BIGINT,
+    completed_revenue DECIMAL
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+AS $$
+    SELECT
+        c.id,
+        c.title,
+        c.category,
+        c.price_per_minute,
+        COALESCE(jsonb_array_length(c.content_structure -> 'lectures'), 0),
+        COALESCE(c.average_rating, 0),
+        COALESCE(c.total_reviews, 0),
+        COALESCE(c.is_active, TRUE),
+        COUNT(s.id),
+        COUNT(s.id) FILTER (WHERE s.status = 'completed'),
+        COUNT(DISTINCT s.student_id),
+        COUNT(DISTINCT s.student_id) FILTER (WHERE s.status = 'completed'),
+        COALESCE(SUM(COALESCE(s.final_cost, 0)) FILTER (WHERE s.status = 'completed'), 0)
+    FROM public.courses c
+    LEFT JOIN public.sessions s ON s.course_id = c.id
+    WHERE c.teacher_id = teacher_row_id
+    GROUP BY c.id;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_teacher_course_stats TO service_role;
+
+COMMENT ON FUNCTION public.get_teacher_course_stats IS 'Per-course session counts, unique students, completed counts and revenue for a teacher in one pass';
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Verify function was created
+SELECT
+    routine_name,
+    routine_type,
+    data_type
+FROM information_schema.routines
+WHERE routine_name = 'get_teacher_course_stats';
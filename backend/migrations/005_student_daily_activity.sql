@@ -0,0 +1,156 @@
+-- =====================================================
+-- Migration: Per-Student Daily Activity Rollup
+-- Date: 2026-10-17
+-- Purpose: Analytics endpoints (streaks, calendar, domains) read
+--          one row per active day instead of every completed session
+-- =====================================================
+
+-- One row per student per day with at least one completed session
+-- (UTC days here; migration 006 buckets by the student's timezone)
+CREATE TABLE IF NOT EXISTS public.student_daily_activity (
+    student_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    seconds_watched INTEGER NOT NULL DEFAULT 0 CHECK (seconds_watched >= 0),
+    sessions_completed INTEGER NOT NULL DEFAULT 0 CHECK (sessions_completed >= 0),
+    category_seconds JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (student_id, activity_date)
+);
+
+COMMENT ON TABLE public.student_daily_activity IS 'Daily watch rollup per student: total seconds, completed sessions and seconds per course category';
+COMMENT ON COLUMN public.student_daily_activity.category_seconds IS 'Seconds watched per course category: {"DSA": 1200, "Web Development": 600}';
+
+-- Marks sessions already folded into the rollup (keeps recording idempotent)
+ALTER TABLE public.sessions
+ADD COLUMN IF NOT EXISTS activity_recorded_at TIMESTAMP WITH TIME ZONE;
+
+-- =====================================================
+-- PostgreSQL Function: Fold one completed session into the rollup
+-- Called by settle_session (migration 009) in the settlement transaction
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.record_session_activity(p_session_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    s RECORD;
+    day DATE;
+    seconds INTEGER;
+BEGIN
+    -- Claim the session; a second call for the same session is a no-op
+    UPDATE public.sessions
+    SET activity_recorded_at = NOW()
+    WHERE id = p_session_id
+      AND status = 'completed'
+      AND end_time IS NOT NULL
+      AND activity_recorded_at IS NULL
+    RETURNING student_id, end_time, duration_seconds, course_id INTO s;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    day := (s.end_time AT TIME ZONE 'UTC')::date;
+    seconds := COALESCE(s.duration_seconds, 0);
+
+    INSERT INTO public.student_daily_activity AS a
+        (student_id, activity_date, seconds_watched, sessions_completed, category_seconds, updated_at)
+    SELECT s.student_id, day, seconds, 1,
+           CASE WHEN c.category IS NULL THEN '{}'::jsonb
+                ELSE jsonb_build_object(c.category, seconds) END,
+           NOW()
+    FROM (SELECT 1) one
+    LEFT JOIN public.courses c ON c.id = s.course_id
+    ON CONFLICT (student_id, activity_date) DO UPDATE
+    SET seconds_watched = a.seconds_watched + EXCLUDED.seconds_watched,
+        sessions_completed = a.sessions_completed + 1,
+        category_seconds = (
+            SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::INTEGER) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(a.category_seconds)
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(EXCLUDED.category_seconds)
+                ) merged
+                GROUP BY key
+            ) totals
+        ),
+        updated_at = NOW();
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.record_session_activity TO service_role;
+
+COMMENT ON FUNCTION public.record_session_activity IS 'Adds one completed session to student_daily_activity (idempotent per session)';
+
+-- =====================================================
+-- PostgreSQL Function: Rebuild the rollup from sessions history
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.backfill_student_daily_activity()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    rows_written INTEGER;
+BEGIN
+    DELETE FROM public.student_daily_activity;
+
+    INSERT INTO public.student_daily_activity
+        (student_id, activity_date, seconds_watched, sessions_completed, category_seconds, updated_at)
+    SELECT per_category.student_id,
+           per_category.activity_date,
+           SUM(per_category.seconds),
+           SUM(per_category.sessions),
+           COALESCE(
+               jsonb_object_agg(per_category.category, per_category.seconds)
+                   FILTER (WHERE per_category.category IS NOT NULL),
+               '{}'::jsonb
+           ),
+           NOW()
+    FROM (
+        SELECT s.student_id,
+               (s.end_time AT TIME ZONE 'UTC')::date AS activity_date,
+               c.category,
+               SUM(COALESCE(s.duration_seconds, 0)) AS seconds,
+               COUNT(*) AS sessions
+        FROM public.sessions s
+        LEFT JOIN public.courses c ON c.id = s.course_id
+        WHERE s.status = 'completed' AND s.end_time IS NOT NULL
+        GROUP BY s.student_id, (s.end_time AT TIME ZONE 'UTC')::date, c.category
+    ) per_category
+    GROUP BY per_category.student_id, per_category.activity_date;
+
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+
+    UPDATE public.sessions
+    SET activity_recorded_at = NOW()
+    WHERE status = 'completed' AND end_time IS NOT NULL AND activity_recorded_at IS NULL;
+
+    RETURN rows_written;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.backfill_student_daily_activity TO service_role;
+
+COMMENT ON FUNCTION public.backfill_student_daily_activity IS 'Rebuilds student_daily_activity from all completed sessions';
+
+-- =====================================================
+-- Backfill existing sessions
+-- =====================================================
+
+SELECT public.backfill_student_daily_activity();
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Rollup totals should match the sessions table
+SELECT
+    (SELECT COALESCE(SUM(seconds_watched), 0) FROM public.student_daily_activity) AS rollup_seconds,
+    (SELECT COALESCE(SUM(duration_seconds), 0) FROM public.sessions
+     WHERE status = 'completed' AND end_time IS NOT NULL) AS session_seconds;
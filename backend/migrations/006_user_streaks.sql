@@ -0,0 +1,292 @@
+-- =====================================================
+-- Migration: Incremental Watch Streaks
+-- Date: 2026-10-17
+-- Purpose: Constant-time streak updates per completed session
+--          instead of re-walking the full watch history per request
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS public.user_streaks (
+    user_id UUID PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+    current_streak INTEGER NOT NULL DEFAULT 0 CHECK (current_streak >= 0),
+    longest_streak INTEGER NOT NULL DEFAULT 0 CHECK (longest_streak >= 0),
+    last_active_date DATE,
+    timezone TEXT NOT NULL DEFAULT 'UTC',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+COMMENT ON TABLE public.user_streaks IS 'Incremental streak state; transition rules mirror streak_tracker.StreakState';
+COMMENT ON COLUMN public.user_streaks.timezone IS 'IANA timezone used for day boundaries (e.g. Asia/Kolkata), written from the browser timezone sent at session start (AnalyticsService.set_timezone); also buckets student_daily_activity';
+COMMENT ON COLUMN public.user_streaks.current_streak IS 'Run length ending at last_active_date; readers treat it as 0 once last_active_date is older than yesterday';
+
+-- =====================================================
+-- PostgreSQL Function: Calendar day of a timestamp in a user's timezone
+-- The one day boundary for streaks and the daily activity rollup
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.local_activity_date(
+    p_at TIMESTAMP WITH TIME ZONE,
+    p_timezone TEXT
+)
+RETURNS DATE
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN (p_at AT TIME ZONE COALESCE(p_timezone, 'UTC'))::date;
+EXCEPTION WHEN invalid_parameter_value THEN
+    RETURN (p_at AT TIME ZONE 'UTC')::date;  -- Unknown zone: UTC, like streak_tracker.get_zone
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.local_activity_date TO service_role;
+
+-- =====================================================
+-- PostgreSQL Function: Apply one activity timestamp (O(1))
+-- Mirrored exactly by streak_tracker.StreakState.record_activity (tests/test_streak_tracker.py);
+-- change both together
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.record_streak_activity(
+    p_user_id UUID,
+    p_activity_at TIMESTAMP WITH TIME ZONE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    st public.user_streaks%ROWTYPE;
+    day DATE;
+    next_streak INTEGER;
+BEGIN
+    INSERT INTO public.user_streaks (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    -- Row lock serializes concurrent completions for one user
+    SELECT * INTO st FROM public.user_streaks WHERE user_id = p_user_id FOR UPDATE;
+
+    day := public.local_activity_date(p_activity_at, st.timezone);
+
+    IF st.last_active_date IS NOT NULL AND day <= st.last_active_date THEN
+        RETURN;  -- Same day already counted, or out of order
+    END IF;
+
+    IF st.last_active_date IS NOT NULL AND day = st.last_active_date + 1 THEN
+        next_streak := st.current_streak + 1;
+    ELSE
+        next_streak := 1;
+    END IF;
+
+    UPDATE public.user_streaks
+    SET current_streak = next_streak,
+        longest_streak = GREATEST(longest_streak, next_streak),
+        last_active_date = day,
+        updated_at = NOW()
+    WHERE user_id = p_user_id;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.record_streak_activity TO service_role;
+
+-- =====================================================
+-- Trigger: Update streak when a session is folded into the rollup
+-- (record_session_activity sets activity_recorded_at exactly once per session)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.apply_session_to_streak()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    PERFORM public.record_streak_activity(NEW.student_id, NEW.end_time);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sessions_streak ON public.sessions;
+CREATE TRIGGER trg_sessions_streak
+AFTER UPDATE OF activity_recorded_at ON public.sessions
+FOR EACH ROW
+WHEN (OLD.activity_recorded_at IS NULL AND NEW.activity_recorded_at IS NOT NULL AND NEW.end_time IS NOT NULL)
+EXECUTE FUNCTION public.apply_session_to_streak();
+
+-- =====================================================
+-- Daily activity rollup: bucket by the same local day as the streak
+-- (replaces the UTC-day versions from migration 005)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.record_session_activity(p_session_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    s RECORD;
+    tz TEXT;
+    day DATE;
+    seconds INTEGER;
+BEGIN
+    -- Claim the session; a second call for the same session is a no-op
+    UPDATE public.sessions
+    SET activity_recorded_at = NOW()
+    WHERE id = p_session_id
+      AND status = 'completed'
+      AND end_time IS NOT NULL
+      AND activity_recorded_at IS NULL
+    RETURNING student_id, end_time, duration_seconds, course_id INTO s;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    SELECT timezone INTO tz FROM public.user_streaks WHERE user_id = s.student_id;
+    day := public.local_activity_date(s.end_time, tz);
+    seconds := COALESCE(s.duration_seconds, 0);
+
+    INSERT INTO public.student_daily_activity AS a
+        (student_id, activity_date, seconds_watched, sessions_completed, category_seconds, updated_at)
+    SELECT s.student_id, day, seconds, 1,
+           CASE WHEN c.category IS NULL THEN '{}'::jsonb
+                ELSE jsonb_build_object(c.category, seconds) END,
+           NOW()
+    FROM (SELECT 1) one
+    LEFT JOIN public.courses c ON c.id = s.course_id
+    ON CONFLICT (student_id, activity_date) DO UPDATE
+    SET seconds_watched = a.seconds_watched + EXCLUDED.seconds_watched,
+        sessions_completed = a.sessions_completed + 1,
+        category_seconds = (
+            SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::INTEGER) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(a.category_seconds)
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(EXCLUDED.category_seconds)
+                ) merged
+                GROUP BY key
+            ) totals
+        ),
+        updated_at = NOW();
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.record_session_activity TO service_role;
+
+COMMENT ON FUNCTION public.record_session_activity IS 'Adds one completed session to student_daily_activity on the student''s local day (idempotent per session)';
+
+CREATE OR REPLACE FUNCTION public.backfill_student_daily_activity()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    rows_written INTEGER;
+BEGIN
+    DELETE FROM public.student_daily_activity;
+
+    INSERT INTO public.student_daily_activity
+        (student_id, activity_date, seconds_watched, sessions_completed, category_seconds, updated_at)
+    SELECT per_category.student_id,
+           per_category.activity_date,
+           SUM(per_category.seconds),
+           SUM(per_category.sessions),
+           COALESCE(
+               jsonb_object_agg(per_category.category, per_category.seconds)
+                   FILTER (WHERE per_category.category IS NOT NULL),
+               '{}'::jsonb
+           ),
+           NOW()
+    FROM (
+        SELECT s.student_id,
+               public.local_activity_date(s.end_time, us.timezone) AS activity_date,
+               c.category,
+               SUM(COALESCE(s.duration_seconds, 0)) AS seconds,
+               COUNT(*) AS sessions
+        FROM public.sessions s
+        LEFT JOIN public.courses c ON c.id = s.course_id
+        LEFT JOIN public.user_streaks us ON us.user_id = s.student_id
+        WHERE s.status = 'completed' AND s.end_time IS NOT NULL
+        GROUP BY s.student_id, public.local_activity_date(s.end_time, us.timezone), c.category
+    ) per_category
+    GROUP BY per_category.student_id, per_category.activity_date;
+
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+
+    UPDATE public.sessions
+    SET activity_recorded_at = NOW()
+    WHERE status = 'completed' AND end_time IS NOT NULL AND activity_recorded_at IS NULL;
+
+    RETURN rows_written;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.backfill_student_daily_activity TO service_role;
+
+COMMENT ON FUNCTION public.backfill_student_daily_activity IS 'Rebuilds student_daily_activity from all completed sessions, one row per student per local day';
+
+COMMENT ON COLUMN public.student_daily_activity.activity_date IS 'Day in the student''s user_streaks.timezone (UTC when unknown), the same boundary as the streak';
+
+-- =====================================================
+-- PostgreSQL Function: Rebuild streaks from session history
+-- Gaps-and-islands over distinct local days per user
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.backfill_user_streaks()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    rows_written INTEGER;
+BEGIN
+    WITH days AS (
+        SELECT DISTINCT s.student_id,
+               public.local_activity_date(s.end_time, us.timezone) AS day
+        FROM public.sessions s
+        LEFT JOIN public.user_streaks us ON us.user_id = s.student_id
+        WHERE s.status = 'completed' AND s.end_time IS NOT NULL
+    ),
+    islands AS (
+        SELECT student_id, day,
+               day - (ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY day))::INTEGER AS grp
+        FROM days
+    ),
+    runs AS (
+        SELECT student_id, COUNT(*)::INTEGER AS run_length, MAX(day) AS run_end
+        FROM islands
+        GROUP BY student_id, grp
+    ),
+    per_user AS (
+        SELECT student_id,
+               MAX(run_length) AS longest,
+               (ARRAY_AGG(run_length ORDER BY run_end DESC))[1] AS current,
+               MAX(run_end) AS last_day
+        FROM runs
+        GROUP BY student_id
+    )
+    INSERT INTO public.user_streaks (user_id, current_streak, longest_streak, last_active_date, updated_at)
+    SELECT student_id, current, longest, last_day, NOW()
+    FROM per_user
+    ON CONFLICT (user_id) DO UPDATE
+    SET current_streak = EXCLUDED.current_streak,
+        longest_streak = EXCLUDED.longest_streak,
+        last_active_date = EXCLUDED.last_active_date,
+        updated_at = NOW();
+
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+    RETURN rows_written;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.backfill_user_streaks TO service_role;
+
+COMMENT ON FUNCTION public.backfill_user_streaks IS 'Recomputes user_streaks from all completed sessions (run after backfill_student_daily_activity)';
+
+-- =====================================================
+-- Backfill existing sessions
+-- =====================================================
+
+SELECT public.backfill_student_daily_activity();
+SELECT public.backfill_user_streaks();
@@ -0,0 +1,60 @@
+-- =====================================================
+-- Migration: Batched Session Metrics Flush
+-- Date: 2026-10-17
+-- Purpose: Apply coalesced playback heartbeats for many sessions
+--          in one statement instead of one UPDATE per heartbeat
+-- =====================================================
+
+-- =====================================================
+-- PostgreSQL Function: Apply a batch of session metrics
+-- p_updates: [{"session_id", "student_id", "duration_seconds", "completion_pct", "current_lecture"}]
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.flush_session_metrics(p_updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    rows_updated INTEGER;
+BEGIN
+    UPDATE public.sessions s
+    SET duration_seconds = GREATEST(COALESCE(s.duration_seconds, 0), u.duration_seconds),
+        content_progress = COALESCE(s.content_progress, '{}'::jsonb) || jsonb_strip_nulls(
+            jsonb_build_object(
+                'completion_pct', u.completion_pct,
+                'stopped_at_lecture', u.current_lecture
+            )
+        ),
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_updates) AS u(
+        session_id UUID,
+        student_id UUID,
+        duration_seconds INTEGER,
+        completion_pct NUMERIC,
+        current_lecture INTEGER
+    )
+    WHERE s.id = u.session_id
+      AND s.student_id = u.student_id
+      AND s.status IN ('locked', 'active');  -- Settled sessions are never touched
+
+    GET DIAGNOSTICS rows_updated = ROW_COUNT;
+    RETURN rows_updated;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.flush_session_metrics TO service_role;
+
+COMMENT ON FUNCTION public.flush_session_metrics IS 'Batched heartbeat write: duration only moves forward, progress is merged into content_progress';
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Verify function was created
+SELECT
+    routine_name,
+    routine_type,
+    data_type
+FROM information_schema.routines
+WHERE routine_name = 'flush_session_metrics';
@@ -0,0 +1,208 @@
+-- =====================================================
+-- Migration: Credibility-Weighted Course and Teacher Ratings
+-- Date: 2026-10-17
+-- Purpose: Keep average_rating / total_reviews on courses and
+--          teachers up to date as reviews arrive, weighting each
+--          review by the credibility model's score
+-- =====================================================
+
+-- Weight each review carries in the averages (credibility score, or 0 below the
+-- minimum credibility; set by rating_service.py). NULL = not scored yet, weight 0
+ALTER TABLE public.reviews
+    ADD COLUMN IF NOT EXISTS rating_weight DECIMAL(4, 3) CHECK (rating_weight >= 0 AND rating_weight <= 1);
+
+-- Running sums behind average_rating = weighted_rating_sum / rating_weight_sum
+ALTER TABLE public.courses
+    ADD COLUMN IF NOT EXISTS weighted_rating_sum DECIMAL(14, 6) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_weight_sum DECIMAL(14, 6) NOT NULL DEFAULT 0;
+
+ALTER TABLE public.teachers
+    ADD COLUMN IF NOT EXISTS weighted_rating_sum DECIMAL(14, 6) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_weight_sum DECIMAL(14, 6) NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN public.reviews.rating_weight IS 'Credibility weight of this review in course/teacher average_rating';
+COMMENT ON COLUMN public.courses.weighted_rating_sum IS 'SUM(rating * rating_weight) over counted reviews, kept by trg_reviews_rating_sums';
+COMMENT ON COLUMN public.teachers.weighted_rating_sum IS 'SUM(rating * rating_weight) over counted reviews, kept by trg_reviews_rating_sums';
+
+-- =====================================================
+-- Helper: Apply one review's contribution (or its removal) to both aggregates
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.bump_rating_sums(
+    p_course_id UUID,
+    p_teacher_id UUID,
+    p_weighted DECIMAL,
+    p_weight DECIMAL,
+    p_reviews INTEGER
+)
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    UPDATE public.courses
+    SET weighted_rating_sum = weighted_rating_sum + p_weighted,
+        rating_weight_sum = rating_weight_sum + p_weight,
+        total_reviews = GREATEST(COALESCE(total_reviews, 0) + p_reviews, 0),
+        average_rating = CASE WHEN rating_weight_sum + p_weight > 0.0005
+            THEN ROUND((weighted_rating_sum + p_weighted) / (rating_weight_sum + p_weight), 2)
+            ELSE 0 END,
+        updated_at = NOW()
+    WHERE id = p_course_id;
+
+    UPDATE public.teachers
+    SET weighted_rating_sum = weighted_rating_sum + p_weighted,
+        rating_weight_sum = rating_weight_sum + p_weight,
+        total_reviews = GREATEST(COALESCE(total_reviews, 0) + p_reviews, 0),
+        average_rating = CASE WHEN rating_weight_sum + p_weight > 0.0005
+            THEN ROUND((weighted_rating_sum + p_weighted) / (rating_weight_sum + p_weight), 2)
+            ELSE 0 END,
+        updated_at = NOW()
+    WHERE id = p_teacher_id;
+$$;
+
+-- =====================================================
+-- Trigger: O(1) update of the sums for every review insert / change / delete
+-- Counted reviews are visible and not rejected
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.apply_review_to_rating_sums()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE')
+       AND COALESCE(OLD.is_visible, TRUE) AND COALESCE(OLD.moderation_status, 'pending') <> 'rejected' THEN
+        PERFORM public.bump_rating_sums(
+            OLD.course_id, OLD.teacher_id,
+            -(OLD.rating * COALESCE(OLD.rating_weight, 0)), -COALESCE(OLD.rating_weight, 0), -1
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE')
+       AND COALESCE(NEW.is_visible, TRUE) AND COALESCE(NEW.moderation_status, 'pending') <> 'rejected' THEN
+        PERFORM public.bump_rating_sums(
+            NEW.course_id, NEW.teacher_id,
+            NEW.rating * COALESCE(NEW.rating_weight, 0), COALESCE(NEW.rating_weight, 0), 1
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_reviews_rating_sums ON public.reviews;
+CREATE TRIGGER trg_reviews_rating_sums
+AFTER INSERT OR DELETE OR UPDATE OF rating, rating_weight, is_visible, moderation_status, course_id, teacher_id
+ON public.reviews
+FOR EACH ROW
+EXECUTE FUNCTION public.apply_review_to_rating_sums();
+
+-- =====================================================
+-- PostgreSQL Function: Write re-scored credibility for a batch of reviews
+-- p_updates: [{"id", "credibility_score", "rating_weight", "is_verified"}]
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.update_review_weights(p_updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    rows_updated INTEGER;
+BEGIN
+    UPDATE public.reviews r
+    SET credibility_score = u.credibility_score,
+        rating_weight = u.rating_weight,
+        is_verified = u.is_verified,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_updates) AS u(
+        id UUID,
+        credibility_score DECIMAL,
+        rating_weight DECIMAL,
+        is_verified BOOLEAN
+    )
+    WHERE r.id = u.id
+      AND (r.rating_weight IS DISTINCT FROM u.rating_weight
+           OR r.credibility_score IS DISTINCT FROM u.credibility_score);  -- Unchanged rows skip the trigger
+
+    GET DIAGNOSTICS rows_updated = ROW_COUNT;
+    RETURN rows_updated;
+END;
+$$;
+
+-- =====================================================
+-- PostgreSQL Function: Rebuild every course/teacher aggregate from reviews
+-- (repairs any drift; run after update_review_weights in recompute_ratings.py)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.rebuild_rating_sums()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    counted INTEGER;
+BEGIN
+    UPDATE public.courses c
+    SET weighted_rating_sum = COALESCE(t.weighted, 0),
+        rating_weight_sum = COALESCE(t.weight, 0),
+        total_reviews = COALESCE(t.reviews, 0),
+        average_rating = CASE WHEN COALESCE(t.weight, 0) > 0.0005 THEN ROUND(t.weighted / t.weight, 2) ELSE 0 END,
+        updated_at = NOW()
+    FROM public.courses c2
+    LEFT JOIN (
+        SELECT course_id,
+               SUM(rating * COALESCE(rating_weight, 0)) AS weighted,
+               SUM(COALESCE(rating_weight, 0)) AS weight,
+               COUNT(*) AS reviews
+        FROM public.reviews
+        WHERE COALESCE(is_visible, TRUE) AND COALESCE(moderation_status, 'pending') <> 'rejected'
+        GROUP BY course_id
+    ) t ON t.course_id = c2.id
+    WHERE c.id = c2.id;
+
+    UPDATE public.teachers te
+    SET weighted_rating_sum = COALESCE(t.weighted, 0),
+        rating_weight_sum = COALESCE(t.weight, 0),
+        total_reviews = COALESCE(t.reviews, 0),
+        average_rating = CASE WHEN COALESCE(t.weight, 0) > 0.0005 THEN ROUND(t.weighted / t.weight, 2) ELSE 0 END,
+        updated_at = NOW()
+    FROM public.teachers te2
+    LEFT JOIN (
+        SELECT teacher_id,
+               SUM(rating * COALESCE(rating_weight, 0)) AS weighted,
+               SUM(COALESCE(rating_weight, 0)) AS weight,
+               COUNT(*) AS reviews
+        FROM public.reviews
+        WHERE COALESCE(is_visible, TRUE) AND COALESCE(moderation_status, 'pending') <> 'rejected'
+        GROUP BY teacher_id
+    ) t ON t.teacher_id = te2.id
+    WHERE te.id = te2.id;
+
+    SELECT COUNT(*) INTO counted
+    FROM public.reviews
+    WHERE COALESCE(is_visible, TRUE) AND COALESCE(moderation_status, 'pending') <> 'rejected';
+    RETURN counted;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.update_review_weights TO service_role;
+GRANT EXECUTE ON FUNCTION public.rebuild_rating_sums TO service_role;
+
+COMMENT ON FUNCTION public.update_review_weights IS 'Batched write of re-scored review credibility; the trigger moves the sums';
+COMMENT ON FUNCTION public.rebuild_rating_sums IS 'Recompute weighted rating sums, averages and review counts for every course and teacher';
+
+-- Existing reviews have no rating_weight yet: run `python recompute_ratings.py` once after this migration
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Verify functions were created
+SELECT
+    routine_name,
+    routine_type,
+    data_type
+FROM information_schema.routines
+WHERE routine_name IN ('bump_rating_sums', 'apply_review_to_rating_sums', 'update_review_weights', 'rebuild_rating_sums');
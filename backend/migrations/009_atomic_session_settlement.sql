@@ -0,0 +1,215 @@
+-- =====================================================
+-- Migration: Atomic Session Settlement
+-- Date: 2026-10-17
+-- Purpose: Settle a session in one round trip and one transaction
+--          (charge + refund ledger rows, session update, teacher
+--          earnings, activity rollup, new balance) instead of a
+--          chain of dependent calls from the backend
+-- =====================================================
+
+-- =====================================================
+-- PostgreSQL Function: Settle one session
+-- p_session_id: sessions.id (UUID) or a client-side video session id ("vs_...", ledger rows only)
+-- p_price_per_minute / p_locked_amount: only read for "vs_" ids; a sessions row always
+--   settles at its course price and stored lock. A "vs_" lock is capped at the lock
+--   payment recorded for it minus the charge/refund rows already written for the id,
+--   and a "vs_" id with any such rows reports that settlement instead of settling again
+--   (the ledger is its permanent "settled" marker, whatever happens to dedupe keys).
+-- Returns: {"session_id", "status", "already_settled", "duration_seconds", "price_per_minute",
+--           "locked_amount", "amount_charged", "refund", "final_balance", "ended_at", ...}
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.settle_session(
+    p_session_id TEXT,
+    p_student_id UUID DEFAULT NULL,
+    p_duration_seconds INTEGER DEFAULT 0,
+    p_price_per_minute DECIMAL DEFAULT NULL,
+    p_locked_amount DECIMAL DEFAULT NULL,
+    p_charge_tx_id TEXT DEFAULT NULL,
+    p_refund_tx_id TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_session_uuid UUID;
+    v_found BOOLEAN := FALSE;
+    s RECORD;
+    v_student UUID;
+    v_teacher UUID;
+    v_price DECIMAL;
+    v_locked DECIMAL;
+    v_lock_paid DECIMAL;
+    v_settled_rows INTEGER;
+    v_charged DECIMAL;
+    v_refunded DECIMAL;
+    v_settled_at TIMESTAMP WITH TIME ZONE;
+    v_duration INTEGER := GREATEST(COALESCE(p_duration_seconds, 0), 0);
+    v_charge DECIMAL(12, 2);
+    v_refund DECIMAL(12, 2);
+    v_now TIMESTAMP WITH TIME ZONE := NOW();
+    v_balance DECIMAL;
+BEGIN
+    IF p_session_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN
+        v_session_uuid := p_session_id::UUID;
+
+        -- Row lock: concurrent settlements of one session serialize here
+        SELECT se.id, se.student_id, se.teacher_id, se.status, se.locked_amount, se.final_cost,
+               se.amount_refunded, se.duration_seconds, se.end_time,
+               c.price_per_minute, c.teacher_id AS course_teacher_id
+        INTO s
+        FROM public.sessions se
+        LEFT JOIN public.courses c ON c.id = se.course_id
+        WHERE se.id = v_session_uuid
+        FOR UPDATE OF se;
+        v_found := FOUND;
+    END IF;
+
+    IF v_found THEN
+        IF p_student_id IS NOT NULL AND s.student_id IS DISTINCT FROM p_student_id THEN
+            RAISE EXCEPTION 'Cannot settle another user''s session';
+        END IF;
+        v_student := s.student_id;
+
+        -- Settled before: report that settlement, write nothing
+        IF s.status IN ('completed', 'refunded') THEN
+            SELECT balance INTO v_balance FROM public.wallet_balances WHERE user_id = v_student;
+            RETURN jsonb_build_object(
+                'session_id', p_session_id,
+                'status', s.status,
+                'already_settled', TRUE,
+                'duration_seconds', COALESCE(s.duration_seconds, 0),
+                'locked_amount', s.locked_amount,
+                'amount_charged', COALESCE(s.final_cost, 0),
+                'refund', COALESCE(s.amount_refunded, 0),
+                'final_balance', ROUND(v_balance, 2),
+                'ended_at', s.end_time
+            );
+        END IF;
+    ELSIF p_session_id NOT LIKE 'vs\_%' OR p_price_per_minute IS NULL OR p_student_id IS NULL THEN
+        RAISE EXCEPTION 'Session % not found', p_session_id;
+    ELSE
+        v_student := p_student_id;
+    END IF;
+
+    IF v_found THEN
+        -- Server-side values only: the caller's price/lock never reach a real session
+        v_price := COALESCE(s.price_per_minute, 0);
+        v_locked := COALESCE(s.locked_amount, 0);
+        v_teacher := COALESCE(s.teacher_id, s.course_teacher_id);
+    ELSE
+        -- No sessions row to lock: concurrent settlements of one "vs_" id serialize here
+        PERFORM pg_advisory_xact_lock(hashtext('settle_session:' || p_session_id));
+
+        SELECT COALESCE(SUM(amount) FILTER (WHERE payment_type = 'lock'), 0),
+               COUNT(*) FILTER (WHERE payment_type IN ('charge', 'refund')),
+               COALESCE(SUM(amount) FILTER (WHERE payment_type = 'charge'), 0),
+               COALESCE(SUM(amount) FILTER (WHERE payment_type = 'refund'), 0),
+               MAX(completed_at) FILTER (WHERE payment_type IN ('charge', 'refund'))
+        INTO v_lock_paid, v_settled_rows, v_charged, v_refunded, v_settled_at
+        FROM public.payments
+        WHERE session_id = p_session_id
+          AND ((payment_type IN ('lock', 'charge') AND from_user_id = v_student)
+               OR (payment_type = 'refund' AND to_user_id = v_student));
+
+        -- Settled before (e.g. its dedupe key expired): report that settlement, write nothing
+        IF v_settled_rows > 0 THEN
+            SELECT balance INTO v_balance FROM public.wallet_balances WHERE user_id = v_student;
+            RETURN jsonb_build_object(
+                'session_id', p_session_id,
+                'status', 'completed',
+                'already_settled', TRUE,
+                'duration_seconds', 0,
+                'locked_amount', v_lock_paid,
+                'amount_charged', v_charged,
+                'refund', v_refunded,
+                'final_balance', ROUND(v_balance, 2),
+                'ended_at', v_settled_at
+            );
+        END IF;
+
+        v_price := GREATEST(p_price_per_minute, 0);
+        v_locked := GREATEST(LEAST(COALESCE(p_locked_amount, v_lock_paid), v_lock_paid - v_charged - v_refunded), 0);
+    END IF;
+
+    -- Charge for the time watched, capped at the lock; the rest of the lock is refunded
+    v_charge := GREATEST(LEAST(ROUND(v_duration / 60.0 * v_price, 2), v_locked), 0);
+    v_refund := GREATEST(ROUND(v_locked - v_charge, 2), 0);
+
+    IF v_charge > 0 THEN
+        INSERT INTO public.payments
+            (session_id, payment_type, amount, from_user_id, to_user_id, gateway_tx_id, gateway_status, completed_at)
+        VALUES
+            (p_session_id, 'charge', v_charge, v_student, v_teacher,
+             COALESCE(p_charge_tx_id, 'charge_' || substr(md5(random()::TEXT), 1, 16)), 'completed', v_now);
+    END IF;
+
+    IF v_refund > 0 THEN
+        INSERT INTO public.payments
+            (session_id, payment_type, amount, to_user_id, gateway_tx_id, gateway_status, completed_at)
+        VALUES
+            (p_session_id, 'refund', v_refund, v_student,
+             COALESCE(p_refund_tx_id, 'refund_' || substr(md5(random()::TEXT), 1, 16)), 'completed', v_now);
+    END IF;
+
+    IF v_found THEN
+        UPDATE public.sessions
+        SET status = 'completed',
+            end_time = v_now,
+            duration_seconds = v_duration,
+            final_cost = v_charge,
+            amount_paid = v_charge,
+            amount_refunded = v_refund,
+            updated_at = v_now
+        WHERE id = v_session_uuid;
+
+        IF v_teacher IS NOT NULL AND v_charge > 0 THEN
+            PERFORM public.increment_earnings(v_teacher, v_charge);
+        END IF;
+
+        -- Analytics must never undo a settlement
+        BEGIN
+            PERFORM public.record_session_activity(v_session_uuid);
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'record_session_activity failed for %: %', v_session_uuid, SQLERRM;
+        END;
+    END IF;
+
+    -- Payments trigger has already moved the materialized balance (migrations/003)
+    SELECT balance INTO v_balance FROM public.wallet_balances WHERE user_id = v_student;
+
+    RETURN jsonb_build_object(
+        'session_id', p_session_id,
+        'status', 'completed',
+        'already_settled', FALSE,
+        'duration_seconds', v_duration,
+        'price_per_minute', v_price,
+        'locked_amount', v_locked,
+        'amount_charged', v_charge,
+        'refund', v_refund,
+        'teacher_id', v_teacher,
+        'final_balance', ROUND(v_balance, 2),
+        'ended_at', v_now
+    );
+END;
+$$;
+
+-- Lock lookup for "vs_" settlements
+CREATE INDEX IF NOT EXISTS idx_payments_session_type ON public.payments(session_id, payment_type);
+
+GRANT EXECUTE ON FUNCTION public.settle_session TO service_role;
+
+COMMENT ON FUNCTION public.settle_session IS 'One-transaction settlement: charge/refund rows, session update, increment_earnings, activity rollup, new wallet balance';
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Verify function was created
+SELECT
+    routine_name,
+    routine_type,
+    data_type
+FROM information_schema.routines
+WHERE routine_name = 'settle_session';
@@ -0,0 +1,139 @@
+-- =====================================================
+-- Migration: Idempotent Session Settlement
+-- Date: 2026-10-17
+-- Purpose: /session/end, /session/end-beacon and the metering socket
+--          can all end the same session; settle it once per
+--          user and session and replay the stored result to repeats
+-- =====================================================
+
+-- One row per settlement key ("<user_id>:<session_id>"); client_key is the Idempotency-Key
+-- the session was settled under, checked against repeats but never used as the key itself.
+-- The claim is permanent; expires_at only ends how long the stored result is kept.
+CREATE TABLE IF NOT EXISTS public.settlement_idempotency (
+    idempotency_key TEXT PRIMARY KEY,
+    user_id UUID NOT NULL,
+    session_id TEXT NOT NULL,
+    client_key TEXT,
+    result JSONB,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_settlement_idempotency_expires
+    ON public.settlement_idempotency(expires_at);
+
+COMMENT ON TABLE public.settlement_idempotency IS 'Permanent settlement claims per user and session; the replayed result is kept until expires_at';
+
+-- =====================================================
+-- PostgreSQL Function: Settle a session at most once per key
+-- Claims the key and settles in the same transaction. A concurrent caller with the same
+-- key blocks on the claim until the first commits, then gets the stored result. Once the
+-- result has expired, a repeat gets settle_session's already-settled report instead
+-- (it reads the session or its ledger rows); a claimed key never settles again.
+-- p_client_key: the request's Idempotency-Key; a repeat carrying a different one is rejected
+-- Returns settle_session's JSONB plus "replayed" (TRUE = stored result, nothing written)
+--   and "idempotency_key" (the client key the settlement was recorded under)
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.settle_session_once(
+    p_idempotency_key TEXT,
+    p_ttl_seconds INTEGER,
+    p_session_id TEXT,
+    p_student_id UUID,
+    p_duration_seconds INTEGER DEFAULT 0,
+    p_price_per_minute DECIMAL DEFAULT NULL,
+    p_locked_amount DECIMAL DEFAULT NULL,
+    p_charge_tx_id TEXT DEFAULT NULL,
+    p_refund_tx_id TEXT DEFAULT NULL,
+    p_client_key TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_claimed TEXT;
+    v_result JSONB;
+    v_client_key TEXT;
+BEGIN
+    -- Claim the key, once and for good
+    INSERT INTO public.settlement_idempotency (idempotency_key, user_id, session_id, client_key, expires_at)
+    VALUES (p_idempotency_key, p_student_id, p_session_id, p_client_key, NOW() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (idempotency_key) DO NOTHING
+    RETURNING idempotency_key INTO v_claimed;
+
+    IF v_claimed IS NULL THEN
+        SELECT result, client_key INTO v_result, v_client_key
+        FROM public.settlement_idempotency
+        WHERE idempotency_key = p_idempotency_key;
+
+        IF p_client_key IS NOT NULL AND v_client_key IS NOT NULL AND p_client_key <> v_client_key THEN
+            RAISE EXCEPTION 'Session % was already settled under a different Idempotency-Key', p_session_id;
+        END IF;
+        IF v_result IS NULL THEN
+            -- Result expired: settle_session sees the earlier settlement and writes nothing
+            v_result := public.settle_session(
+                p_session_id, p_student_id, p_duration_seconds, p_price_per_minute,
+                p_locked_amount, p_charge_tx_id, p_refund_tx_id
+            );
+            IF NOT COALESCE((v_result->>'already_settled')::BOOLEAN, FALSE) THEN
+                RAISE EXCEPTION 'Settlement % was claimed but its session is unsettled', p_idempotency_key;
+            END IF;
+        END IF;
+        RETURN v_result || jsonb_build_object('replayed', TRUE, 'idempotency_key', v_client_key);
+    END IF;
+
+    v_result := public.settle_session(
+        p_session_id, p_student_id, p_duration_seconds, p_price_per_minute,
+        p_locked_amount, p_charge_tx_id, p_refund_tx_id
+    );
+
+    UPDATE public.settlement_idempotency
+    SET result = v_result
+    WHERE idempotency_key = p_idempotency_key;
+
+    RETURN v_result || jsonb_build_object('replayed', FALSE, 'idempotency_key', p_client_key);
+END;
+$$;
+
+-- =====================================================
+-- PostgreSQL Function: Drop expired settlement results
+-- Claims stay (they are what stops a second settlement); only the JSONB is released
+-- Returns: number of results dropped
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION public.purge_settlement_idempotency()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    UPDATE public.settlement_idempotency
+    SET result = NULL
+    WHERE expires_at <= NOW() AND result IS NOT NULL;
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    RETURN removed;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.settle_session_once TO service_role;
+GRANT EXECUTE ON FUNCTION public.purge_settlement_idempotency TO service_role;
+
+COMMENT ON FUNCTION public.settle_session_once IS 'settle_session at most once per user and session; repeats get the stored result, a different Idempotency-Key is rejected';
+COMMENT ON FUNCTION public.purge_settlement_idempotency IS 'Drop stored settlement results past expires_at (claims are kept)';
+
+-- =====================================================
+-- Validation Queries
+-- =====================================================
+
+-- Verify table and functions were created
+SELECT
+    routine_name,
+    routine_type,
+    data_type
+FROM information_schema.routines
+WHERE routine_name IN ('settle_session_once', 'purge_settlement_idempotency');
+
+SELECT COUNT(*) AS settlement_keys FROM public.settlement_idempotency;
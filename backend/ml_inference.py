@@ -0,0 +1,374 @@
+"""
+ML Inference - Serves the three models trained by murph_ml_pipeline.py
+Models come from the model registry (memory-mapped flat tree arrays, see model_registry.py)
+when a version is registered, otherwise from the legacy pickles in ML_MODEL_DIR. Startup only
+discovers them; each model is loaded on its first request and then kept warm. Concurrent
+prediction requests for the same model are micro-batched: rows queue for up to
+ML_BATCH_WAIT_MS (or ML_BATCH_MAX_ROWS) and go through a single predict/predict_proba call
+off the event loop. Feature vectors are built exactly as the pipeline builds them, from raw
+rows or `sessions`.
+"""
+import os
+import time
+import pickle
+import asyncio
+import warnings
+import numpy as np
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from database import supabase
+from wallet_service import WalletService
+import model_registry
+
+
+ML_MODEL_DIR = os.getenv("ML_MODEL_DIR") or os.path.dirname(os.path.abspath(__file__))
+ML_BATCH_MAX_ROWS = int(os.getenv("ML_BATCH_MAX_ROWS", "512"))
+ML_BATCH_WAIT_MS = float(os.getenv("ML_BATCH_WAIT_MS", "5"))
+# LabelEncoder order used in training (sorted device names); unknown devices map to the first
+ML_DEVICE_CLASSES = [d.strip() for d in os.getenv("ML_DEVICE_CLASSES", "desktop,mobile,tablet").split(",") if d.strip()]
+
+# Feature columns, in the order each model was trained on (see murph_ml_pipeline.py)
+FEATURES_LEARNING_SUCCESS = [
+    "completion_percentage_video", "watch_time_sec", "video_length_sec", "device_encoded", "hour_of_day"
+]
+FEATURES_CREDIBILITY = [
+    "engagement_depth_score", "early_exit_flag", "mcq_participation_flag", "consistent_learner_score",
+    "time_investment_score", "assessment_performance_weight", "completion_percentage_video",
+    "watch_time_sec", "device_encoded"
+]
+FEATURES_DROPOFF_RISK = ["watch_time_sec", "video_length_sec", "device_encoded", "hour_of_day", "day_of_week"]
+
+# name -> (pickle file, feature columns, output)
+MODEL_SPECS = {
+    "learning_success": ("model_learning_success.pkl", FEATURES_LEARNING_SUCCESS, "probability"),
+    "credibility": ("model_credibility_scorer.pkl", FEATURES_CREDIBILITY, "score"),
+    "dropoff_risk": ("model_dropoff_risk.pkl", FEATURES_DROPOFF_RISK, "probability"),
+}
+
+# Every column engineer_features produces
+FEATURE_NAMES = set(FEATURES_LEARNING_SUCCESS) | set(FEATURES_CREDIBILITY) | set(FEATURES_DROPOFF_RISK)
+
+# Raw inputs every feature is derived from
+RAW_COLUMNS = [
+    "completion_percentage_video", "watch_time_sec", "video_length_sec", "device",
+    "hour_of_day", "day_of_week", "mcq_attempted", "mcq_solve_rate"
+]
+
+
+class ModelUnavailable(Exception):
+    """Model not registered, or its files could not be loaded"""
+
+
+def encode_device(devices: List[Any]) -> np.ndarray:
+    """LabelEncoder-compatible codes for device names"""
+    lookup = {name: code for code, name in enumerate(ML_DEVICE_CLASSES)}
+    return np.array([lookup.get(str(d or "").lower(), 0) for d in devices], dtype=np.float64)
+
+
+def engineer_features(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Columnar features for a batch of raw rows (RAW_COLUMNS), same formulas as the pipeline
+    Missing values fall back to 0 (False for mcq_attempted, "desktop"-class device)
+    """
+    def column(name: str) -> np.ndarray:
+        return np.array([float(row.get(name) or 0) for row in rows], dtype=np.float64)
+
+    completion = column("completion_percentage_video")
+    watch = column("watch_time_sec")
+    length = column("video_length_sec")
+    safe_length = np.where(length > 0, length, np.inf)
+
+    features = {
+        "completion_percentage_video": completion,
+        "watch_time_sec": watch,
+        "video_length_sec": length,
+        "device_encoded": encode_device([row.get("device") for row in rows]),
+        "hour_of_day": column("hour_of_day"),
+        "day_of_week": column("day_of_week"),
+    }
+    watch_ratio = watch / safe_length
+    features["engagement_depth_score"] = 0.6 * (completion / 100) + 0.4 * np.minimum(watch_ratio, 1)
+    features["early_exit_flag"] = (completion < 10).astype(np.float64)
+    features["mcq_participation_flag"] = column("mcq_attempted")
+    features["consistent_learner_score"] = np.where(completion > 60, 1.0, completion / 60)
+    features["time_investment_score"] = np.minimum(watch / (safe_length * 0.8), 1.0)
+    features["assessment_performance_weight"] = column("mcq_solve_rate")
+    return features
+
+
+def feature_matrix(rows: List[Dict[str, Any]], columns: List[str]) -> np.ndarray:
+    features = engineer_features(rows)
+    return np.column_stack([features[name] for name in columns])
+
+
+def session_to_row(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Raw model inputs from a sessions row joined with courses(total_duration_minutes)"""
+    progress = session.get("content_progress") or {}
+    completion = session.get("completion_pct")
+    if completion is None:
+        completion = progress.get("completion_pct", 0)
+
+    started = session.get("start_time") or session.get("created_at")
+    when = datetime.fromisoformat(started.replace("Z", "+00:00")) if started else None
+    course = session.get("courses") or {}
+    score = session.get("assessment_score")
+
+    return {
+        "completion_percentage_video": float(completion or 0),
+        "watch_time_sec": float(session.get("duration_seconds") or 0),
+        "video_length_sec": float(course.get("total_duration_minutes") or 0) * 60,
+        "device": progress.get("device"),
+        "hour_of_day": when.hour if when else 0,
+        "day_of_week": when.weekday() if when else 0,
+        "mcq_attempted": bool(session.get("assessment_taken")),
+        "mcq_solve_rate": (score or 0) / 100
+    }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predict calls for one model into batched model calls
+    The model itself is loaded by `loader` on the first batch unless given up front
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Any,
+        columns: List[str],
+        output: str,
+        loader: Optional[Callable[[], Any]] = None,
+        source: str = "memory"
+    ):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.output = output
+        self.loader = loader
+        self.source = source
+        self.load_ms: Optional[float] = None
+        self.loading: Optional[asyncio.Task] = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        self.counters = {"requests": 0, "rows": 0, "batches": 0}
+
+    async def _load(self) -> Optional[str]:
+        """Load the model on first use; returns an error message if that fails"""
+        started = time.perf_counter()
+        try:
+            self.model = await asyncio.to_thread(self.loader)
+        except Exception as e:
+            print(f"⚠️ Could not load {self.name} model ({self.source}): {str(e)}")
+            return f"{type(e).__name__}: {str(e)}"
+        self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+        print(f"🤖 Loaded {self.name} model ({self.source}) in {self.load_ms}ms")
+        return None
+
+    async def ensure_loaded(self) -> Optional[str]:
+        """Load the model once however many callers wait on it; returns an error message if that fails"""
+        if self.model is not None:
+            return None
+        if self.loading is None:
+            self.loading = asyncio.create_task(self._load())
+        return await self.loading
+
+    def _predict(self, matrix: np.ndarray) -> np.ndarray:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            if self.output == "probability":
+                return self.model.predict_proba(matrix)[:, 1]
+            return np.clip(self.model.predict(matrix), 0, 1)
+
+    async def predict(self, rows: List[Dict[str, Any]]) -> List[float]:
+        if not rows:
+            return []
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self.counters["requests"] += 1
+        await self.queue.put((feature_matrix(rows, self.columns), future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + ML_BATCH_WAIT_MS / 1000
+            while size < ML_BATCH_MAX_ROWS:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            if self.model is None:
+                error = await self.ensure_loaded()
+                if error:
+                    self._fail_all(pending, error)
+                    return
+
+            matrices = [matrix for matrix, _ in pending]
+            try:
+                predictions = await asyncio.to_thread(self._predict, np.vstack(matrices))
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(ValueError(f"Failed to run {self.name} model: {str(e)}"))
+                continue
+
+            self.counters["rows"] += size
+            self.counters["batches"] += 1
+            offset = 0
+            for matrix, future in pending:
+                if not future.done():
+                    future.set_result([round(float(p), 4) for p in predictions[offset:offset + len(matrix)]])
+                offset += len(matrix)
+
+    def _fail_all(self, pending: List[Tuple[np.ndarray, asyncio.Future]], error: str) -> None:
+        """Unservable model: answer everything queued with ModelUnavailable and stop serving it"""
+        load_errors[self.name] = error
+        if batchers.get(self.name) is self:
+            del batchers[self.name]
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(ModelUnavailable(error))
+
+    def stop(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+
+
+# name -> MicroBatcher for every model that loaded; name -> error for the rest
+batchers: Dict[str, MicroBatcher] = {}
+load_errors: Dict[str, str] = {}
+
+
+def load_pickle(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_models() -> Dict[str, Any]:
+    """
+    Find every model (registry version first, then legacy pickle) without loading it yet
+    Registered models are served with the feature order stored in their metadata
+    """
+    for name, (filename, columns, output) in MODEL_SPECS.items():
+        version = model_registry.current_version(name)
+        path = os.path.join(ML_MODEL_DIR, filename)
+        try:
+            if version:
+                metadata = model_registry.read_metadata(name, version)
+                missing = [column for column in metadata["features"] if column not in FEATURE_NAMES]
+                if missing:
+                    raise ValueError(f"unknown feature columns {missing}")
+                register_model(
+                    name, loader=partial(model_registry.load_model, name, version),
+                    columns=metadata["features"], source=f"registry:{version}"
+                )
+            elif os.path.exists(path):
+                register_model(name, loader=partial(load_pickle, path), source=f"pickle:{filename}")
+            else:
+                load_errors[name] = f"No registered version and no {path}"
+        except Exception as e:
+            load_errors[name] = f"{type(e).__name__}: {str(e)}"
+            print(f"⚠️ Could not register {name} model: {str(e)}")
+    return stats()
+
+
+def register_model(
+    name: str,
+    model: Any = None,
+    loader: Optional[Callable[[], Any]] = None,
+    columns: Optional[List[str]] = None,
+    source: str = "memory"
+) -> None:
+    """Serve `model` (or whatever `loader` returns on first use) under `name`"""
+    _, spec_columns, output = MODEL_SPECS[name]
+    previous = batchers.get(name)
+    if previous is not None:
+        previous.stop()
+    batchers[name] = MicroBatcher(name, model, columns or spec_columns, output, loader, source)
+    load_errors.pop(name, None)
+
+
+def shutdown_models() -> None:
+    for batcher in batchers.values():
+        batcher.stop()
+
+
+async def loaded_batcher(name: str) -> MicroBatcher:
+    """Batcher for `name` with its model in memory, for callers that run whole matrices themselves"""
+    batcher = batchers.get(name)
+    if batcher is None:
+        raise ModelUnavailable(load_errors.get(name, f"Model {name} not loaded"))
+    error = await batcher.ensure_loaded()
+    if error:
+        batcher._fail_all([], error)
+        raise ModelUnavailable(error)
+    return batcher
+
+
+async def predict(name: str, rows: List[Dict[str, Any]]) -> List[float]:
+    """Predictions for raw rows (see RAW_COLUMNS) from one model"""
+    if name not in MODEL_SPECS:
+        raise ValueError(f"Unknown model: {name}")
+    batcher = batchers.get(name)
+    if batcher is None:
+        raise ModelUnavailable(load_errors.get(name, f"Model {name} not loaded"))
+    return await batcher.predict(rows)
+
+
+async def predict_sessions(session_ids: List[str], user_id: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    All available model outputs for each session the user is the student or teacher of
+    Returns (results, missing session ids); ids that are not UUIDs (e.g. vs_ sessions) or
+    belong to someone else are reported as missing
+    """
+    lookup_ids = [sid for sid in session_ids if WalletService.is_valid_uuid(sid)]
+    sessions = []
+    if lookup_ids:
+        result = await supabase.table("sessions")\
+            .select("id, duration_seconds, completion_pct, content_progress, start_time, created_at, "
+                    "assessment_taken, assessment_score, courses(total_duration_minutes)")\
+            .in_("id", lookup_ids)\
+            .or_(f"student_id.eq.{user_id},teacher_id.eq.{user_id}")\
+            .execute()
+        sessions = result.data or []
+    rows = [session_to_row(session) for session in sessions]
+
+    names = [name for name in MODEL_SPECS if name in batchers]
+    outputs = await asyncio.gather(*(predict(name, rows) for name in names), return_exceptions=True) if rows else []
+    for output in outputs:
+        if isinstance(output, Exception) and not isinstance(output, ModelUnavailable):
+            raise output
+
+    results = []
+    for i, session in enumerate(sessions):
+        entry = {"session_id": session["id"]}
+        for name, values in zip(names, outputs):
+            if not isinstance(values, Exception):
+                entry[name] = values[i]
+        results.append(entry)
+
+    found = {session["id"] for session in sessions}
+    return results, [sid for sid in session_ids if sid not in found]
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "available": sorted(batchers),
+        "loaded": sorted(name for name, batcher in batchers.items() if batcher.model is not None),
+        "sources": {name: batcher.source for name, batcher in batchers.items()},
+        "load_ms": {name: batcher.load_ms for name, batcher in batchers.items() if batcher.load_ms is not None},
+        "errors": dict(load_errors),
+        "batching": {name: batcher.counters for name, batcher in batchers.items()}
+    }
@@ -0,0 +1,293 @@
+"""
+Model Registry - Versioned, pickle-free storage for the pipeline's tree ensembles
+Each trained model is flattened into plain node arrays (feature, threshold, children, leaf
+value) saved as .npy files next to a metadata.json (feature list, training data hash, metrics).
+Loading memory-maps the arrays, so it takes milliseconds, needs neither pickle nor scikit-learn,
+and every worker process shares one copy of the pages. FlatTreeEnsemble reproduces
+predict / predict_proba of the original estimator.
+
+Layout: ML_REGISTRY_DIR/<model name>/<version>/{*.npy, metadata.json}, plus
+ML_REGISTRY_DIR/<model name>/CURRENT naming the version that is served.
+
+Usage: python model_registry.py list
+       python model_registry.py import <model name> <pickle path>   (needs a loadable pickle)
+"""
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+ML_REGISTRY_DIR = os.getenv("ML_REGISTRY_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "model_registry"
+)
+
+ARRAY_NAMES = ["feature", "threshold", "left", "right", "value", "roots"]
+KINDS = {"gradient_boosting_classifier", "gradient_boosting_regressor", "random_forest_classifier"}
+
+
+class FlatTreeEnsemble:
+    """
+    Tree ensemble over flat node arrays (all trees concatenated, children as global indices,
+    left == -1 marks a leaf). Inputs are compared as float32, like scikit-learn does
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.metadata = metadata
+        self.kind = metadata["kind"]
+        self.max_depth = int(metadata["max_depth"])
+
+        # Traversal tables (small, built once per load): children interleaved as
+        # [left, right] per node and leaves pointing at themselves, so every step is
+        # one gather with no leaf test
+        is_leaf = self.left == -1
+        index = np.arange(len(self.left), dtype=np.int32)
+        self.children = np.empty(2 * len(self.left), dtype=np.int32)
+        self.children[0::2] = np.where(is_leaf, index, self.left)
+        self.children[1::2] = np.where(is_leaf, index, self.right)
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """(rows x trees) index of the leaf each row reaches in each tree"""
+        X = np.asarray(X, dtype=np.float32)
+        flat = X.ravel()
+        row_start = (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            # Right unless value <= threshold (so NaN goes right, as in scikit-learn)
+            goes_right = ~(flat[row_start + self.feature[node]] <= self.threshold[node])
+            node = self.children[2 * node + goes_right]
+        return node
+
+    def raw_predict(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.leaves(X)
+        if self.kind == "random_forest_classifier":
+            proba = np.zeros((len(leaves), self.value.shape[1]))
+            for tree in range(leaves.shape[1]):
+                proba += self.value[leaves[:, tree]]
+            return proba / leaves.shape[1]
+
+        # Gradient boosting: init score plus each stage's scaled leaf value, added in stage order
+        learning_rate = self.metadata["learning_rate"]
+        raw = np.full(len(leaves), self.metadata["init_raw"], dtype=np.float64)
+        for tree in range(leaves.shape[1]):
+            raw += learning_rate * self.value[leaves[:, tree], 0]
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if self.kind == "gradient_boosting_regressor":
+            raise ValueError("Regressor has no predict_proba")
+        raw = self.raw_predict(X)
+        if self.kind == "random_forest_classifier":
+            return raw
+        positive = 1.0 / (1.0 + np.exp(-raw))
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if self.kind == "gradient_boosting_regressor":
+            return self.raw_predict(X)
+        classes = np.asarray(self.metadata["classes"])
+        return classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+
+def flatten_trees(trees: List[Any], normalize: bool) -> Tuple[Dict[str, np.ndarray], int]:
+    """Concatenate fitted sklearn Tree objects into flat arrays; returns (arrays, max depth)"""
+    parts = {name: [] for name in ARRAY_NAMES if name != "roots"}
+    roots = []
+    offset = 0
+    for tree in trees:
+        count = tree.node_count
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        parts["left"].append(np.where(left == -1, -1, left + offset))
+        parts["right"].append(np.where(right == -1, -1, right + offset))
+        parts["feature"].append(np.maximum(tree.feature, 0).astype(np.int32))
+        parts["threshold"].append(tree.threshold.astype(np.float64))
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        if normalize:  # Class fractions per node, as DecisionTreeClassifier.predict_proba returns
+            value = value / value.sum(axis=1, keepdims=True)
+        parts["value"].append(value)
+        roots.append(offset)
+        offset += count
+
+    arrays = {name: np.ascontiguousarray(np.concatenate(chunks)) for name, chunks in parts.items()}
+    arrays["roots"] = np.array(roots, dtype=np.int32)
+    return arrays, max(tree.max_depth for tree in trees)
+
+
+def flatten_model(model: Any) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Flat arrays plus model-level metadata for a fitted sklearn ensemble"""
+    name = type(model).__name__
+    if name in ("GradientBoostingClassifier", "GradientBoostingRegressor"):
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Only binary gradient boosting classifiers are supported")
+        arrays, depth = flatten_trees([stage[0].tree_ for stage in model.estimators_], normalize=False)
+        n_features = model.n_features_in_
+        meta = {
+            "kind": "gradient_boosting_classifier" if name == "GradientBoostingClassifier" else "gradient_boosting_regressor",
+            "learning_rate": float(model.learning_rate),
+            "init_raw": float(np.ravel(model._raw_predict_init(np.zeros((1, n_features))))[0]),
+        }
+    elif name == "RandomForestClassifier":
+        arrays, depth = flatten_trees([estimator.tree_ for estimator in model.estimators_], normalize=True)
+        meta = {"kind": "random_forest_classifier"}
+    else:
+        raise ValueError(f"Unsupported model type for the registry: {name}")
+
+    if hasattr(model, "classes_"):
+        meta["classes"] = [item.item() if hasattr(item, "item") else item for item in model.classes_]
+    meta.update({
+        "estimator": name,
+        "n_features": int(model.n_features_in_),
+        "n_trees": int(len(arrays["roots"])),
+        "n_nodes": int(len(arrays["left"])),
+        "max_depth": int(depth),
+    })
+    from sklearn import __version__ as sklearn_version  # Only needed when exporting
+    meta["sklearn_version"] = sklearn_version
+    return arrays, meta
+
+
+def model_dir(name: str, registry_dir: Optional[str] = None) -> str:
+    return os.path.join(registry_dir or ML_REGISTRY_DIR, name)
+
+
+def export_model(
+    name: str,
+    model: Any,
+    features: List[str],
+    training_data_hash: Optional[str] = None,
+    metrics: Optional[Dict[str, Any]] = None,
+    registry_dir: Optional[str] = None,
+    activate: bool = True
+) -> str:
+    """Write a new version of `name` and (by default) make it CURRENT; returns the version"""
+    arrays, meta = flatten_model(model)
+    if len(features) != meta["n_features"]:
+        raise ValueError(f"{name}: {len(features)} feature names for a model trained on {meta['n_features']}")
+
+    digest = hashlib.sha256()
+    for array_name in ARRAY_NAMES:
+        digest.update(arrays[array_name].tobytes())
+    digest.update(json.dumps([meta, features], sort_keys=True).encode())
+    created = datetime.now(timezone.utc)
+    version = f"{created.strftime('%Y%m%d%H%M%S')}-{digest.hexdigest()[:8]}"
+
+    meta.update({
+        "name": name,
+        "version": version,
+        "features": list(features),
+        "training_data_hash": training_data_hash,
+        "metrics": metrics or {},
+        "created_at": created.isoformat(),
+    })
+
+    target = os.path.join(model_dir(name, registry_dir), version)
+    staging = target + ".building"
+    os.makedirs(staging, exist_ok=True)
+    for array_name in ARRAY_NAMES:
+        np.save(os.path.join(staging, f"{array_name}.npy"), arrays[array_name])
+    with open(os.path.join(staging, "metadata.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(staging, target)
+
+    if activate:
+        activate_version(name, version, registry_dir)
+    return version
+
+
+def activate_version(name: str, version: str, registry_dir: Optional[str] = None) -> None:
+    """Point CURRENT at `version` (atomic rename, so readers never see a partial file)"""
+    directory = model_dir(name, registry_dir)
+    if not os.path.isdir(os.path.join(directory, version)):
+        raise ValueError(f"Unknown version {version} of {name}")
+    staging = os.path.join(directory, "CURRENT.tmp")
+    with open(staging, "w") as f:
+        f.write(version)
+    os.replace(staging, os.path.join(directory, "CURRENT"))
+
+
+def current_version(name: str, registry_dir: Optional[str] = None) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir(name, registry_dir), "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(name: str, registry_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Metadata of every stored version of `name`, oldest first"""
+    directory = model_dir(name, registry_dir)
+    if not os.path.isdir(directory):
+        return []
+    versions = []
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry, "metadata.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                versions.append(json.load(f))
+    return versions
+
+
+def read_metadata(name: str, version: str, registry_dir: Optional[str] = None) -> Dict[str, Any]:
+    with open(os.path.join(model_dir(name, registry_dir), version, "metadata.json")) as f:
+        return json.load(f)
+
+
+def load_model(
+    name: str,
+    version: Optional[str] = None,
+    registry_dir: Optional[str] = None
+) -> FlatTreeEnsemble:
+    """Memory-mapped model (CURRENT version unless `version` is given)"""
+    version = version or current_version(name, registry_dir)
+    if not version:
+        raise FileNotFoundError(f"No registered version of {name} in {model_dir(name, registry_dir)}")
+    path = os.path.join(model_dir(name, registry_dir), version)
+    metadata = read_metadata(name, version, registry_dir)
+    if metadata.get("kind") not in KINDS:
+        raise ValueError(f"Unsupported model kind in {path}: {metadata.get('kind')}")
+    arrays = {array_name: np.load(os.path.join(path, f"{array_name}.npy"), mmap_mode="r") for array_name in ARRAY_NAMES}
+    return FlatTreeEnsemble(arrays, metadata)
+
+
+def main(argv: List[str]) -> None:
+    if argv[:1] == ["list"]:
+        root = ML_REGISTRY_DIR
+        for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            active = current_version(name)
+            for meta in list_versions(name):
+                marker = "*" if meta["version"] == active else " "
+                print(f"{marker} {name:20s} {meta['version']}  {meta['estimator']:28s} "
+                      f"{meta['n_trees']} trees / {meta['n_nodes']} nodes  data {meta.get('training_data_hash')}")
+    elif argv[:1] == ["import"] and len(argv) == 3:
+        import pickle
+        from murph_ml_pipeline import FEATURE_COLS, REGISTRY_NAMES
+
+        name, path = argv[1], argv[2]
+        stages = {registry_name: stage for stage, registry_name in REGISTRY_NAMES.items()}
+        if name not in stages:
+            raise ValueError(f"Unknown model {name}; expected one of {list(stages)}")
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+        version = export_model(name, model, FEATURE_COLS[stages[name]])
+        print(f"✅ Registered {name} {version}")
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -65,6 +65,7 @@ class SessionCreateRequest(BaseModel):
     course_id: str
     student_id: str
     locked_amount: float = Field(gt=0, description="Amount to lock (e.g., $30)")
+    timezone: Optional[str] = None  # Browser IANA timezone, used for streak and daily activity day boundaries
 
 
 class SessionCreateResponse(BaseModel):
@@ -84,6 +85,23 @@ class SessionCompleteRequest(BaseModel):
     duration_seconds: int = Field(ge=0)
 
 
+class SessionMetricsUpdate(BaseModel):
+    """Playback heartbeat (sent every ~5 seconds per viewer)"""
+    duration_seconds: int = Field(ge=0)
+    completion_pct: float = Field(ge=0, le=100)
+    current_lecture: Optional[int] = None
+    price_per_minute: Optional[float] = Field(default=None, ge=0)  # For the running cost estimate
+
+
+class SessionMetricsResponse(BaseModel):
+    session_id: str
+    duration_seconds: int
+    completion_pct: float
+    current_lecture: Optional[int]
+    final_cost: float
+    updated_at: datetime
+
+
 # Payment Models
 class PaymentLockRequest(BaseModel):
     session_id: str
@@ -156,6 +174,7 @@ class VideoSessionStartRequest(BaseModel):
     course_id: Optional[str] = None
     lock_amount: Optional[float] = None  # Frontend can specify lock amount
     price_per_minute: Optional[float] = None  # Frontend can specify price
+    timezone: Optional[str] = None  # Browser IANA timezone, used for streak and daily activity day boundaries
 
 
 class VideoSessionStartResponse(BaseModel):
@@ -172,6 +191,7 @@ class VideoSessionEndRequest(BaseModel):
     duration_seconds: int = 0  # Frontend sends actual watch time
     price_per_minute: float = 2.0  # Price used for calculation
     locked_amount: float = 30.0  # Amount that was locked
+    idempotency_key: Optional[str] = None  # Checked against the key the session was settled under
 
 
 class VideoSessionEndResponse(BaseModel):
@@ -184,6 +204,7 @@ class VideoSessionEndResponse(BaseModel):
     refund: float
     final_balance: float
     ended_at: datetime
+    replayed: bool = False  # True when this session was already settled and the first result is returned
 
 
 # Course Pricing Models
@@ -258,3 +279,53 @@ class SessionHistoryItem(BaseModel):
 class SessionHistoryResponse(BaseModel):
     """List of user's recent sessions"""
     sessions: list[SessionHistoryItem]
+
+
+# ============================================================================
+# REVIEW MODELS
+# ============================================================================
+
+class ReviewCreateRequest(BaseModel):
+    """Student review of one completed session"""
+    session_id: str
+    rating: int = Field(ge=1, le=5)
+    review_text: Optional[str] = Field(default=None, max_length=5000)
+
+
+class ReviewCreateResponse(BaseModel):
+    review_id: Optional[str] = None
+    course_id: str
+    teacher_id: str
+    rating: int
+    credibility_score: float
+    rating_weight: float = Field(description="Weight of this review in the course and teacher average_rating")
+    credibility_source: str
+
+
+# ============================================================================
+# ML INFERENCE MODELS
+# ============================================================================
+
+class PredictionRow(BaseModel):
+    """Raw engagement inputs; derived features are computed server-side"""
+    completion_percentage_video: float = Field(default=0, ge=0, le=100)
+    watch_time_sec: float = Field(default=0, ge=0)
+    video_length_sec: float = Field(default=0, ge=0)
+    device: Optional[str] = None
+    hour_of_day: int = Field(default=0, ge=0, le=23)
+    day_of_week: int = Field(default=0, ge=0, le=6)
+    mcq_attempted: bool = False
+    mcq_solve_rate: float = Field(default=0, ge=0, le=1)
+
+
+class PredictionRequest(BaseModel):
+    rows: list[PredictionRow] = Field(min_length=1, max_length=1000)
+
+
+class PredictionResponse(BaseModel):
+    model: str
+    predictions: list[float]
+
+
+class SessionPredictionRequest(BaseModel):
+    session_ids: list[str] = Field(min_length=1, max_length=200)
@@ -5,6 +5,7 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any
 from database import supabase
+from ledger_writer import ledger_writer
 
 
 class PaymentService:
@@ -33,9 +34,7 @@ class PaymentService:
             "completed_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table("payments").insert(payment_data).execute()
-        
-        return result.data[0] if result.data else None
+        return await ledger_writer.write(payment_data)
     
     @staticmethod
     async def charge_payment(session_id: str, student_id: str, teacher_id: str, amount: float) -> Dict[str, Any]:
@@ -56,9 +55,7 @@ class PaymentService:
             "completed_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table("payments").insert(payment_data).execute()
-        
-        return result.data[0] if result.data else None
+        return await ledger_writer.write(payment_data)
     
     @staticmethod
     async def refund_payment(session_id: str, student_id: str, amount: float) -> Dict[str, Any]:
@@ -78,22 +75,20 @@ class PaymentService:
             "completed_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table("payments").insert(payment_data).execute()
-        
-        return result.data[0] if result.data else None
+        return await ledger_writer.write(payment_data)
     
     @staticmethod
     async def get_payment_history(user_id: str) -> list[Dict[str, Any]]:
         """Get all payments for a user (sent or received)"""
         
         # Get payments sent by user
-        sent = supabase.table("payments")\
+        sent = await supabase.table("payments")\
             .select("*")\
             .eq("from_user_id", user_id)\
             .execute()
         
         # Get payments received by user
-        received = supabase.table("payments")\
+        received = await supabase.table("payments")\
             .select("*")\
             .eq("to_user_id", user_id)\
             .execute()
@@ -116,7 +111,7 @@ class SessionService:
         Flow: Lock funds → Create session record
         """
         # Get course details to find teacher_id and price
-        course = supabase.table("courses").select("*").eq("id", course_id).single().execute()
+        course = await supabase.table("courses").select("*").eq("id", course_id).single().execute()
         
         if not course.data:
             raise ValueError(f"Course {course_id} not found")
@@ -137,7 +132,7 @@ class SessionService:
             "lock_tx_id": lock_tx_id
         }
         
-        session_result = supabase.table("sessions").insert(session_data).execute()
+        session_result = await supabase.table("sessions").insert(session_data).execute()
         
         if not session_result.data:
             raise ValueError("Failed to create session")
@@ -160,7 +155,7 @@ class SessionService:
             "start_time": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table("sessions")\
+        result = await supabase.table("sessions")\
             .update(update_data)\
             .eq("id", session_id)\
             .execute()
@@ -171,73 +166,37 @@ class SessionService:
     async def complete_session(session_id: str, duration_seconds: int) -> Dict[str, Any]:
         """
         Complete session and process payments
-        Flow: Calculate cost → Charge teacher → Refund student remainder
+        Flow: Calculate cost → Charge teacher → Refund student remainder → Credit earnings
         """
-        # Get session details
-        session = supabase.table("sessions").select("*").eq("id", session_id).single().execute()
-        
-        if not session.data:
-            raise ValueError(f"Session {session_id} not found")
-        
-        session_data = session.data
-        
-        # Get course pricing
-        course = supabase.table("courses")\
-            .select("price_per_minute")\
-            .eq("id", session_data["course_id"])\
-            .single()\
-            .execute()
-        
-        price_per_minute = float(course.data["price_per_minute"])
-        
-        # Calculate final cost based on actual duration
-        duration_minutes = duration_seconds / 60
-        final_cost = round(price_per_minute * duration_minutes, 2)
-        
-        # Ensure final cost doesn't exceed locked amount
-        locked_amount = float(session_data["locked_amount"])
-        if final_cost > locked_amount:
-            final_cost = locked_amount
-        
-        # Calculate refund
-        refund_amount = round(locked_amount - final_cost, 2)
-        
-        # Update session
-        update_data = {
-            "status": "completed",
-            "end_time": datetime.utcnow().isoformat(),
-            "duration_seconds": duration_seconds,
-            "final_cost": final_cost,
-            "amount_paid": final_cost,
-            "amount_refunded": refund_amount
+        # One transaction: prices from the course, capped at the session lock
+        # (see migrations/009_atomic_session_settlement.sql); a settled session is not charged twice
+        try:
+            settled = await supabase.rpc("settle_session", {
+                "p_session_id": session_id,
+                "p_duration_seconds": duration_seconds,
+                "p_charge_tx_id": PaymentService.generate_tx_id("charge"),
+                "p_refund_tx_id": PaymentService.generate_tx_id("refund")
+            }).execute()
+        except Exception as e:
+            raise ValueError(f"Failed to complete session: {str(e)}")
+        
+        settlement = settled.data
+        if not settlement:
+            return None
+        
+        return {
+            "id": session_id,
+            "status": settlement["status"],
+            "duration_seconds": settlement["duration_seconds"],
+            "final_cost": settlement["amount_charged"],
+            "amount_paid": settlement["amount_charged"],
+            "amount_refunded": settlement["refund"],
+            "final_balance": settlement.get("final_balance"),
+            "already_settled": settlement.get("already_settled", False)
         }
-        
-        updated_session = supabase.table("sessions")\
-            .update(update_data)\
-            .eq("id", session_id)\
-            .execute()
-        
-        # Process payment to teacher
-        if final_cost > 0:
-            await PaymentService.charge_payment(
-                session_id,
-                session_data["student_id"],
-                session_data["teacher_id"],
-                final_cost
-            )
-        
-        # Refund remaining to student
-        if refund_amount > 0:
-            await PaymentService.refund_payment(
-                session_id,
-                session_data["student_id"],
-                refund_amount
-            )
-        
-        return updated_session.data[0] if updated_session.data else None
     
     @staticmethod
     async def get_session_status(session_id: str) -> Dict[str, Any]:
         """Get current session status and payment details"""
-        result = supabase.table("sessions").select("*").eq("id", session_id).single().execute()
+        result = await supabase.table("sessions").select("*").eq("id", session_id).single().execute()
         return result.data if result.data else None
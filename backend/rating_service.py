@@ -0,0 +1,204 @@
+"""
+Rating Service - Credibility-weighted course and teacher ratings
+Every review is scored by the credibility model (rule-based baseline when the model is not
+available) from the engagement of the session it reviews. Its rating_weight is the score, or
+0 below RATING_MIN_CREDIBILITY. courses / teachers keep running sums of rating * weight and
+weight, moved in O(1) per review by a trigger (see migrations/008), so average_rating is
+always weighted_rating_sum / rating_weight_sum.
+The recompute job re-scores every review with one vectorized model call per page and
+rebuilds the sums.
+"""
+import os
+import asyncio
+import numpy as np
+from typing import Any, Dict, List, Optional
+from database import supabase
+from credibility import baseline_credibility
+import ml_inference
+
+
+RATING_MIN_CREDIBILITY = float(os.getenv("RATING_MIN_CREDIBILITY", "0.3"))
+RATING_RECOMPUTE_PAGE = int(os.getenv("RATING_RECOMPUTE_PAGE", "5000"))
+RATING_UPDATE_BATCH = 500
+
+CREDIBILITY_MODEL = "credibility"
+
+# The reviewed session with everything session_to_row reads
+SESSION_FIELDS = (
+    "duration_seconds, content_progress, start_time, created_at, "
+    "assessment_taken, assessment_score, courses(total_duration_minutes)"
+)
+
+
+def clip_credibility(scores: np.ndarray) -> np.ndarray:
+    """Scores as stored: within reviews.credibility_score's CHECK (0-1), NaN = no credibility"""
+    scores = np.nan_to_num(np.asarray(scores, dtype=np.float64), nan=0.0, posinf=1.0, neginf=0.0)
+    return np.round(np.clip(scores, 0.0, 1.0), 3)
+
+
+def review_weights(credibility: np.ndarray) -> np.ndarray:
+    """Weight of each review in the averages: its credibility, or 0 when below the minimum"""
+    credibility = np.clip(np.asarray(credibility, dtype=np.float64), 0, 1)
+    return np.round(np.where(credibility >= RATING_MIN_CREDIBILITY, credibility, 0.0), 3)
+
+
+def engagement_metrics(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Snapshot stored with the review (reviews.engagement_metrics)"""
+    row = ml_inference.session_to_row(session)
+    return {
+        "duration_sec": int(row["watch_time_sec"]),
+        "completion_pct": round(row["completion_percentage_video"], 2),
+        "assessment_score": session.get("assessment_score")
+    }
+
+
+class RatingService:
+    """Review credibility scoring and the weighted rating aggregates"""
+
+    @staticmethod
+    async def score_credibility(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Credibility (0-1) for raw model rows in one vectorized call
+        Model output is a regression, so it is clipped to 0-1 like the baseline
+        Returns {"scores": array, "source": "model" | "baseline"}
+        """
+        if not rows:
+            return {"scores": np.zeros(0), "source": "model"}
+        try:
+            batcher = await ml_inference.loaded_batcher(CREDIBILITY_MODEL)
+            matrix = ml_inference.feature_matrix(rows, batcher.columns)
+            scores = await asyncio.to_thread(batcher._predict, matrix)
+            return {"scores": clip_credibility(scores), "source": "model"}
+        except ml_inference.ModelUnavailable:
+            scores = baseline_credibility(ml_inference.engineer_features(rows))
+            return {"scores": clip_credibility(scores), "source": "baseline"}
+
+    @staticmethod
+    async def submit_review(
+        user_id: str,
+        session_id: str,
+        rating: int,
+        review_text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Score and store a student's review of their completed session
+        The insert trigger moves the course and teacher sums; nothing is recomputed here
+        """
+        try:
+            result = await supabase.table("sessions")\
+                .select(f"id, student_id, teacher_id, course_id, status, {SESSION_FIELDS}")\
+                .eq("id", session_id)\
+                .execute()
+        except Exception as e:
+            raise ValueError(f"Failed to load session: {str(e)}")
+
+        if not result.data:
+            raise ValueError("Session not found")
+        session = result.data[0]
+        if session["student_id"] != user_id:
+            raise PermissionError("Cannot review another user's session")
+        if session["status"] != "completed":
+            raise ValueError("Only completed sessions can be reviewed")
+
+        scored = await RatingService.score_credibility([ml_inference.session_to_row(session)])
+        credibility = float(scored["scores"][0])
+        weight = float(review_weights(scored["scores"])[0])
+
+        review_data = {
+            "session_id": session_id,
+            "student_id": user_id,
+            "teacher_id": session["teacher_id"],
+            "course_id": session["course_id"],
+            "rating": rating,
+            "review_text": review_text,
+            "engagement_metrics": engagement_metrics(session),
+            "credibility_score": credibility,
+            "rating_weight": weight,
+            "is_verified": weight > 0,
+            "credibility_factors": {"source": scored["source"]}
+        }
+
+        try:
+            inserted = await supabase.table("reviews").insert(review_data).execute()
+        except Exception as e:
+            if "duplicate" in str(e).lower() or "23505" in str(e):
+                raise ValueError("This session has already been reviewed")
+            raise ValueError(f"Failed to save review: {str(e)}")
+
+        review = inserted.data[0] if inserted.data else review_data
+        return {
+            "review_id": review.get("id"),
+            "course_id": session["course_id"],
+            "teacher_id": session["teacher_id"],
+            "rating": rating,
+            "credibility_score": credibility,
+            "rating_weight": weight,
+            "credibility_source": scored["source"]
+        }
+
+    @staticmethod
+    async def rescore_page(reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Re-scored credibility and weights for one page of reviews (one model call)"""
+        rows = [ml_inference.session_to_row(review.get("sessions") or {}) for review in reviews]
+        scored = await RatingService.score_credibility(rows)
+        weights = review_weights(scored["scores"])
+        updates = [
+            {
+                "id": review["id"],
+                "credibility_score": float(score),
+                "rating_weight": float(weight),
+                "is_verified": bool(weight > 0)
+            }
+            for review, score, weight in zip(reviews, scored["scores"], weights)
+        ]
+        return {"updates": updates, "source": scored["source"]}
+
+    @staticmethod
+    async def recompute_all(page_size: int = RATING_RECOMPUTE_PAGE) -> Dict[str, Any]:
+        """
+        Re-score every review and rebuild all course/teacher sums
+        Safe to re-run; reviews submitted while it runs are counted by the final rebuild
+        """
+        stats = {"reviews": 0, "updated": 0, "sources": {}}
+        last_id = None
+
+        while True:
+            query = supabase.table("reviews")\
+                .select(f"id, sessions({SESSION_FIELDS})")\
+                .order("id")\
+                .limit(page_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            try:
+                result = await query.execute()
+            except Exception as e:
+                raise ValueError(f"Failed to read reviews: {str(e)}")
+
+            reviews = result.data or []
+            if not reviews:
+                break
+            last_id = reviews[-1]["id"]
+
+            page = await RatingService.rescore_page(reviews)
+            stats["reviews"] += len(reviews)
+            stats["sources"][page["source"]] = stats["sources"].get(page["source"], 0) + len(reviews)
+
+            updates = page["updates"]
+            for start in range(0, len(updates), RATING_UPDATE_BATCH):
+                try:
+                    written = await supabase.rpc(
+                        "update_review_weights", {"p_updates": updates[start:start + RATING_UPDATE_BATCH]}
+                    ).execute()
+                except Exception as e:
+                    raise ValueError(f"Failed to write review weights: {str(e)}")
+                stats["updated"] += written.data or 0
+
+            if len(reviews) < page_size:
+                break
+
+        try:
+            rebuilt = await supabase.rpc("rebuild_rating_sums", {}).execute()
+        except Exception as e:
+            raise ValueError(f"Failed to rebuild rating sums: {str(e)}")
+        stats["counted"] = rebuilt.data or 0
+        return stats
@@ -0,0 +1,30 @@
+"""
+Credibility-weighted rating recompute job
+Re-scores every review with the credibility model (one vectorized call per page), writes the
+new weights and rebuilds course/teacher rating sums (safe to re-run; run once after migration 008)
+
+Usage: python recompute_ratings.py
+"""
+import asyncio
+import ml_inference
+from rating_service import RatingService
+from database import close_database
+
+
+async def recompute():
+    """Re-score reviews and report how many weights changed"""
+    print("🔄 Recomputing credibility-weighted ratings...")
+    ml_inference.load_models()
+    
+    try:
+        stats = await RatingService.recompute_all()
+        sources = ", ".join(f"{count} by {source}" for source, count in stats["sources"].items()) or "none"
+        print(f"✅ Scored {stats['reviews']} review(s) ({sources}), {stats['updated']} weight(s) changed")
+        print(f"✅ Rating sums rebuilt from {stats['counted']} counted review(s)")
+    finally:
+        ml_inference.shutdown_models()
+        await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(recompute())
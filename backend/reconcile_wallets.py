@@ -0,0 +1,40 @@
+"""
+Wallet balance reconciliation job
+Checks the materialized wallet_balances table against the full payments ledger
+and drops expired settlement dedupe keys
+
+Usage:
+    python reconcile_wallets.py          # report mismatches only
+    python reconcile_wallets.py --fix    # report and repair mismatches
+"""
+import sys
+import asyncio
+from wallet_service import WalletService, VideoSessionService
+from database import close_database
+
+
+async def reconcile(fix: bool = False):
+    """Run reconciliation and print any drift between stored and ledger balances"""
+    print(f"🔍 Reconciling wallet balances{' (fix mode)' if fix else ''}...")
+    
+    try:
+        purged = await VideoSessionService.purge_settlement_keys()
+        print(f"🧹 Released {purged} expired settlement result(s)")
+        
+        mismatches = await WalletService.reconcile_balances(fix=fix)
+        
+        if not mismatches:
+            print("✅ All wallet balances match the payments ledger")
+            return
+        
+        for row in mismatches:
+            print(f"⚠️ {row['user_id']}: stored ₹{row['stored_balance']} | ledger ₹{row['ledger_balance']}")
+        
+        action = "repaired" if fix else "found (run with --fix to repair)"
+        print(f"\n{len(mismatches)} mismatched balance(s) {action}")
+    finally:
+        await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(reconcile(fix="--fix" in sys.argv))
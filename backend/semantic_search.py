@@ -0,0 +1,485 @@
+"""
+Semantic Search - Local vector index over the course catalog
+Courses (title, category, description, lecture titles) are embedded on CPU, either with a
+sentence-transformers model (SEMANTIC_EMBED_MODEL, optional) or with the built-in hashed
+TF-IDF + LSA embedder. Vectors live in a memory-mapped float32 matrix under SEMANTIC_INDEX_DIR and
+are searched by brute-force dot product, or through an IVF layer (k-means lists, nprobe)
+once the catalog passes SEMANTIC_IVF_MIN_ROWS.
+"""
+import os
+import json
+import math
+import time
+import zlib
+import asyncio
+import numpy as np
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from database import supabase
+from typeahead import tokenize
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+SEMANTIC_EMBED_MODEL = os.getenv("SEMANTIC_EMBED_MODEL", "")  # e.g. all-MiniLM-L6-v2; empty = hashed TF-IDF
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "256"))
+SEMANTIC_HASH_BUCKETS = int(os.getenv("SEMANTIC_HASH_BUCKETS", "32768"))
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "semantic_index")
+SEMANTIC_IVF_MIN_ROWS = int(os.getenv("SEMANTIC_IVF_MIN_ROWS", "20000"))
+SEMANTIC_IVF_NPROBE = int(os.getenv("SEMANTIC_IVF_NPROBE", "8"))
+SEMANTIC_REFRESH_SECONDS = float(os.getenv("SEMANTIC_REFRESH_SECONDS", "300"))
+SEMANTIC_PAGE_SIZE = 1000  # PostgREST caps a response at max-rows (1000 by default)
+
+# Field weights for the hashed embedder (a title word says more than a lecture word)
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 1.0, "lectures": 1.0}
+SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ers", "er", "ed", "es", "s")
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Crude suffix stripping so "programming" / "program" share a feature"""
+    if len(word) > 4:
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                return word[:-len(suffix)]
+    return word
+
+
+def course_fields(course: Dict[str, Any]) -> Dict[str, str]:
+    """Searchable text of a courses row, per field"""
+    lectures = (course.get("content_structure") or {}).get("lectures") or []
+    return {
+        "title": course.get("title") or "",
+        "category": course.get("category") or "",
+        "description": course.get("description") or "",
+        "lectures": " ".join((lecture or {}).get("title") or "" for lecture in lectures)
+    }
+
+
+def sparse_dot(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, dense: np.ndarray, size: int) -> np.ndarray:
+    """(size x k) result of a COO sparse matrix times `dense`; entries must be grouped by row"""
+    out = np.zeros((size, dense.shape[1]), dtype=np.float32)
+    if not len(rows):
+        return out
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    # ~250k non-zeros per step bounds the (nnz x k) temporary
+    step = max(1, int(len(starts) * 250_000 / len(rows)))
+    for first in range(0, len(starts), step):
+        group = starts[first:first + step]
+        end = starts[first + step] if first + step < len(starts) else len(rows)
+        local = group - group[0]
+        products = values[group[0]:end, None] * dense[cols[group[0]:end]]
+        out[rows[group]] = np.add.reduceat(products, local)
+    return out
+
+
+class HashedTfidfEmbedder:
+    """
+    Latent semantic embeddings without a model download: stemmed words and word bigrams are
+    hashed into SEMANTIC_HASH_BUCKETS signed buckets (crc32), weighted by field, sublinear TF
+    and IDF, then projected onto the top `dim` singular vectors of the catalog's TF-IDF matrix
+    (randomized SVD), so terms that co-occur across courses land close together.
+    """
+    kind = "hashed-tfidf-lsa"
+
+    def __init__(self, dim: int = SEMANTIC_DIM, buckets: int = SEMANTIC_HASH_BUCKETS):
+        self.dim = dim
+        self.buckets = buckets
+        self.idf = np.ones(buckets, dtype=np.float32)
+        self.components = np.zeros((buckets, dim), dtype=np.float32)
+        self._hashes: Dict[str, Tuple[int, float]] = {}
+        self._fitted: Optional[Tuple[List[Dict[str, str]], Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None
+
+    def bucket(self, feature: str) -> Tuple[int, float]:
+        """(bucket, ±1); the sign hash makes collisions cancel out instead of piling up"""
+        found = self._hashes.get(feature)
+        if found is None:
+            digest = zlib.crc32(feature.encode())
+            found = (digest % self.buckets, 1.0 if digest & 0x80000000 else -1.0)
+            if len(self._hashes) < 200_000:
+                self._hashes[feature] = found
+        return found
+
+    def features(self, fields: Dict[str, str]) -> Dict[int, float]:
+        """bucket -> signed, field-weighted sublinear term frequency"""
+        counts: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            words = [stem(word) for word in tokenize(text) if not word.isdigit()]
+            for feature in words + [f"{a}_{b}" for a, b in zip(words, words[1:])]:
+                counts[feature] = counts.get(feature, 0.0) + weight
+
+        buckets: Dict[int, float] = {}
+        for feature, count in counts.items():
+            bucket, sign = self.bucket(feature)
+            buckets[bucket] = buckets.get(bucket, 0.0) + sign * (1 + math.log(count))
+        return buckets
+
+    def term_frequencies(self, documents: List[Dict[str, str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Hashed TF matrix as COO (rows, cols, values), grouped by row"""
+        rows, cols, values = [], [], []
+        for row, fields in enumerate(documents):
+            for bucket, value in self.features(fields).items():
+                rows.append(row)
+                cols.append(bucket)
+                values.append(value)
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(values, dtype=np.float32)
+
+    def tfidf(self, tf: Tuple[np.ndarray, np.ndarray, np.ndarray], size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """IDF-weighted, row-normalized copy of a TF matrix"""
+        rows, cols, values = tf
+        values = values * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=size))
+        return rows, cols, values / np.maximum(norms[rows], 1e-12).astype(np.float32)
+
+    def fit(self, documents: List[Dict[str, str]], sample_size: int = 20000, power_iterations: int = 1) -> None:
+        """IDF per bucket, then a randomized SVD of (a sample of) the TF-IDF matrix"""
+        tf = self.term_frequencies(documents)
+        self._fitted = (documents, tf)  # embed() of the same list reuses the hashed features
+
+        rows, cols, values = tf
+        df = np.bincount(cols, minlength=self.buckets).astype(np.float32)
+        self.idf = (np.log((1 + len(documents)) / (1 + df)) + 1).astype(np.float32)
+
+        rng = np.random.default_rng(0)
+        size = len(documents)
+        if size > sample_size:
+            keep = np.zeros(size, dtype=bool)
+            keep[rng.choice(size, sample_size, replace=False)] = True
+            renumber = np.cumsum(keep) - 1
+            mask = keep[rows]
+            rows, cols, values, size = renumber[rows[mask]], cols[mask], values[mask], sample_size
+        rows, cols, values = self.tfidf((rows, cols, values), size)
+
+        # X is (documents x buckets); X.T products need the entries grouped by column
+        by_col = np.argsort(cols, kind="stable")
+        t_rows, t_cols, t_values = cols[by_col], rows[by_col], values[by_col]
+
+        rank = min(self.dim, size)
+        sketch = rng.standard_normal((self.buckets, rank + 10)).astype(np.float32)
+        basis, _ = np.linalg.qr(sparse_dot(rows, cols, values, sketch, size))
+        for _ in range(power_iterations):
+            projected, _ = np.linalg.qr(sparse_dot(t_rows, t_cols, t_values, basis, self.buckets))
+            basis, _ = np.linalg.qr(sparse_dot(rows, cols, values, projected, size))
+
+        # Right singular vectors of the small (rank x buckets) B = basis.T @ X via eigh(B @ B.T)
+        small_t = sparse_dot(t_rows, t_cols, t_values, basis, self.buckets)
+        eigenvalues, eigenvectors = np.linalg.eigh(small_t.T @ small_t)
+        top = np.argsort(eigenvalues)[::-1][:rank]
+        singular = np.sqrt(np.maximum(eigenvalues[top], 1e-12))
+        self.components = np.zeros((self.buckets, self.dim), dtype=np.float32)
+        self.components[:, :rank] = small_t @ (eigenvectors[:, top] / singular)
+
+    def embed(self, documents: List[Dict[str, str]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unit-length float32 rows (written into `out` when given, e.g. a memmap)"""
+        if self._fitted is not None and self._fitted[0] is documents:
+            tf = self._fitted[1]
+            self._fitted = None
+        else:
+            tf = self.term_frequencies(documents)
+
+        matrix = out if out is not None else np.zeros((len(documents), self.dim), dtype=np.float32)
+        matrix[:] = sparse_dot(*self.tfidf(tf, len(documents)), self.components, len(documents))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def fresh(self) -> "HashedTfidfEmbedder":
+        """Unfitted copy, so a rebuild never changes the projection under live searches"""
+        return HashedTfidfEmbedder(self.dim, self.buckets)
+
+    def save(self, directory: str) -> None:
+        np.savez(os.path.join(directory, "embedder.npz"), idf=self.idf, components=self.components)
+
+    def load(self, directory: str) -> None:
+        with np.load(os.path.join(directory, "embedder.npz")) as state:
+            self.idf, self.components = state["idf"], state["components"]
+
+
+class ModelEmbedder:
+    """sentence-transformers model on CPU (optional dependency)"""
+    kind = "model"
+
+    def __init__(self, name: str):
+        self.model = SentenceTransformer(name, device="cpu")
+        self.kind = f"model:{name}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def fit(self, documents: List[Dict[str, str]]) -> None:
+        return None
+
+    def embed(self, documents: List[Dict[str, str]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        texts = [". ".join(text for text in fields.values() if text) for fields in documents]
+        vectors = self.model.encode(texts, batch_size=64, normalize_embeddings=True).astype(np.float32)
+        if out is None:
+            return vectors
+        out[:] = vectors
+        return out
+
+    def fresh(self) -> "ModelEmbedder":
+        return self  # Nothing fitted; reuse the loaded model
+
+    def save(self, directory: str) -> None:
+        return None
+
+    def load(self, directory: str) -> None:
+        return None
+
+
+def create_embedder():
+    """Configured local model if available, else hashed TF-IDF + LSA"""
+    if SEMANTIC_EMBED_MODEL and SentenceTransformer is not None:
+        try:
+            return ModelEmbedder(SEMANTIC_EMBED_MODEL)
+        except Exception as e:
+            print(f"⚠️ Could not load embedding model {SEMANTIC_EMBED_MODEL}, using hashed TF-IDF: {str(e)}")
+    elif SEMANTIC_EMBED_MODEL:
+        print("⚠️ sentence-transformers not installed, using hashed TF-IDF embeddings")
+    return HashedTfidfEmbedder()
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, iterations: int = 8, sample_size: int = 20000) -> np.ndarray:
+    """Spherical k-means centroids on a sample of the (unit-length) rows"""
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = sample[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Nearest centroid per row, in chunks to bound memory"""
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk)
+    ])
+
+
+def clear_directory(directory: str, remove: bool = False) -> None:
+    """Delete the files of a (flat) index directory"""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    if remove:
+        os.rmdir(directory)
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    Everything one search reads, published as a single reference
+    A rebuild creates a new snapshot, so a query never mixes old vectors with new rows
+    """
+    embedder: Any
+    vectors: Optional[np.ndarray] = None
+    rows: List[Dict[str, Any]] = []
+    centroids: Optional[np.ndarray] = None
+    offsets: Optional[np.ndarray] = None
+    fingerprint: Optional[str] = None
+
+
+class VectorIndex:
+    """
+    On-disk index: vectors.npy (memory-mapped, rows grouped by IVF list), meta.json (row ->
+    course), ivf.npz (centroids + list offsets). Built into a temp dir and swapped in whole.
+    """
+
+    def __init__(self, directory: str, embedder=None):
+        self.directory = directory
+        self.snapshot = IndexSnapshot(embedder or create_embedder())
+
+    @property
+    def embedder(self):
+        return self.snapshot.embedder
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self.snapshot.fingerprint
+
+    @property
+    def loaded(self) -> bool:
+        return self.snapshot.vectors is not None
+
+    def __len__(self) -> int:
+        return len(self.snapshot.rows)
+
+    def build(self, courses: List[Dict[str, Any]], fingerprint: Optional[str] = None) -> None:
+        """Embed every course into a fresh memmap and swap it in"""
+        documents = [course_fields(course) for course in courses]
+        embedder = self.embedder.fresh()
+        if documents:
+            embedder.fit(documents)
+
+        staging = f"{self.directory}.building"
+        clear_directory(staging)  # Leftovers of an interrupted build
+        os.makedirs(staging, exist_ok=True)
+        path = os.path.join(staging, "vectors.npy")
+        vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(documents), embedder.dim))
+        embedder.embed(documents, out=vectors)
+
+        order = np.arange(len(documents))
+        if len(documents) >= SEMANTIC_IVF_MIN_ROWS:
+            nlist = int(math.sqrt(len(documents)))
+            centroids = train_ivf(vectors, nlist)
+            assignment = assign_lists(vectors, centroids)
+            order = np.argsort(assignment, kind="stable")
+            vectors[:] = vectors[order]  # Each IVF list becomes one contiguous slice
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+            np.savez(os.path.join(staging, "ivf.npz"), centroids=centroids, offsets=offsets)
+        vectors.flush()
+        del vectors
+
+        rows = [{
+            "id": courses[i]["id"],
+            "title": courses[i].get("title"),
+            "category": courses[i].get("category")
+        } for i in order.tolist()]
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({
+                "embedder": embedder.kind,
+                "dim": embedder.dim,
+                "fingerprint": fingerprint,
+                "rows": rows
+            }, f)
+        embedder.save(staging)
+
+        self._swap(staging, embedder)
+
+    def _swap(self, staging: str, embedder) -> None:
+        retired = f"{self.directory}.old"
+        clear_directory(retired, remove=True)
+        if os.path.isdir(self.directory):
+            os.replace(self.directory, retired)
+        os.replace(staging, self.directory)
+        self.load(embedder)
+        clear_directory(retired, remove=True)  # Open memmaps keep their pages until released
+
+    def load(self, embedder=None) -> bool:
+        """Open an existing on-disk index (no re-embedding); False if absent or built by another embedder"""
+        meta_path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        embedder = embedder or self.embedder.fresh()
+        if meta["embedder"] != embedder.kind or meta["dim"] != embedder.dim:
+            return False
+
+        embedder.load(self.directory)
+        vectors = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+        ivf_path = os.path.join(self.directory, "ivf.npz")
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                centroids, offsets = ivf["centroids"], ivf["offsets"]
+        else:
+            centroids, offsets = None, None
+        self.snapshot = IndexSnapshot(embedder, vectors, meta["rows"], centroids, offsets, meta["fingerprint"])
+        return True
+
+    def search(self, query: str, limit: int = 10, exact: bool = False) -> List[Dict[str, Any]]:
+        """
+        Top courses by cosine similarity
+        IVF scans the nprobe closest lists; exact=True (or a small index) scans every row
+        """
+        snapshot = self.snapshot  # One reference for the whole query; a rebuild swaps in a new one
+        if snapshot.vectors is None or not snapshot.rows:
+            return []
+        query_vector = snapshot.embedder.embed([{"title": query}])[0]
+        if not query_vector.any():
+            return []
+
+        if exact or snapshot.centroids is None:
+            candidates = np.arange(len(snapshot.rows))
+            scores = snapshot.vectors @ query_vector
+        else:
+            probes = np.argsort(snapshot.centroids @ query_vector)[-SEMANTIC_IVF_NPROBE:]
+            ranges = [(int(snapshot.offsets[p]), int(snapshot.offsets[p + 1])) for p in probes]
+            candidates = np.concatenate([np.arange(start, end) for start, end in ranges])
+            scores = np.concatenate([snapshot.vectors[start:end] @ query_vector for start, end in ranges])
+
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(scores, -limit)[-limit:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [
+            {**snapshot.rows[int(candidates[i])], "score": round(float(scores[i]), 4)}
+            for i in top if scores[i] > 1e-4
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "embedder": snapshot.embedder.kind,
+            "courses": len(snapshot.rows),
+            "dim": snapshot.embedder.dim,
+            "ivf_lists": 0 if snapshot.centroids is None else len(snapshot.centroids)
+        }
+
+
+course_vectors = VectorIndex(SEMANTIC_INDEX_DIR)
+
+
+async def fetch_active_courses(page_size: int = SEMANTIC_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """Whole active catalog, keyset-paged on id (one select would stop at the max-rows cap)"""
+    courses: List[Dict[str, Any]] = []
+    while True:
+        query = supabase.table("courses")\
+            .select("id, title, description, category, content_structure")\
+            .eq("is_active", True)
+        if courses:
+            query = query.gt("id", courses[-1]["id"])
+        result = await query.order("id").limit(page_size).execute()
+        page = result.data or []
+        courses.extend(page)
+        if len(page) < page_size:
+            return courses
+
+
+async def refresh_semantic_index(force: bool = False) -> int:
+    """
+    Rebuild the index when the catalog changed (course count or newest updated_at)
+    Embedding runs in a worker thread; searches keep using the old index until the swap
+    Returns number of courses indexed (0 if unchanged)
+    """
+    if not course_vectors.loaded and not force:
+        await asyncio.to_thread(course_vectors.load)  # Serve the last build right away after a restart
+
+    latest = await supabase.table("courses")\
+        .select("updated_at", count="exact")\
+        .eq("is_active", True)\
+        .order("updated_at", desc=True)\
+        .limit(1)\
+        .execute()
+    newest = latest.data[0]["updated_at"] if latest.data else None
+    fingerprint = f"{latest.count}:{newest}"
+    if not force and fingerprint == course_vectors.fingerprint:
+        return 0
+
+    courses = await fetch_active_courses()
+
+    await asyncio.to_thread(course_vectors.build, courses, fingerprint)
+    return len(courses)
+
+
+async def run_refresh_loop(interval: float = SEMANTIC_REFRESH_SECONDS) -> None:
+    """Background task: load/build at startup, then rebuild when the catalog changes"""
+    while True:
+        try:
+            started = time.perf_counter()
+            count = await refresh_semantic_index()
+            if count:
+                print(f"🧭 Semantic index built for {count} course(s) in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"⚠️ Semantic index refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
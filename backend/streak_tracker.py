@@ -0,0 +1,110 @@
+"""
+Streak Tracker - O(1) incremental watch streak state
+StreakState.record_activity is an exact mirror of public.record_streak_activity
+(migrations/006): same day boundary (activity time in user_streaks.timezone, unknown zones
+read as UTC), same transitions. The stored state can therefore be verified against the
+full-history AnalyticsService.calculate_streak without a database.
+"""
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def get_zone(tz_name: Optional[str]) -> tzinfo:
+    """Resolve an IANA timezone name, falling back to UTC"""
+    if not tz_name or tz_name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def valid_timezone(tz_name: Optional[str]) -> Optional[str]:
+    """IANA timezone name if it resolves (what may be stored in user_streaks.timezone), else None"""
+    if not tz_name or len(tz_name) > 64:
+        return None
+    if tz_name.upper() == "UTC":
+        return "UTC"
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return tz_name
+
+
+def local_date(moment: datetime, tz_name: Optional[str] = "UTC") -> date:
+    """Calendar day of a timestamp in the user's timezone (naive = UTC)"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(get_zone(tz_name)).date()
+
+
+class StreakState:
+    """
+    Per-user streak state: current run, best run, last active day
+    Days must be recorded in non-decreasing order (sessions complete "now");
+    an older day is ignored, the same day is a no-op
+    """
+
+    def __init__(
+        self,
+        current_streak: int = 0,
+        longest_streak: int = 0,
+        last_active_date: Optional[date] = None,
+        timezone_name: str = "UTC"
+    ):
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+        self.last_active_date = last_active_date
+        self.timezone_name = timezone_name or "UTC"
+
+    @classmethod
+    def from_row(cls, row: Optional[Dict[str, Any]]) -> "StreakState":
+        """Build from a user_streaks row (or empty state if None)"""
+        if not row:
+            return cls()
+
+        last_active = row.get("last_active_date")
+        return cls(
+            current_streak=row.get("current_streak", 0) or 0,
+            longest_streak=row.get("longest_streak", 0) or 0,
+            last_active_date=date.fromisoformat(last_active) if last_active else None,
+            timezone_name=row.get("timezone") or "UTC"
+        )
+
+    def record_day(self, day: date) -> None:
+        """Apply one active day in constant time"""
+        last = self.last_active_date
+
+        if last is not None and day <= last:
+            return  # Same day (already counted) or out of order
+
+        if last is not None and day == last + timedelta(days=1):
+            self.current_streak += 1
+        else:
+            self.current_streak = 1
+
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        self.last_active_date = day
+
+    def record_activity(self, moment: datetime) -> None:
+        """Apply a completed session timestamp using the user's day boundary"""
+        self.record_day(local_date(moment, self.timezone_name))
+
+    def today(self) -> date:
+        """Current calendar day in the user's timezone"""
+        return datetime.now(get_zone(self.timezone_name)).date()
+
+    def current_streak_on(self, today: date) -> int:
+        """Current streak as of `today` - still alive if last active today or yesterday"""
+        if self.last_active_date is None or self.last_active_date < today - timedelta(days=1):
+            return 0
+        return self.current_streak
+
+    def to_dict(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Streak payload in the same shape as calculate_streak"""
+        return {
+            "current_streak": self.current_streak_on(today or self.today()),
+            "longest_streak": self.longest_streak
+        }
@@ -18,7 +18,7 @@ class TeacherAnalyticsService:
     async def get_teacher_id_from_user_id(user_id: str) -> Optional[str]:
         """Get teacher ID from user ID"""
         try:
-            result = supabase.table("teachers")\
+            result = await supabase.table("teachers")\
                 .select("id")\
                 .eq("user_id", user_id)\
                 .single()\
@@ -39,7 +39,7 @@ class TeacherAnalyticsService:
         """
         try:
             # Get teacher profile for basic stats
-            teacher_profile = supabase.table("teachers")\
+            teacher_profile = await supabase.table("teachers")\
                 .select("*")\
                 .eq("id", teacher_id)\
                 .single()\
@@ -49,7 +49,7 @@ class TeacherAnalyticsService:
                 raise ValueError("Teacher not found")
             
             # Get all completed sessions for this teacher
-            sessions = supabase.table("sessions")\
+            sessions = await supabase.table("sessions")\
                 .select("*")\
                 .eq("teacher_id", teacher_id)\
                 .eq("status", "completed")\
@@ -96,6 +96,20 @@ class TeacherAnalyticsService:
         except Exception as e:
             raise ValueError(f"Failed to get dashboard analytics: {str(e)}")
     
+    @staticmethod
+    async def get_course_stats(teacher_id: str) -> List[Dict[str, Any]]:
+        """
+        Per-course session aggregates for a teacher in a single round trip
+        Returns: session counts, unique students, completed counts and revenue per course
+        (grouped in SQL by get_teacher_course_stats, see migrations/004)
+        """
+        result = await supabase.rpc(
+            "get_teacher_course_stats",
+            {"teacher_row_id": teacher_id}
+        ).execute()
+        
+        return result.data or []
+    
     @staticmethod
     async def get_lecture_wise_earnings(teacher_id: str) -> List[Dict[str, Any]]:
         """
@@ -103,37 +117,15 @@ class TeacherAnalyticsService:
         Returns: Array of courses with earnings details
         """
         try:
-            # Get all courses for this teacher
-            courses = supabase.table("courses")\
-                .select("id, title, category, price_per_minute, content_structure")\
-                .eq("teacher_id", teacher_id)\
-                .execute()
-            
-            if not courses.data:
-                return []
+            course_stats = await TeacherAnalyticsService.get_course_stats(teacher_id)
             
             lecture_earnings = []
             
-            for course in courses.data:
-                # Get sessions for this course
-                sessions = supabase.table("sessions")\
-                    .select("*")\
-                    .eq("course_id", course["id"])\
-                    .eq("status", "completed")\
-                    .execute()
-                
-                num_sessions = len(sessions.data) if sessions.data else 0
-                
-                # Calculate total earnings for this course
-                total_course_earnings = sum(
-                    float(s.get("final_cost", 0) or 0)
-                    for s in (sessions.data or [])
-                )
-                
-                # Get unique students
-                unique_students = len(set(
-                    s["student_id"] for s in (sessions.data or [])
-                )) if sessions.data else 0
+            for stats in course_stats:
+                # Only completed sessions count towards earnings
+                num_sessions = int(stats.get("completed_sessions", 0) or 0)
+                total_course_earnings = float(stats.get("completed_revenue", 0) or 0)
+                unique_students = int(stats.get("completed_students", 0) or 0)
                 
                 # Calculate average earnings per session
                 avg_earnings = (
@@ -141,21 +133,16 @@ class TeacherAnalyticsService:
                     if num_sessions > 0 else 0
                 )
                 
-                # Get lecture count from content_structure
-                content_structure = course.get("content_structure", {})
-                lectures = content_structure.get("lectures", []) if content_structure else []
-                num_lectures = len(lectures)
-                
                 lecture_earnings.append({
-                    "course_id": course["id"],
-                    "course_title": course["title"],
-                    "category": course["category"],
-                    "num_lectures": num_lectures,
+                    "course_id": stats["course_id"],
+                    "course_title": stats["title"],
+                    "category": stats["category"],
+                    "num_lectures": int(stats.get("num_lectures", 0) or 0),
                     "total_sessions": num_sessions,
                     "total_students": unique_students,
                     "total_earnings": round(float(total_course_earnings), 2),
                     "avg_earnings_per_session": round(float(avg_earnings), 2),
-                    "price_per_minute": float(course.get("price_per_minute", 0))
+                    "price_per_minute": float(stats.get("price_per_minute", 0) or 0)
                 })
             
             # Sort by total earnings descending
@@ -187,7 +174,7 @@ class TeacherAnalyticsService:
             if course_id:
                 query = query.eq("course_id", course_id)
             
-            sessions = query.execute()
+            sessions = await query.execute()
             
             if not sessions.data:
                 return []
@@ -231,61 +218,34 @@ class TeacherAnalyticsService:
         Returns: Array of courses sorted by popularity (enrollments)
         """
         try:
-            # Get all courses for this teacher
-            courses = supabase.table("courses")\
-                .select("*")\
-                .eq("teacher_id", teacher_id)\
-                .execute()
-            
-            if not courses.data:
-                return []
+            course_stats = await TeacherAnalyticsService.get_course_stats(teacher_id)
             
             popular_lectures = []
             
-            for course in courses.data:
-                # Get sessions for enrollment count
-                sessions = supabase.table("sessions")\
-                    .select("student_id, final_cost, status")\
-                    .eq("course_id", course["id"])\
-                    .execute()
-                
-                # Count unique students (enrollments)
-                enrollments = len(set(
-                    s["student_id"] for s in (sessions.data or [])
-                )) if sessions.data else 0
-                
-                # Count completed sessions
-                completed = len([
-                    s for s in (sessions.data or [])
-                    if s.get("status") == "completed"
-                ]) if sessions.data else 0
+            for stats in course_stats:
+                # Enrollments = unique students across all sessions
+                enrollments = int(stats.get("unique_students", 0) or 0)
+                total_sessions = int(stats.get("total_sessions", 0) or 0)
+                completed = int(stats.get("completed_sessions", 0) or 0)
                 
                 # Calculate completion rate
-                total_sessions = len(sessions.data) if sessions.data else 0
                 completion_rate = (
                     (completed / total_sessions * 100)
                     if total_sessions > 0 else 0
                 )
                 
-                # Calculate total revenue
-                total_revenue = sum(
-                    float(s.get("final_cost", 0) or 0)
-                    for s in (sessions.data or [])
-                    if s.get("status") == "completed"
-                )
-                
                 popular_lectures.append({
-                    "course_id": course["id"],
-                    "course_title": course["title"],
-                    "category": course["category"],
+                    "course_id": stats["course_id"],
+                    "course_title": stats["title"],
+                    "category": stats["category"],
                     "total_enrollments": enrollments,
                     "total_sessions": total_sessions,
                     "completed_sessions": completed,
                     "completion_rate": round(float(completion_rate), 1),
-                    "total_revenue": round(float(total_revenue), 2),
-                    "average_rating": float(course.get("average_rating", 0) or 0),
-                    "total_reviews": course.get("total_reviews", 0) or 0,
-                    "is_active": course.get("is_active", True)
+                    "total_revenue": round(float(stats.get("completed_revenue", 0) or 0), 2),
+                    "average_rating": float(stats.get("average_rating", 0) or 0),
+                    "total_reviews": stats.get("total_reviews", 0) or 0,
+                    "is_active": stats.get("is_active", True)
                 })
             
             # Sort by enrollments descending
@@ -0,0 +1,151 @@
+"""
+Benchmark: AI YouTube search pipeline under concurrency and slow stages
+Groq and YouTube are replaced by an in-process httpx transport with fixed latencies, so the
+real ai_youtube_search code runs end to end. Shows that concurrent searches overlap (the old
+blocking `requests` chain serialized them on the event loop), that a slow LLM degrades
+to locally ranked / raw-query results within the budget instead of holding the request, and
+how the search cache tiers (memory, SQLite, stale-while-revalidate) serve repeats.
+
+Usage: python tests/bench_ai_search.py [concurrent_searches]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import httpx
+
+os.environ.setdefault("GROQ_API_KEY", "bench-key")
+os.environ.setdefault("YOUTUBE_API_KEY", "bench-key")
+os.environ["SEARCH_CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "search_cache.db")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai_search_service
+import video_metadata
+
+LATENCY = {"optimize": 0.6, "search": 0.3, "enrich": 0.15, "rank": 0.8}
+upstream_calls = 0
+
+
+def search_items(query: str):
+    return {"items": [{
+        "id": {"videoId": f"{query[:8]}-{i}"},
+        "snippet": {
+            "title": f"{query} part {i}", "description": "lesson", "channelTitle": "Murph",
+            "publishedAt": "2026-01-01T00:00:00Z", "thumbnails": {"default": {"url": "thumb"}}
+        }
+    } for i in range(8)]}
+
+
+async def handler(request: httpx.Request) -> httpx.Response:
+    global upstream_calls
+    upstream_calls += 1
+    if "groq" in request.url.host:
+        body = request.content.decode()
+        if "ranking YouTube videos" in body:
+            await asyncio.sleep(LATENCY["rank"])
+            return httpx.Response(200, json={"choices": [{"message": {"content": '{"ranked_indices": [7, 6, 5, 4, 3, 2, 1, 0]}'}}]})
+        await asyncio.sleep(LATENCY["optimize"])
+        content = '{"optimized_query": "python tutorial for beginners", "duration": "medium", "search_type": "tutorial"}'
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    if request.url.path.endswith("/search"):
+        await asyncio.sleep(LATENCY["search"])
+        return httpx.Response(200, json=search_items(request.url.params["q"]))
+
+    await asyncio.sleep(LATENCY["enrich"])
+    ids = request.url.params["id"].split(",")
+    return httpx.Response(200, json={"items": [
+        {"id": vid, "contentDetails": {"duration": "PT10M"}, "statistics": {"viewCount": "1000"}} for vid in ids
+    ]})
+
+
+async def one_search(query: str = "learn python", cached: bool = False, llm_rank: bool = True):
+    search = ai_search_service.ai_youtube_search if cached else ai_search_service.run_ai_youtube_search
+    video_metadata.video_details.clear()  # Measure the full pipeline, not the metadata store
+    started = time.perf_counter()
+    result = await search(query, 8, llm_rank)
+    return time.perf_counter() - started, result
+
+
+async def main(concurrency: int):
+    ai_search_service.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    video_metadata.http_client = ai_search_service.http_client
+    sequential_chain = sum(LATENCY.values())
+
+    elapsed, result = await one_search()
+    print(f"\n📊 Single search (LLM rank): {elapsed * 1000:.0f}ms  stages={result['timings_ms']}  ranker={result['ranker']}")
+    assert result["ranker"] == "llm" and result["total"] == 8
+
+    elapsed, result = await one_search(llm_rank=False)
+    print(f"   Single search (local rank): {elapsed * 1000:.0f}ms  stages={result['timings_ms']}  ranker={result['ranker']}")
+    assert result["ranker"] == "local" and result["total"] == 8
+
+    # Concurrency + event-loop responsiveness
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - before - 0.01)
+
+    probe = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(one_search() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    running = False
+    await probe
+    print(f"   {concurrency} concurrent searches: {wall * 1000:.0f}ms wall "
+          f"(blocking chain would be ~{sequential_chain * concurrency * 1000:.0f}ms), max loop lag {max_lag * 1000:.1f}ms")
+    assert wall < sequential_chain * 2
+
+    # Slow ranking LLM -> locally ranked results at the rank timeout
+    LATENCY["rank"] = 30
+    elapsed, result = await one_search()
+    print(f"   Slow rank LLM:     {elapsed * 1000:.0f}ms  ranker={result['ranker']}  total={result['total']}")
+    assert result["ranker"] == "local" and result["total"] == 8
+    assert elapsed < ai_search_service.SEARCH_TOTAL_BUDGET_SECONDS + 0.5
+
+    # Slow optimizer -> raw-query results (searched in parallel) at the optimize timeout
+    LATENCY["optimize"] = 30
+    LATENCY["rank"] = 0.8
+    elapsed, result = await one_search()
+    print(f"   Slow optimize LLM: {elapsed * 1000:.0f}ms  optimized_query={result['optimized_query']!r}  total={result['total']}")
+    assert result["optimized_query"] == "learn python" and result["total"] == 8
+    assert elapsed < ai_search_service.SEARCH_TOTAL_BUDGET_SECONDS + 0.5
+
+    print("✅ Search pipeline stays within budget")
+
+    # Cache tiers
+    LATENCY["optimize"] = 0.6
+    cache = ai_search_service.search_cache
+    elapsed_miss, result = await one_search("Python  tutorial", cached=True)
+    calls_before = upstream_calls
+    elapsed_hit, repeat = await one_search("python tutorial!", cached=True)  # Same normalized key
+    assert (result["cache"], repeat["cache"]) == ("miss", "hit") and upstream_calls == calls_before
+
+    cache.memory.clear()  # Simulate a restart: only the SQLite tier remains
+    elapsed_disk, from_disk = await one_search("python tutorial", cached=True)
+    assert from_disk["cache"] == "hit" and cache.counters["disk_hits"] == 1
+
+    cache.fresh_ttl = 0  # Everything is stale now
+    elapsed_stale, stale = await one_search("python tutorial", cached=True)
+    assert stale["cache"] == "stale"
+    await asyncio.sleep(sum(LATENCY.values()) + 0.5)  # Background refresh completes
+    cache.fresh_ttl = ai_search_service.SEARCH_CACHE_FRESH_SECONDS
+    _, refreshed = await one_search("python tutorial", cached=True)
+    assert refreshed["cache"] == "hit"
+
+    print(f"   Cache miss {elapsed_miss * 1000:.0f}ms | memory hit {elapsed_hit * 1e6:.0f}µs | "
+          f"disk hit {elapsed_disk * 1e6:.0f}µs | stale served {elapsed_stale * 1e6:.0f}µs (refreshed in background)")
+    print(f"   Stats: {cache.stats()}")
+
+    await ai_search_service.close_search_client()
+    print("✅ Cache tiers behave as expected")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
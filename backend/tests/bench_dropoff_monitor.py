@@ -0,0 +1,143 @@
+"""
+Benchmark: live drop-off scoring of SESSIONS active sessions
+Heartbeats for every session go through MetricsService (as the HTTP and WebSocket paths do),
+then one monitor tick scores all of them with a single vectorized model call. Compared with
+one predict per session, for both the scikit-learn stand-in and its model registry export.
+Also checks that a tight CPU budget defers sessions instead of overrunning, and that deferred
+sessions are scored first on the next tick.
+
+Usage: python tests/bench_dropoff_monitor.py [sessions]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import numpy as np
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ml_inference
+import model_registry
+import dropoff_monitor as monitor_module
+from dropoff_monitor import DropoffMonitor
+from metrics_service import MetricsService, session_metrics
+from bench_ml_inference import train_stand_ins
+
+
+def send_heartbeats(sessions: int, beats: int, rng: random.Random) -> float:
+    """`beats` heartbeats per session (test ids, so nothing is looked up); returns µs per heartbeat"""
+    lengths = [rng.randint(300, 3600) for _ in range(sessions)]
+    speeds = [rng.uniform(0.2, 1.2) for _ in range(sessions)]
+    resumed_at = [rng.uniform(0, length) for length in lengths]  # Joined mid-video
+    started = time.perf_counter()
+    for beat in range(1, beats + 1):
+        for i in range(sessions):
+            watched = int(resumed_at[i] + beat * 5 * speeds[i])
+            MetricsService.record_heartbeat(
+                session_id=f"live-{i}",
+                user_id=f"student-{i}",
+                duration_seconds=watched,
+                completion_pct=min(100.0, watched / lengths[i] * 100),
+                current_lecture=1 + watched // 600
+            )
+    return (time.perf_counter() - started) / (sessions * beats) * 1e6
+
+
+async def score(monitor: DropoffMonitor, name: str, model) -> dict:
+    ml_inference.register_model(name, model)
+    monitor.columns["scored_at"][:] = 0
+    monitor.ms_per_row = None
+    # Unlimited budget for this measurement; the first tick only calibrates (DROPOFF_CALIBRATION_ROWS)
+    original = monitor_module.DROPOFF_TICK_BUDGET_MS
+    monitor_module.DROPOFF_TICK_BUDGET_MS = 1e9
+    try:
+        await monitor.tick()
+        started = time.perf_counter()
+        scored = await monitor.tick()
+        wall_ms = (time.perf_counter() - started) * 1000
+    finally:
+        monitor_module.DROPOFF_TICK_BUDGET_MS = original
+
+    batcher = ml_inference.batchers[name]
+    slots = np.flatnonzero(monitor.in_use)
+    matrix = monitor.feature_matrix(slots, batcher.columns)
+    sample = slots[:500]
+    started = time.perf_counter()
+    for slot in sample:
+        batcher._predict(monitor.feature_matrix(np.array([slot]), batcher.columns))
+    per_session_ms = (time.perf_counter() - started) * 1000 / len(sample) * len(slots)
+
+    expected = model.predict_proba(matrix)[:, 1]
+    error = float(np.abs(monitor.columns["risk"][slots] - expected).max())
+    return {
+        "scored": scored, "cpu_ms": monitor.counters["last_tick_ms"], "wall_ms": wall_ms,
+        "per_session_ms": per_session_ms, "error": error
+    }
+
+
+async def check_budget(monitor: DropoffMonitor, model) -> dict:
+    """Budget for ~1/4 of the sessions: each tick stays near it and the backlog rotates through"""
+    ml_inference.register_model("dropoff_risk", model)
+    active = len(monitor.slots)
+    monitor.columns["scored_at"][:] = 0
+    monitor.ms_per_row = None
+    await monitor.tick()
+    original = monitor_module.DROPOFF_TICK_BUDGET_MS
+    monitor_module.DROPOFF_TICK_BUDGET_MS = monitor.ms_per_row * active / 4
+    try:
+        ticks = []
+        for _ in range(6):
+            scored = await monitor.tick()
+            ticks.append((scored, monitor.counters["last_tick_ms"]))
+            await asyncio.sleep(0.002)  # Distinct monotonic timestamps per tick
+        never = int((monitor.columns["scored_at"][monitor.in_use] == 0).sum())
+        return {"budget_ms": monitor_module.DROPOFF_TICK_BUDGET_MS, "ticks": ticks, "never_scored": never}
+    finally:
+        monitor_module.DROPOFF_TICK_BUDGET_MS = original
+
+
+async def main(sessions: int):
+    rng = random.Random(21)
+    stand_in = train_stand_ins(rng)["dropoff_risk"]
+    registry_dir = tempfile.mkdtemp()
+    model_registry.export_model("dropoff_risk", stand_in, ml_inference.FEATURES_DROPOFF_RISK, registry_dir=registry_dir)
+    flat = model_registry.load_model("dropoff_risk", registry_dir=registry_dir)
+
+    monitor = monitor_module.dropoff_monitor
+    heartbeat_us = send_heartbeats(sessions, 4, rng)
+    assert len(monitor.slots) == sessions
+
+    results = {
+        "sklearn RandomForest": await score(monitor, "dropoff_risk", stand_in),
+        "registry (flat arrays)": await score(monitor, "dropoff_risk", flat),
+    }
+    budget = await check_budget(monitor, flat)
+
+    print(f"\n📊 {sessions:,} active sessions ({len(monitor.slots)} tracked, {heartbeat_us:.1f}µs per heartbeat incl. MetricsService)")
+    for name, result in results.items():
+        print(f"   {name:24} one tick: {result['scored']:,} scored, {result['cpu_ms']:7.1f}ms CPU "
+              f"({result['wall_ms']:.1f}ms wall)   one predict per session: {result['per_session_ms']:8.0f}ms "
+              f"({result['per_session_ms'] / result['cpu_ms']:.0f}x)")
+    print(f"   Default budget {monitor_module.DROPOFF_TICK_BUDGET_MS:.0f}ms per {monitor_module.DROPOFF_TICK_SECONDS:.0f}s tick")
+    print(f"   Budget {budget['budget_ms']:.1f}ms/tick: " +
+          ", ".join(f"{scored} rows {ms:.1f}ms" for scored, ms in budget["ticks"]))
+    print(f"   At risk (>= {monitor_module.DROPOFF_RISK_THRESHOLD}): {len(monitor.at_risk(limit=sessions)):,} sessions")
+
+    for result in results.values():
+        assert result["scored"] == sessions and result["error"] < 1e-9
+        assert result["cpu_ms"] <= monitor_module.DROPOFF_TICK_BUDGET_MS, "full tick over the default budget"
+    assert all(scored < sessions for scored, _ in budget["ticks"]) and budget["never_scored"] == 0
+
+    for i in range(sessions):
+        MetricsService.discard(f"live-{i}")
+    assert not monitor.slots and not session_metrics
+    print("✅ Monitor scores match the model; budgeted ticks rotate through every session")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,215 @@
+"""
+Benchmark: duplicate session ends (unload beacon racing /session/end)
+For SESSIONS client-side video sessions, /session/end-beacon and /session/end fire together,
+and a retry arrives later. Against a local PostgREST stand-in that models settle_session
+(migrations/009) and settle_session_once (migrations/010), this counts ledger rows and
+requests with settlement dedupe, compared with settling on every end request as before.
+Also checks replays from the database tier (another worker / after a restart), an end
+without a session_id (resolved to the open session), that an Idempotency-Key can't
+settle a session a second time, and test users (memory only).
+
+Usage: python tests/bench_end_session_dedupe.py [sessions]
+"""
+import sys
+import time
+import uuid
+import asyncio
+import statistics
+from urllib.parse import urlparse, parse_qs
+from postgrest_stand_in import start_stand_in, StandInError
+
+LATENCY = 0.01  # Simulated PostgREST round trip (seconds)
+IN_FLIGHT = 25  # Sessions ending at once
+
+payments = []
+balances = {}
+settlement_keys = {}
+locks = {}  # session_id -> lock payment start_session recorded
+active_sessions = {}
+
+
+def settle_session(args):
+    """settle_session for a "vs_" id: no sessions row, so every call writes ledger rows"""
+    locked = min(args["p_locked_amount"], locks.get(args["p_session_id"], 0.0))
+    charge = min(round(args["p_duration_seconds"] / 60 * args["p_price_per_minute"], 2), locked)
+    refund = round(locked - charge, 2)
+    student = args["p_student_id"]
+    for payment_type, amount in (("charge", charge), ("refund", refund)):
+        if amount > 0:
+            payments.append({"session_id": args["p_session_id"], "payment_type": payment_type, "amount": amount})
+    balances[student] = round(balances.get(student, 100.0) - charge, 2)
+    active_sessions.pop(student, None)
+    return {
+        "session_id": args["p_session_id"], "status": "completed", "already_settled": False,
+        "duration_seconds": args["p_duration_seconds"], "price_per_minute": args["p_price_per_minute"],
+        "locked_amount": locked, "amount_charged": charge, "refund": refund,
+        "final_balance": balances[student], "ended_at": "2026-10-17T10:00:00+00:00"
+    }
+
+
+def ledger_report(args):
+    """settle_session on a "vs_" id whose charge/refund rows exist: reported, nothing written"""
+    rows = [row for row in payments if row["session_id"] == args["p_session_id"]]
+    assert rows, f"claim without a settlement for {args['p_session_id']}"
+    total = {kind: sum(row["amount"] for row in rows if row["payment_type"] == kind) for kind in ("charge", "refund")}
+    return {
+        "session_id": args["p_session_id"], "status": "completed", "already_settled": True, "duration_seconds": 0,
+        "amount_charged": total["charge"], "refund": total["refund"], "final_balance": balances.get(args["p_student_id"])
+    }
+
+
+def responder(method, path, body):
+    url = urlparse(path)
+    if url.path == "/rest/v1/rpc/settle_session":
+        return settle_session(body)
+    if url.path == "/rest/v1/rpc/settle_session_once":
+        key, client_key = body["p_idempotency_key"], body.get("p_client_key")
+        if key in settlement_keys:
+            recorded, stored = settlement_keys[key]
+            if client_key and recorded and client_key != recorded:
+                raise StandInError(f"Session {body['p_session_id']} was already settled under a different Idempotency-Key", code="P0001")
+            # Claims are permanent; a purged result falls back to the already-settled report
+            return {**(stored or ledger_report(body)), "replayed": True, "idempotency_key": recorded}
+        settlement_keys[key] = (client_key, settle_session(body))
+        return {**settlement_keys[key][1], "replayed": False, "idempotency_key": client_key}
+    if url.path == "/rest/v1/sessions":
+        student = parse_qs(url.query)["student_id"][0][3:]
+        session_id = active_sessions.get(student)
+        return [{"id": session_id, "locked_amount": 30.0, "start_time": None}] if session_id else []
+    return []
+
+
+async def legacy_end_session(supabase, user_id, session_id, duration_seconds):
+    """Every end request settles (settle_session without a key), as before dedupe"""
+    await supabase.rpc("settle_session", {
+        "p_session_id": session_id, "p_student_id": user_id, "p_duration_seconds": duration_seconds,
+        "p_price_per_minute": 2.0, "p_locked_amount": 30.0
+    }).execute()
+
+
+async def ends(end, users, session_ids):
+    """Beacon and /session/end together for every session, then a late retry"""
+    semaphore = asyncio.Semaphore(IN_FLIGHT)
+
+    async def unload(i, user, session_id):
+        async with semaphore:
+            await asyncio.gather(end(user, session_id, 300 + i), end(user, session_id, 301 + i))
+
+    async def retry(i, user, session_id):
+        async with semaphore:
+            await end(user, session_id, 300 + i)
+
+    await asyncio.gather(*(unload(i, user, session_id) for i, (user, session_id) in enumerate(zip(users, session_ids))))
+    await asyncio.gather(*(retry(i, user, session_id) for i, (user, session_id) in enumerate(zip(users, session_ids))))
+
+
+async def main(count: int):
+    stand_in = start_stand_in(LATENCY, responder)
+
+    from database import supabase, close_database
+    from wallet_service import VideoSessionService, settled_sessions, settlement_key
+
+    users = [str(uuid.uuid4()) for _ in range(count)]
+    legacy_ids = [f"vs_old_{i}" for i in range(count)]
+    session_ids = [f"vs_{uuid.uuid4().hex[:16]}" for _ in range(count)]
+    locks.update((session_id, 30.0) for session_id in legacy_ids + session_ids)
+
+    # Before: each of the 3 end requests per session writes its own charge + refund
+    stand_in.reset_count()
+    await ends(lambda u, s, d: legacy_end_session(supabase, u, s, d), users, legacy_ids)
+    legacy = {"rows": len(payments), "requests": stand_in.request_count}
+
+    # After: one settlement per session, repeats replayed
+    payments.clear()
+    balances.clear()
+    results = {}
+
+    async def end(user, session_id, duration):
+        result = await VideoSessionService.end_session(user, session_id, duration, 2.0, 30.0)
+        results.setdefault(session_id, []).append(result)
+
+    stand_in.reset_count()
+    await ends(end, users, session_ids)
+    deduped = {"rows": len(payments), "requests": stand_in.request_count}
+    for session_id in session_ids:
+        first, *repeats = results[session_id]
+        assert not first["replayed"] and all(r["replayed"] for r in repeats)
+        assert all(r["amount_charged"] == first["amount_charged"] for r in repeats)
+
+    # Memory tier: repeat latency without a round trip
+    started = time.perf_counter()
+    for user, session_id in zip(users, session_ids):
+        await VideoSessionService.end_session(user, session_id, 999, 2.0, 30.0)
+    memory_us = (time.perf_counter() - started) / count * 1e6
+
+    # Database tier: another worker (empty memory cache) gets the stored result
+    settled_sessions.clear()
+    stand_in.reset_count()
+    latencies = []
+    for user, session_id in zip(users, session_ids):
+        started = time.perf_counter()
+        replay = await VideoSessionService.end_session(user, session_id, 999, 2.0, 30.0)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert replay["replayed"] and replay["duration_seconds"] != 999
+    assert stand_in.request_count == count and len(payments) == deduped["rows"]
+
+    # No session_id: the open session is settled instead of a made-up one
+    user = str(uuid.uuid4())
+    active_sessions[user] = f"vs_{uuid.uuid4().hex[:16]}"
+    locks[active_sessions[user]] = 30.0
+    first = await VideoSessionService.end_session(user, None, 120, 2.0, 30.0)
+    settled_sessions.delete(settlement_key(user, first["session_id"]))
+    again = await VideoSessionService.end_session(user, first["session_id"], 120, 2.0, 30.0)
+    assert again["replayed"] and again["session_id"] == first["session_id"]
+
+    # The session is the key: an Idempotency-Key never settles a session again. Settled without
+    # one, any key replays; settled under one, the same key or none replays and another is refused
+    rows = len(payments)
+    replay = await VideoSessionService.end_session(users[0], session_ids[0], 900, 2.0, 30.0, idempotency_key="late")
+    assert replay["replayed"] and replay["duration_seconds"] != 900
+    user = str(uuid.uuid4())
+    session_id = f"vs_{uuid.uuid4().hex[:16]}"
+    locks[session_id] = 30.0
+    first = await VideoSessionService.end_session(user, session_id, 60, 2.0, 30.0, idempotency_key="tab-1")
+    for idempotency_key in ("tab-1", None):
+        assert (await VideoSessionService.end_session(user, session_id, 60, 2.0, 30.0, idempotency_key=idempotency_key))["replayed"]
+    for tier in ("memory", "table"):
+        if tier == "table":
+            settled_sessions.clear()
+        try:
+            await VideoSessionService.end_session(user, session_id, 900, 2.0, 30.0, idempotency_key="tab-2")
+            raise AssertionError("a second Idempotency-Key settled the session again")
+        except ValueError as e:
+            assert "different Idempotency-Key" in str(e)
+    assert len(payments) == rows + 2 and not first["replayed"]
+
+    # Stored results purged (purge_settlement_idempotency) and no memory entry: the claim still
+    # stands, so a zero-duration replay gets the recorded amounts and writes nothing
+    rows = len(payments)
+    for key, (recorded, _) in settlement_keys.items():
+        settlement_keys[key] = (recorded, None)
+    settled_sessions.clear()
+    late = await VideoSessionService.end_session(users[1], session_ids[1], 0, 2.0, 30.0)
+    assert late["replayed"] and len(payments) == rows
+    assert late["refund"] == results[session_ids[1]][0]["refund"] > 0
+
+    # Test users settle in memory only; repeats must not charge the in-memory balance again
+    from wallet_service import TEST_USER_BALANCES
+    await VideoSessionService.end_session("test-user-1", "vs_test", 600, 2.0, 30.0)
+    balance = TEST_USER_BALANCES["test-user-1"]
+    assert (await VideoSessionService.end_session("test-user-1", "vs_test", 600, 2.0, 30.0))["replayed"]
+    assert TEST_USER_BALANCES["test-user-1"] == balance
+    await close_database()
+
+    print(f"\n📊 {count:,} sessions x 3 end requests (beacon + /session/end together, then a retry), "
+          f"stand-in latency {LATENCY * 1000:.0f}ms")
+    print(f"   Settle every request:   {legacy['rows']:6,} ledger rows  {legacy['requests']:6,} requests")
+    print(f"   Settlement dedupe:      {deduped['rows']:6,} ledger rows  {deduped['requests']:6,} requests")
+    print(f"   Repeat on this worker (memory):   {memory_us:8.1f}µs, no request")
+    print(f"   Repeat on another worker (table): {statistics.median(latencies):8.1f}ms p50, 1 request, no ledger rows")
+    assert deduped["rows"] * 3 == legacy["rows"] and deduped["requests"] == count
+    print("✅ Each session settled once; repeats replay the first result")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
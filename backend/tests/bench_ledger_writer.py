@@ -0,0 +1,162 @@
+"""
+Benchmark: payments ledger writes at end-of-class peak
+SETTLEMENTS concurrent settlements each record a charge and a refund through
+PaymentService (now the batched ledger writer), compared with the single-row insert per
+payment it replaced, against a local PostgREST stand-in.
+Under this burst the single-row path queues on the connection pool (failures are counted).
+Checks that every caller gets back its own inserted row, that each row is stored exactly
+once, that a rejected row inside a batch fails only its own caller, and that rows left
+out of the insert response are read back (never re-inserted) so callers always get an id.
+
+Usage: python tests/bench_ledger_writer.py [settlements]
+"""
+import sys
+import time
+import uuid
+import asyncio
+import statistics
+from urllib.parse import urlparse, parse_qs
+from postgrest_stand_in import start_stand_in, StandInError
+
+LATENCY = 0.01  # Simulated PostgREST round trip (seconds)
+ROW_COST = 0.00002  # Extra database time per inserted row (seconds)
+
+stored = {}
+rows_by_tx_id = {}
+batch_sizes = []
+omit_response = {"enabled": False}  # Insert responds without the rows (e.g. return=minimal)
+
+
+def responder(method, path, body):
+    """payments accepts one row or a list; amount must be positive (CHECK constraint)"""
+    url = urlparse(path)
+    if url.path == "/rest/v1/payments" and method == "GET":
+        tx_ids = parse_qs(url.query)["gateway_tx_id"][0][len("in.("):-1].split(",")
+        return [rows_by_tx_id[tx_id] for tx_id in tx_ids if not tx_id.startswith("unreadable_")]
+    if url.path != "/rest/v1/payments" or method != "POST":
+        return []
+    rows = body if isinstance(body, list) else [body]
+    if any(row["amount"] <= 0 for row in rows):
+        raise StandInError('new row for relation "payments" violates check constraint "payments_amount_check"')
+    time.sleep(ROW_COST * len(rows))
+    batch_sizes.append(len(rows))
+    inserted = []
+    for row in rows:
+        item = {**row, "id": str(uuid.uuid4())}
+        stored[item["gateway_tx_id"]] = stored.get(item["gateway_tx_id"], 0) + 1
+        rows_by_tx_id[item["gateway_tx_id"]] = item
+        inserted.append(item)
+    return [] if omit_response["enabled"] else inserted
+
+
+async def legacy_insert(supabase, row):
+    """One request per payment, as before the ledger writer"""
+    result = await supabase.table("payments").insert(row).execute()
+    return result.data[0]
+
+
+async def settle(write, session_id, student_id, teacher_id, charge, refund):
+    """One settlement: a charge and a refund, each awaited until committed"""
+    started = time.perf_counter()
+    rows = [
+        {"session_id": session_id, "payment_type": "charge", "amount": charge, "from_user_id": student_id,
+         "to_user_id": teacher_id, "gateway_tx_id": f"charge_{uuid.uuid4().hex[:16]}", "gateway_status": "completed"},
+        {"session_id": session_id, "payment_type": "refund", "amount": refund, "to_user_id": student_id,
+         "gateway_tx_id": f"refund_{uuid.uuid4().hex[:16]}", "gateway_status": "completed"}
+    ]
+    written = await asyncio.gather(*(write(row) for row in rows))
+    for row, item in zip(rows, written):
+        assert item["gateway_tx_id"] == row["gateway_tx_id"] and item["amount"] == row["amount"]
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(stand_in, write, count):
+    stand_in.reset_count()
+    teacher_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(
+        settle(write, str(uuid.uuid4()), str(uuid.uuid4()), teacher_id, round(5 + i % 20, 2), round(25 - i % 20 + 0.5, 2))
+        for i in range(count)
+    ), return_exceptions=True)
+    wall = time.perf_counter() - started
+    latencies = sorted(outcome for outcome in outcomes if not isinstance(outcome, BaseException))
+    errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    return {
+        "wall_s": wall, "requests": stand_in.request_count, "failed": len(errors),
+        "error": type(errors[0]).__name__ if errors else "",
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p99": latencies[max(int(len(latencies) * 0.99) - 1, 0)] if latencies else 0
+    }
+
+
+async def main(count: int):
+    stand_in = start_stand_in(LATENCY, responder)
+
+    from database import supabase, close_database, DB_POOL_SIZE
+    from payment_service import PaymentService
+    from ledger_writer import ledger_writer, LEDGER_BATCH_WAIT_MS
+
+    batched = await run(stand_in, ledger_writer.write, count)
+    assert batched["failed"] == 0, f"batched writes must all commit ({batched})"
+    assert len(stored) == count * 2 and set(stored.values()) == {1}, "every row stored exactly once"
+
+    # The service methods go through the writer too
+    session_id = str(uuid.uuid4())
+    charge, refund = await asyncio.gather(
+        PaymentService.charge_payment(session_id, str(uuid.uuid4()), str(uuid.uuid4()), 12.5),
+        PaymentService.refund_payment(session_id, str(uuid.uuid4()), 17.5)
+    )
+    assert charge["payment_type"] == "charge" and refund["payment_type"] == "refund" and charge["id"]
+
+    # A bad row in a batch: the batch is retried row by row and only its caller fails
+    rows = [
+        {"payment_type": "deposit", "amount": -1 if i == 7 else 10, "to_user_id": str(uuid.uuid4()),
+         "gateway_tx_id": f"deposit_{i}_{uuid.uuid4().hex[:8]}"}
+        for i in range(50)
+    ]
+    outcomes = await asyncio.gather(*(ledger_writer.write(row) for row in rows), return_exceptions=True)
+    failed = [i for i, outcome in enumerate(outcomes) if isinstance(outcome, Exception)]
+    assert failed == [7] and "check constraint" in str(outcomes[7])
+    assert all(stored[row["gateway_tx_id"]] == 1 for i, row in enumerate(rows) if i != 7)
+
+
+    stats = ledger_writer.stats()
+
+    # Insert response without rows: each caller still gets its stored row (with id), nothing re-inserted
+    omit_response["enabled"] = True
+    rows = [
+        {"payment_type": "deposit", "amount": 10, "to_user_id": str(uuid.uuid4()),
+         "gateway_tx_id": f"deposit_quiet_{i}_{uuid.uuid4().hex[:8]}"}
+        for i in range(20)
+    ]
+    returned = await asyncio.gather(*(ledger_writer.write(row) for row in rows))
+    assert [item["gateway_tx_id"] for item in returned] == [row["gateway_tx_id"] for row in rows]
+    assert all(item["id"] and stored[item["gateway_tx_id"]] == 1 for item in returned)
+    lost = {"payment_type": "deposit", "amount": 10, "to_user_id": str(uuid.uuid4()), "gateway_tx_id": "unreadable_1"}
+    try:
+        await ledger_writer.write(lost)
+        raise AssertionError("a row that can't be read back must fail its caller")
+    except ValueError as e:
+        assert "written but not returned" in str(e)
+    omit_response["enabled"] = False
+    await ledger_writer.close()
+
+    # Last: the single-row burst can exhaust the pool and leave timed-out connections behind
+    legacy = await run(stand_in, lambda row: legacy_insert(supabase, row), count)
+    await close_database()
+
+    print(f"\n📊 {count:,} concurrent settlements ({count * 2:,} payment rows), stand-in latency "
+          f"{LATENCY * 1000:.0f}ms, pool {DB_POOL_SIZE}, batch window {LEDGER_BATCH_WAIT_MS:.0f}ms")
+    print(f"   {'path':26} {'wall s':>7} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for name, result in (("single-row inserts", legacy), ("batched ledger writer", batched)):
+        print(f"   {name:26} {result['wall_s']:7.2f} {result['requests']:9,} {result['p50']:8.1f} {result['p99']:8.1f} "
+              f"{result['failed']:7,} {result['error']}")
+    print(f"   {legacy['wall_s'] / batched['wall_s']:.1f}x faster, {legacy['requests'] / batched['requests']:.0f}x fewer requests, "
+          f"mean batch {statistics.mean(batch_sizes[:batched['requests']]):.0f} rows (largest {stats['largest_batch']})")
+    print(f"   Rejected batch: {stats['retried_rows']} rows retried singly, {stats['failed_rows']} failed")
+    print("   (stand-in runs in-process: every request also costs client + server CPU here)")
+    print("✅ Each caller got its own committed row; a bad row fails only its caller")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,98 @@
+"""
+Benchmark: playback heartbeat write volume, naive vs coalesced
+Simulates VIEWERS concurrent viewers sending a heartbeat every 5 seconds for SIMULATED_SECONDS.
+Naive = one sessions UPDATE per heartbeat; coalesced = MetricsService buffer flushed every
+METRICS_FLUSH_INTERVAL_SECONDS in batched RPCs. Also checks that flushed durations never
+go backwards even when heartbeats arrive out of order.
+
+Usage: python tests/bench_metrics_ingestion.py [viewers]
+"""
+import sys
+import time
+import uuid
+import random
+import asyncio
+from postgrest_stand_in import start_stand_in
+
+HEARTBEAT_SECONDS = 5
+SIMULATED_SECONDS = 60
+FLUSH_EVERY_SECONDS = 15
+
+persisted_duration = {}  # session_id -> last duration written by a flush
+regressions = 0
+
+
+def responder(method, path, body):
+    """Record flushed durations and count any that move backwards"""
+    global regressions
+    if path.startswith("/rest/v1/rpc/flush_session_metrics"):
+        for update in body["p_updates"]:
+            previous = persisted_duration.get(update["session_id"], 0)
+            if update["duration_seconds"] < previous:
+                regressions += 1
+            persisted_duration[update["session_id"]] = update["duration_seconds"]
+        return len(body["p_updates"])
+    return []
+
+
+async def main(viewers: int):
+    stand_in = start_stand_in(0.0, responder)
+
+    from database import supabase, close_database
+    from metrics_service import MetricsService
+
+    rng = random.Random(7)
+    sessions = [(str(uuid.uuid4()), str(uuid.uuid4())) for _ in range(viewers)]
+    ticks = list(range(HEARTBEAT_SECONDS, SIMULATED_SECONDS + 1, HEARTBEAT_SECONDS))
+    heartbeats = viewers * len(ticks)
+
+    # Naive: one UPDATE per heartbeat (bounded concurrency, like a busy API worker)
+    stand_in.reset_count()
+    limiter = asyncio.Semaphore(50)
+
+    async def naive_write(session_id, duration):
+        async with limiter:
+            await supabase.table("sessions")\
+                .update({"duration_seconds": duration, "content_progress": {"completion_pct": 10}})\
+                .eq("id", session_id)\
+                .execute()
+
+    started = time.perf_counter()
+    for tick in ticks:
+        await asyncio.gather(*(naive_write(session_id, tick) for session_id, _ in sessions))
+    naive_seconds = time.perf_counter() - started
+    naive_requests = stand_in.request_count
+
+    # Coalesced: heartbeats hit the in-memory buffer, flushes run on the interval
+    stand_in.reset_count()
+    highest_sent = {}
+    started = time.perf_counter()
+    for tick in ticks:
+        for session_id, user_id in sessions:
+            # ~10% of heartbeats arrive late with a stale duration
+            duration = tick - HEARTBEAT_SECONDS if rng.random() < 0.1 else tick
+            highest_sent[session_id] = max(highest_sent.get(session_id, 0), duration)
+            MetricsService.record_heartbeat(session_id, user_id, duration, tick / SIMULATED_SECONDS * 100)
+        if tick % FLUSH_EVERY_SECONDS == 0:
+            await MetricsService.flush()
+    await MetricsService.flush()
+    coalesced_seconds = time.perf_counter() - started
+    coalesced_requests = stand_in.request_count
+
+    await close_database()
+
+    reduction = naive_requests / max(coalesced_requests, 1)
+    print(f"\n📊 {viewers} viewers x {len(ticks)} heartbeats = {heartbeats} heartbeats")
+    print(f"   Naive:     {naive_requests:6d} writes  {naive_seconds * 1000:8.1f}ms")
+    print(f"   Coalesced: {coalesced_requests:6d} writes  {coalesced_seconds * 1000:8.1f}ms")
+    print(f"   Write reduction: {reduction:.0f}x")
+    print(f"   Duration regressions in flushed data: {regressions}")
+
+    assert reduction >= 10, "Expected at least 10x fewer writes"
+    assert regressions == 0, "Flushed durations must never go backwards"
+    assert persisted_duration == highest_sent, "Final flush must carry each session's highest duration"
+    print("✅ Coalescing target met")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -0,0 +1,93 @@
+"""
+Benchmark: micro-batched model serving vs one model call per request
+Stand-in models with the pipeline's exact feature columns are trained on synthetic rows
+(the shipped pickles need the scikit-learn version they were trained with), then REQUESTS
+concurrent single-row prediction requests are served both ways.
+
+Usage: python tests/bench_ml_inference.py [requests]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import numpy as np
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, RandomForestClassifier
+import ml_inference
+
+
+def random_row(rng: random.Random):
+    length = rng.randint(120, 3600)
+    completion = rng.uniform(0, 100)
+    return {
+        "completion_percentage_video": completion,
+        "watch_time_sec": length * completion / 100 * rng.uniform(0.8, 1.3),
+        "video_length_sec": length,
+        "device": rng.choice(["desktop", "mobile", "tablet"]),
+        "hour_of_day": rng.randint(0, 23),
+        "day_of_week": rng.randint(0, 6),
+        "mcq_attempted": rng.random() < 0.7,
+        "mcq_solve_rate": rng.random()
+    }
+
+
+def train_stand_ins(rng: random.Random):
+    rows = [random_row(rng) for _ in range(4000)]
+    features = ml_inference.engineer_features(rows)
+    success = (features["engagement_depth_score"] + np.array([rng.gauss(0, 0.2) for _ in rows]) > 0.5).astype(int)
+    dropoff = (features["completion_percentage_video"] < 40).astype(int)
+    credibility = np.clip(0.4 * features["engagement_depth_score"] + 0.2 * features["time_investment_score"], 0, 1)
+
+    def matrix(columns):
+        return np.column_stack([features[name] for name in columns])
+
+    return {
+        "learning_success": GradientBoostingClassifier(n_estimators=100, max_depth=5, random_state=42)
+            .fit(matrix(ml_inference.FEATURES_LEARNING_SUCCESS), success),
+        "credibility": GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+            .fit(matrix(ml_inference.FEATURES_CREDIBILITY), credibility),
+        "dropoff_risk": RandomForestClassifier(n_estimators=100, max_depth=8, random_state=42)
+            .fit(matrix(ml_inference.FEATURES_DROPOFF_RISK), dropoff),
+    }
+
+
+async def main(request_count: int):
+    rng = random.Random(9)
+    models = train_stand_ins(rng)
+    for name, model in models.items():
+        ml_inference.register_model(name, model)
+    requests = [random_row(rng) for _ in range(request_count)]
+
+    print(f"\n📊 {request_count} concurrent single-row requests per model")
+    for name, model in models.items():
+        batcher = ml_inference.batchers[name]
+
+        # Before: every request runs its own model call (off the loop, like the batched path)
+        started = time.perf_counter()
+        naive = await asyncio.gather(*(
+            asyncio.to_thread(batcher._predict, ml_inference.feature_matrix([row], batcher.columns))
+            for row in requests
+        ))
+        naive_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batched = await asyncio.gather(*(ml_inference.predict(name, [row]) for row in requests))
+        batched_s = time.perf_counter() - started
+
+        counters = batcher.counters
+        print(f"   {name:17} per-request {naive_s * 1000:6.0f}ms ({request_count} model calls)  "
+              f"micro-batched {batched_s * 1000:5.0f}ms ({counters['batches']} calls)  "
+              f"{naive_s / batched_s:.1f}x")
+        assert all(abs(round(float(a[0]), 4) - b[0]) < 1e-9 for a, b in zip(naive, batched))
+
+    ml_inference.shutdown_models()
+    print("✅ Micro-batched predictions match per-request predictions")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
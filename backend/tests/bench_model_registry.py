@@ -0,0 +1,156 @@
+"""
+Benchmark: model registry (memory-mapped flat tree arrays) vs pickled scikit-learn models
+Stand-in models with the pipeline's feature columns are exported both ways to a temp dir.
+Each format is then cold-started in a fresh interpreter (imports + load + first prediction),
+reporting time, on-disk size and how much private (anonymous) memory the models take per
+process; registry arrays are page-cache backed and shared by every worker process.
+Registry predictions are checked against the original estimators.
+
+Usage: python tests/bench_model_registry.py [rows]
+"""
+import os
+import sys
+import json
+import random
+import pickle
+import asyncio
+import tempfile
+import subprocess
+import numpy as np
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-key")
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ml_inference
+import model_registry
+from bench_ml_inference import random_row, train_stand_ins
+
+# Runs in a fresh interpreter: argv = [format, directory]; prints one JSON line
+COLD_START = r"""
+import os, sys, json, time
+started = time.perf_counter()
+
+def anonymous_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("Anonymous:"))
+
+import numpy as np
+before = anonymous_kb()
+fmt, directory = sys.argv[1], sys.argv[2]
+names = ["learning_success", "credibility", "dropoff_risk"]
+if fmt == "pickle":
+    import pickle
+    models = {}
+    for name in names:
+        with open(os.path.join(directory, name + ".pkl"), "rb") as f:
+            models[name] = pickle.load(f)
+else:
+    sys.path.insert(0, sys.argv[3])
+    import model_registry
+    models = {name: model_registry.load_model(name, registry_dir=directory) for name in names}
+loaded = time.perf_counter()
+
+X = np.random.default_rng(0).random((1000, 9)) * 100
+for name, model in models.items():
+    columns = model.n_features_in_ if fmt == "pickle" else model.metadata["n_features"]
+    if name == "credibility":
+        model.predict(X[:, :columns])
+    else:
+        model.predict_proba(X[:, :columns])
+done = time.perf_counter()
+print(json.dumps({
+    "load_ms": (loaded - started) * 1000,
+    "first_predict_ms": (done - loaded) * 1000,
+    "private_mb": (anonymous_kb() - before) / 1024
+}))
+"""
+
+
+def cold_start(fmt: str, directory: str, repeats: int = 3):
+    """Best of `repeats` fresh-interpreter runs"""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START, fmt, directory, BACKEND_DIR],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["load_ms"] + run["first_predict_ms"])
+
+
+def directory_mb(directory: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    ) / 1e6
+
+
+async def serve_from_registry(registry_dir: str, rows):
+    """ml_inference end to end: discover at startup, load on first request"""
+    ml_inference.batchers.clear()
+    original = model_registry.ML_REGISTRY_DIR
+    model_registry.ML_REGISTRY_DIR = registry_dir
+    try:
+        ml_inference.load_models()
+        assert not ml_inference.stats()["loaded"], "models should load lazily"
+        results = {name: await ml_inference.predict(name, rows) for name in ml_inference.MODEL_SPECS}
+    finally:
+        model_registry.ML_REGISTRY_DIR = original
+        ml_inference.shutdown_models()
+    return results, ml_inference.stats()
+
+
+def main(rows: int):
+    rng = random.Random(3)
+    models = train_stand_ins(rng)
+    workdir = tempfile.mkdtemp()
+    pickle_dir = os.path.join(workdir, "pickles")
+    registry_dir = os.path.join(workdir, "registry")
+    os.makedirs(pickle_dir)
+
+    for name, model in models.items():
+        with open(os.path.join(pickle_dir, f"{name}.pkl"), "wb") as f:
+            pickle.dump(model, f)
+        model_registry.export_model(
+            name, model, ml_inference.MODEL_SPECS[name][1], training_data_hash="bench", registry_dir=registry_dir
+        )
+
+    # Same outputs as the estimators they came from
+    sample = [random_row(rng) for _ in range(rows)]
+    worst = 0.0
+    for name, model in models.items():
+        columns = ml_inference.MODEL_SPECS[name][1]
+        X = ml_inference.feature_matrix(sample, columns)
+        flat = model_registry.load_model(name, registry_dir=registry_dir)
+        if name == "credibility":
+            expected, actual = model.predict(X), flat.predict(X)
+        else:
+            expected, actual = model.predict_proba(X), flat.predict_proba(X)
+            assert (model.predict(X) == flat.predict(X)).all()
+        worst = max(worst, float(np.abs(expected - actual).max()))
+
+    served, stats = asyncio.run(serve_from_registry(registry_dir, sample[:50]))
+    for name, model in models.items():
+        X = ml_inference.feature_matrix(sample[:50], ml_inference.MODEL_SPECS[name][1])
+        reference = model.predict(X) if name == "credibility" else model.predict_proba(X)[:, 1]
+        assert np.allclose(served[name], np.round(np.clip(reference, 0, 1), 4), atol=1e-4), name
+
+    pickled = cold_start("pickle", pickle_dir)
+    registry = cold_start("registry", registry_dir)
+
+    print(f"\n📊 3 models ({sum(m.n_estimators for m in models.values())} trees)")
+    print(f"   On disk:    pickles {directory_mb(pickle_dir):.2f}MB   registry {directory_mb(registry_dir):.2f}MB")
+    for label, run in (("pickle (sklearn)", pickled), ("registry (mmap)", registry)):
+        print(f"   {label:18} cold start {run['load_ms']:7.1f}ms  first predict {run['first_predict_ms']:6.1f}ms  "
+              f"private memory {run['private_mb']:6.1f}MB/process")
+    print(f"   Max |registry - sklearn| over {rows} rows: {worst:.1e}")
+    print(f"   ml_inference lazy load: {stats['load_ms']}")
+
+    assert worst < 1e-12
+    print("✅ Registry models match the estimators they were exported from")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,129 @@
+"""
+Benchmark: credibility-weighted rating recompute over REVIEWS reviews
+RatingService.recompute_all runs against a local PostgREST stand-in that pages synthetic
+reviews (with their sessions) out and records the update_review_weights batches; a stand-in
+credibility model is served through ml_inference. Compared with scoring one review per
+model call (the submit path), and checked to give the same scores and weights.
+The weighted averages are then rebuilt from the recorded weights, the way rebuild_rating_sums
+and the insert trigger do (rating * weight and weight summed per course).
+
+Usage: python tests/bench_ratings.py [reviews]
+"""
+import sys
+import time
+import random
+import asyncio
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from postgrest_stand_in import start_stand_in
+
+LATENCY = 0.005  # Simulated PostgREST round trip (seconds)
+
+reviews = []
+written = {}
+
+
+def make_reviews(count: int, rng: random.Random):
+    """Reviews spread over 200 courses; drive-by reviewers watch little and rate low"""
+    for i in range(count):
+        engaged = rng.random() < 0.7
+        completion = rng.uniform(50, 100) if engaged else rng.uniform(0, 12)
+        length_min = rng.randint(10, 90)
+        taken = engaged and rng.random() < 0.6
+        reviews.append({
+            "id": f"{i:08d}-0000-0000-0000-000000000000",
+            "course_id": f"course-{rng.randrange(200)}",
+            "rating": rng.randint(3, 5) if engaged else rng.randint(1, 2),
+            "sessions": {
+                "duration_seconds": int(length_min * 60 * completion / 100 * rng.uniform(0.8, 1.2)),
+                "content_progress": {"completion_pct": completion, "device": rng.choice(["desktop", "mobile"])},
+                "start_time": f"2026-10-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00+00:00",
+                "created_at": None,
+                "assessment_taken": taken,
+                "assessment_score": rng.randint(30, 100) if taken else None,
+                "courses": {"total_duration_minutes": length_min}
+            }
+        })
+
+
+def responder(method, path, body):
+    url = urlparse(path)
+    if url.path == "/rest/v1/reviews":
+        query = parse_qs(url.query)
+        after = query.get("id", ["gt."])[0][3:]
+        limit = int(query["limit"][0])
+        page = [review for review in reviews if review["id"] > after][:limit]
+        return [{"id": review["id"], "sessions": review["sessions"]} for review in page]
+    if url.path == "/rest/v1/rpc/update_review_weights":
+        for update in body["p_updates"]:
+            written[update["id"]] = update
+        return len(body["p_updates"])
+    if url.path == "/rest/v1/rpc/rebuild_rating_sums":
+        return len(written)
+    return []
+
+
+def course_averages(weights: np.ndarray):
+    """Per-course (weighted average, plain average) the way the SQL sums define them"""
+    courses = np.array([review["course_id"] for review in reviews])
+    ratings = np.array([review["rating"] for review in reviews], dtype=np.float64)
+    names, index = np.unique(courses, return_inverse=True)
+    weighted = np.bincount(index, ratings * weights) / np.maximum(np.bincount(index, weights), 1e-9)
+    plain = np.bincount(index, ratings) / np.bincount(index)
+    return weighted, plain
+
+
+async def main(count: int):
+    start_stand_in(LATENCY, responder)
+    sys.path.insert(0, __file__.rsplit("/", 1)[0])
+
+    import ml_inference
+    from rating_service import RatingService, review_weights, RATING_MIN_CREDIBILITY, RATING_RECOMPUTE_PAGE
+    from database import close_database
+    from bench_ml_inference import train_stand_ins
+
+    rng = random.Random(22)
+    make_reviews(count, rng)
+    ml_inference.register_model("credibility", train_stand_ins(rng)["credibility"])
+
+    started = time.perf_counter()
+    stats = await RatingService.recompute_all()
+    batch_s = time.perf_counter() - started
+
+    sample = reviews[:300]
+    started = time.perf_counter()
+    single = [
+        float((await RatingService.score_credibility([ml_inference.session_to_row(review["sessions"])]))["scores"][0])
+        for review in sample
+    ]
+    per_review_s = (time.perf_counter() - started) / len(sample) * count
+
+    for review, score in zip(sample, single):
+        update = written[review["id"]]
+        assert update["credibility_score"] == score
+        assert update["rating_weight"] == float(review_weights(np.array([score]))[0])
+
+    weights = np.array([written[review["id"]]["rating_weight"] for review in reviews])
+    weighted, plain = course_averages(weights)
+    zero = int((weights == 0).sum())
+
+    ml_inference.batchers.clear()  # No model: the rule-based baseline takes over
+    written.clear()
+    fallback = await RatingService.recompute_all()
+    await close_database()
+
+    print(f"\n📊 {count:,} reviews, {-(-count // RATING_RECOMPUTE_PAGE)} page(s), stand-in latency {LATENCY * 1000:.0f}ms")
+    print(f"   Batch recompute (one model call per page):   {batch_s:7.2f}s  sources {stats['sources']}")
+    print(f"   One model call per review (submit path):     {per_review_s:7.2f}s (extrapolated from {len(sample)})")
+    print(f"   {zero:,} review(s) below credibility {RATING_MIN_CREDIBILITY} carry no weight")
+    print(f"   Course averages: plain {plain.mean():.2f} -> weighted {weighted.mean():.2f} "
+          f"(max shift {np.abs(weighted - plain).max():.2f})")
+    print(f"   Without a model: {fallback['sources']}")
+
+    assert stats["reviews"] == count and stats["updated"] == count and stats["counted"] == count
+    assert fallback["sources"] == {"baseline": count}
+    print("✅ Batched scores and weights match per-review scoring")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
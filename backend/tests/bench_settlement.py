@@ -0,0 +1,296 @@
+"""
+Benchmark: session settlement latency, chained calls vs the settle_session RPC
+The old VideoSessionService.end_session (charge insert, refund insert, session update,
+record_session_activity, balance read) and SessionService.complete_session (session and
+course reads, update, charge, refund, activity) are replayed against a local PostgREST
+stand-in next to the current single-RPC services. The stand-in keeps a small ledger
+(balances move the way the payments trigger moves them) so both paths are checked to
+settle to the same amounts, a repeated settlement is checked to charge nothing, and a
+client-sent price/lock is checked not to change what a session settles for, and a "vs_"
+id is checked to settle once even after its dedupe key is gone.
+
+Usage: python tests/bench_settlement.py [settlements]
+"""
+import sys
+import time
+import uuid
+import asyncio
+import statistics
+from decimal import Decimal, ROUND_HALF_UP
+from urllib.parse import urlparse, parse_qs
+from postgrest_stand_in import start_stand_in
+
+LATENCY = 0.01  # Simulated PostgREST round trip (seconds)
+CONCURRENCY = 50
+
+TEACHER_ID = str(uuid.uuid4())
+sessions = {}
+balances = {}
+earnings = {"total": Decimal("0")}
+payments = []
+locks = {}
+ledger_settlements = {}  # (session_id, student) -> charge/refund totals already written
+settlement_keys = {}
+
+
+def cents(value) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def apply_payment(row):
+    """What the payments insert trigger does to wallet_balances (migrations/003)"""
+    payments.append(row)
+    amount = Decimal(str(row["amount"]))
+    if row["payment_type"] == "lock":  # A hold: recorded, balance untouched
+        key = (row["session_id"], row["from_user_id"])
+        locks[key] = locks.get(key, Decimal("0")) + amount
+    if row["payment_type"] in ("charge", "refund") and row.get("session_id"):
+        student = row.get("from_user_id") if row["payment_type"] == "charge" else row.get("to_user_id")
+        settled = ledger_settlements.setdefault((row["session_id"], student), {"charge": Decimal("0"), "refund": Decimal("0")})
+        settled[row["payment_type"]] += amount
+    if row["payment_type"] in ("deposit", "refund"):
+        balances[row["to_user_id"]] = balances.get(row["to_user_id"], Decimal("0")) + amount
+    elif row["payment_type"] == "charge":
+        balances[row["from_user_id"]] = balances.get(row["from_user_id"], Decimal("0")) - amount
+
+
+def settle_session(args):
+    """Python model of public.settle_session (migrations/009)"""
+    session = sessions.get(args["p_session_id"])
+    student = session["student_id"] if session else args["p_student_id"]
+    if session and session["status"] == "completed":
+        return {
+            "session_id": args["p_session_id"], "status": "completed", "already_settled": True,
+            "duration_seconds": session["duration_seconds"], "amount_charged": session["final_cost"],
+            "refund": session["amount_refunded"], "final_balance": balances.get(student)
+        }
+    if session:
+        price, locked = session["price_per_minute"], Decimal(str(session["locked_amount"]))
+    else:
+        # "vs_" id: charge/refund rows already on it = settled; otherwise the caller's lock is
+        # capped at the lock payment recorded for it
+        lock_paid = locks.get((args["p_session_id"], student), Decimal("0"))
+        settled = ledger_settlements.get((args["p_session_id"], student))
+        if settled:
+            return {
+                "session_id": args["p_session_id"], "status": "completed", "already_settled": True,
+                "duration_seconds": 0, "locked_amount": lock_paid, "amount_charged": settled["charge"],
+                "refund": settled["refund"], "final_balance": balances.get(student)
+            }
+        price = max(args["p_price_per_minute"], 0)
+        locked = min(Decimal(str(args.get("p_locked_amount") or lock_paid)), lock_paid)
+    duration = args["p_duration_seconds"]
+    charge = max(min(cents(Decimal(duration) / 60 * Decimal(str(price))), locked), Decimal("0"))
+    refund = max(cents(locked - charge), Decimal("0"))
+    if charge > 0:
+        apply_payment({"session_id": args["p_session_id"], "payment_type": "charge", "amount": charge, "from_user_id": student})
+    if refund > 0:
+        apply_payment({"session_id": args["p_session_id"], "payment_type": "refund", "amount": refund, "to_user_id": student})
+    if session:
+        session.update(status="completed", duration_seconds=duration, final_cost=charge, amount_refunded=refund)
+        earnings["total"] += charge
+    return {
+        "session_id": args["p_session_id"], "status": "completed", "already_settled": False,
+        "duration_seconds": duration, "price_per_minute": price, "locked_amount": locked,
+        "amount_charged": charge, "refund": refund, "final_balance": balances.get(student), "ended_at": "2026-10-17T10:00:00+00:00"
+    }
+
+
+def settle_session_once(args):
+    """Python model of public.settle_session_once (migrations/010)"""
+    key = args["p_idempotency_key"]
+    if key in settlement_keys:
+        return {**settlement_keys[key], "replayed": True}
+    settlement_keys[key] = settle_session(args)
+    return {**settlement_keys[key], "replayed": False}
+
+
+def responder(method, path, body):
+    url = urlparse(path)
+    query = parse_qs(url.query)
+    if url.path == "/rest/v1/rpc/settle_session":
+        return settle_session(body)
+    if url.path == "/rest/v1/rpc/settle_session_once":
+        return settle_session_once(body)
+    if url.path == "/rest/v1/payments" and method == "POST":
+        apply_payment(body)
+        return [body]
+    if url.path == "/rest/v1/sessions":
+        session = sessions.get(query.get("id", ["eq."])[0][3:])
+        if method == "PATCH" and session:
+            session.update(body)
+        return [session] if session else []
+    if url.path == "/rest/v1/courses":
+        return [{"price_per_minute": 2.5}]
+    if url.path == "/rest/v1/wallet_balances":
+        user = query["user_id"][0][3:]
+        return [{"balance": balances[user]}] if user in balances else []
+    return []
+
+
+async def legacy_end_session(supabase, user_id, session_id, duration_seconds, price_per_minute, locked_amount):
+    """Call chain VideoSessionService.end_session used before settle_session"""
+    charge = min(round(duration_seconds / 60 * price_per_minute, 2), locked_amount)
+    refund = round(locked_amount - charge, 2)
+    if charge > 0:
+        await supabase.table("payments").insert({
+            "session_id": session_id, "payment_type": "charge", "amount": charge, "from_user_id": user_id
+        }).execute()
+    if refund > 0:
+        await supabase.table("payments").insert({
+            "session_id": session_id, "payment_type": "refund", "amount": refund, "to_user_id": user_id
+        }).execute()
+    await supabase.table("sessions").update({
+        "status": "completed", "duration_seconds": duration_seconds,
+        "final_cost": charge, "amount_refunded": refund
+    }).eq("id", session_id).execute()
+    await supabase.rpc("record_session_activity", {"p_session_id": session_id}).execute()
+    balance = await supabase.table("wallet_balances").select("balance").eq("user_id", user_id).limit(1).execute()
+    return {"amount_charged": charge, "refund": refund, "final_balance": float(balance.data[0]["balance"])}
+
+
+async def legacy_complete_session(supabase, session_id, duration_seconds):
+    """Call chain SessionService.complete_session used before settle_session"""
+    session = (await supabase.table("sessions").select("*").eq("id", session_id).execute()).data[0]
+    course = await supabase.table("courses").select("price_per_minute").eq("id", session["course_id"]).execute()
+    charge = min(round(float(course.data[0]["price_per_minute"]) * duration_seconds / 60, 2), float(session["locked_amount"]))
+    refund = round(float(session["locked_amount"]) - charge, 2)
+    await supabase.table("sessions").update({"status": "completed", "final_cost": charge}).eq("id", session_id).execute()
+    if charge > 0:
+        await supabase.table("payments").insert({
+            "session_id": session_id, "payment_type": "charge", "amount": charge,
+            "from_user_id": session["student_id"], "to_user_id": session["teacher_id"]
+        }).execute()
+    if refund > 0:
+        await supabase.table("payments").insert({
+            "session_id": session_id, "payment_type": "refund", "amount": refund, "to_user_id": session["student_id"]
+        }).execute()
+    await supabase.rpc("record_session_activity", {"p_session_id": session_id}).execute()
+
+
+def lock_video_session(student_id: str, session_id: str, amount: float = 30.0) -> str:
+    """Lock row VideoSessionService.start_session writes for a "vs_" session"""
+    apply_payment({"session_id": session_id, "payment_type": "lock", "amount": amount, "from_user_id": student_id})
+    return session_id
+
+
+def new_session(student_id: str) -> str:
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = {
+        "id": session_id, "student_id": student_id, "teacher_id": TEACHER_ID, "course_id": "course-1",
+        "status": "active", "locked_amount": 30.0, "price_per_minute": 2.5
+    }
+    return session_id
+
+
+async def timed(stand_in, calls):
+    """(p50 ms, max ms sequentially, requests per settlement, settlements/s at CONCURRENCY)"""
+    latencies = []
+    stand_in.reset_count()
+    for call in calls[:len(calls) // 2]:
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    requests = stand_in.request_count / len(latencies)
+
+    rest = calls[len(calls) // 2:]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited(call):
+        async with semaphore:
+            await call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(call) for call in rest))
+    return statistics.median(latencies), max(latencies), requests, len(rest) / (time.perf_counter() - started)
+
+
+async def main(count: int):
+    stand_in = start_stand_in(LATENCY, responder)
+
+    from database import supabase, close_database
+    from wallet_service import VideoSessionService
+    from payment_service import SessionService
+
+    students = [str(uuid.uuid4()) for _ in range(count)]
+    for student in students:
+        balances[student] = Decimal("100.00")
+    durations = [(i * 37) % 900 for i in range(count)]
+
+    # Same settlements through both paths from identical starting balances
+    legacy_results = [
+        await legacy_end_session(supabase, student, f"vs_{i}", duration, 2.0, 30.0)
+        for i, (student, duration) in enumerate(zip(students[:20], durations))
+    ]
+    for student in students[:20]:
+        balances[student] = Decimal("100.00")
+    new_results = [
+        await VideoSessionService.end_session(student, lock_video_session(student, f"vs_new_{i}"), duration, 2.0, 30.0)
+        for i, (student, duration) in enumerate(zip(students[:20], durations))
+    ]
+    for old, new in zip(legacy_results, new_results):
+        assert abs(old["amount_charged"] - new["amount_charged"]) < 0.011
+        assert abs(old["refund"] - new["refund"]) < 0.011
+        assert abs(old["final_balance"] - new["final_balance"]) < 0.011
+
+    results = {
+        "end_session (chained)": await timed(stand_in, [
+            (lambda s=s, i=i, d=d: legacy_end_session(supabase, s, f"vs_old_{i}", d, 2.0, 30.0))
+            for i, (s, d) in enumerate(zip(students, durations))
+        ]),
+        "end_session (settle_session)": await timed(stand_in, [
+            (lambda s=s, v=lock_video_session(s, f"vs_rpc_{i}"), d=d: VideoSessionService.end_session(s, v, d, 2.0, 30.0))
+            for i, (s, d) in enumerate(zip(students, durations))
+        ]),
+        "complete_session (chained)": await timed(stand_in, [
+            (lambda s=new_session(s), d=d: legacy_complete_session(supabase, s, d))
+            for s, d in zip(students, durations)
+        ]),
+        "complete_session (settle_session)": await timed(stand_in, [
+            (lambda s=new_session(s), d=d: SessionService.complete_session(s, d))
+            for s, d in zip(students, durations)
+        ]),
+    }
+
+    # Settling twice (retry, beacon after /session/end) must not charge twice
+    session_id = new_session(students[0])
+    first = await SessionService.complete_session(session_id, 600)
+    charged = len(payments)
+    again = await SessionService.complete_session(session_id, 600)
+    assert again["already_settled"] and len(payments) == charged
+    assert again["final_cost"] == first["final_cost"]
+
+    # Client-supplied price/lock: ignored for a sessions row, capped at the recorded lock for "vs_"
+    forged = await VideoSessionService.end_session(students[1], new_session(students[1]), 60, 0.0, 1000.0)
+    assert forged["price_per_minute"] == 2.5 and forged["amount_locked"] == 30.0 and forged["refund"] == 27.5
+    forged = await VideoSessionService.end_session(students[2], lock_video_session(students[2], "vs_forged"), 60, 2.0, 1000.0)
+    assert forged["amount_locked"] == 30.0 and forged["refund"] == 28.0
+    unlocked = await VideoSessionService.end_session(students[3], "vs_never_locked", 60, 2.0, 1000.0)
+    assert unlocked["refund"] == 0
+
+    # Same "vs_" id settled again after its dedupe key is gone (expired/purged, other worker):
+    # the ledger rows already on it make it a no-op, not a second refund of the lock
+    from wallet_service import settled_sessions
+    session_id = lock_video_session(students[4], "vs_settle_twice")
+    first = await VideoSessionService.end_session(students[4], session_id, 120, 2.0, 30.0)
+    rows, balance = len(payments), balances[students[4]]
+    settlement_keys.clear()
+    settled_sessions.clear()
+    again = await VideoSessionService.end_session(students[4], session_id, 0, 2.0, 30.0)
+    assert len(payments) == rows and balances[students[4]] == balance
+    assert again["refund"] == first["refund"] == 26.0 and again["amount_charged"] == first["amount_charged"]
+    await close_database()
+
+    print(f"\n📊 {count:,} settlements per path, stand-in latency {LATENCY * 1000:.0f}ms")
+    print(f"   {'path':34} {'p50 ms':>7} {'max ms':>7} {'reqs':>5} {'settle/s @' + str(CONCURRENCY):>13}")
+    for name, (p50, worst, requests, throughput) in results.items():
+        print(f"   {name:34} {p50:7.1f} {worst:7.1f} {requests:5.1f} {throughput:13.0f}")
+    for path in ("end_session", "complete_session"):
+        old, new = results[f"{path} (chained)"], results[f"{path} (settle_session)"]
+        print(f"   {path}: {old[0] / new[0]:.1f}x lower latency, {new[3] / old[3]:.1f}x throughput")
+        assert new[2] == 1
+    print("✅ Single-RPC settlement matches the chained amounts and is idempotent")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 400))
@@ -0,0 +1,85 @@
+"""
+Benchmark: teacher dashboard analytics vs number of courses
+Compares the old N+1 pattern (courses query + one sessions query per course) with the
+grouped get_teacher_course_stats RPC, against a local PostgREST stand-in.
+
+Usage: python tests/bench_teacher_analytics.py
+"""
+import time
+import uuid
+import asyncio
+from postgrest_stand_in import start_stand_in
+
+LATENCY = 0.01  # Simulated PostgREST round trip (seconds)
+COURSE_COUNTS = [1, 10, 50, 200]
+
+num_courses = 1
+
+
+def responder(method, path, body):
+    """Courses/stats endpoints return num_courses rows, sessions return a few rows"""
+    if path.startswith("/rest/v1/rpc/get_teacher_course_stats") or path.startswith("/rest/v1/courses"):
+        return [{
+            "id": f"course-{i}",
+            "course_id": f"course-{i}",
+            "title": f"Course {i}",
+            "category": "DSA",
+            "price_per_minute": 2.0,
+            "content_structure": {"lectures": [{}, {}]},
+            "num_lectures": 2,
+            "total_sessions": 5,
+            "completed_sessions": 4,
+            "unique_students": 3,
+            "completed_students": 3,
+            "completed_revenue": 40.0
+        } for i in range(num_courses)]
+    return [{"student_id": str(uuid.uuid4()), "final_cost": 10, "status": "completed"} for _ in range(4)]
+
+
+async def legacy_n_plus_one(supabase, teacher_id: str):
+    """Query pattern used before the grouped RPC"""
+    courses = await supabase.table("courses").select("*").eq("teacher_id", teacher_id).execute()
+    for course in courses.data:
+        await supabase.table("sessions")\
+            .select("student_id, final_cost, status")\
+            .eq("course_id", course["id"])\
+            .execute()
+
+
+async def main():
+    global num_courses
+    stand_in = start_stand_in(LATENCY, responder)
+
+    from database import supabase, close_database
+    from teacher_analytics_service import TeacherAnalyticsService
+
+    teacher_id = str(uuid.uuid4())
+
+    print("=" * 72)
+    print(f"{'courses':>8} | {'N+1 ms':>8} {'reqs':>5} | {'grouped ms':>10} {'reqs':>5} | {'speedup':>7}")
+    print("-" * 72)
+
+    for count in COURSE_COUNTS:
+        num_courses = count
+
+        stand_in.reset_count()
+        started = time.perf_counter()
+        await legacy_n_plus_one(supabase, teacher_id)
+        legacy_ms = (time.perf_counter() - started) * 1000
+        legacy_reqs = stand_in.request_count
+
+        stand_in.reset_count()
+        started = time.perf_counter()
+        await TeacherAnalyticsService.get_lecture_wise_earnings(teacher_id)
+        await TeacherAnalyticsService.get_popular_lectures(teacher_id)
+        grouped_ms = (time.perf_counter() - started) * 1000 / 2
+        grouped_reqs = stand_in.request_count // 2
+
+        print(f"{count:>8} | {legacy_ms:>8.1f} {legacy_reqs:>5} | {grouped_ms:>10.1f} {grouped_reqs:>5} | {legacy_ms / grouped_ms:>6.1f}x")
+
+    print("=" * 72)
+    await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark: auth cost per protected request, remote get_user vs local JWT verification
+Signs ES256 tokens with a local key pair, serves the public key from a JWKS stand-in and
+compares AuthService.verify_token before (auth server round trip) and after (cached key
++ token LRU). Also checks expiry/audience rejection and key rotation fallback.
+
+Usage: python tests/bench_token_verification.py [iterations]
+"""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from postgrest_stand_in import start_stand_in
+
+LATENCY = 0.02  # Simulated auth server round trip (seconds)
+USER_ID = str(uuid.uuid4())
+
+signing_keys = {}  # kid -> private key (published ones are served as JWKS)
+jwks_fetches = 0
+remote_calls = 0
+
+
+def new_key(kid: str):
+    signing_keys[kid] = ec.generate_private_key(ec.SECP256R1())
+
+
+def make_token(kid: str, expires_in: int = 3600, audience: str = "authenticated") -> str:
+    now = int(time.time())
+    claims = {"sub": USER_ID, "aud": audience, "role": "authenticated", "iat": now, "exp": now + expires_in}
+    return jwt.encode(claims, signing_keys[kid], algorithm="ES256", headers={"kid": kid})
+
+
+def responder(method, path, body):
+    global jwks_fetches, remote_calls
+    if path.startswith("/auth/v1/.well-known/jwks.json"):
+        jwks_fetches += 1
+        keys = []
+        for kid, private_key in signing_keys.items():
+            jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+            keys.append({**jwk, "kid": kid, "alg": "ES256", "use": "sig"})
+        return {"keys": keys}
+    if path.startswith("/auth/v1/user"):
+        remote_calls += 1
+        return {
+            "id": USER_ID, "aud": "authenticated", "role": "authenticated",
+            "app_metadata": {}, "user_metadata": {}, "created_at": "2026-01-01T00:00:00Z"
+        }
+    return []
+
+
+async def timed(label: str, calls: int, fn) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    per_call = (time.perf_counter() - started) / calls
+    print(f"   {label:32s} {per_call * 1e6:10.1f}µs/request")
+    return per_call
+
+
+async def main(iterations: int):
+    start_stand_in(LATENCY, responder)
+
+    from auth_service import AuthService
+    from database import supabase, close_database
+    import token_verifier
+
+    new_key("key-1")
+    token = make_token("key-1")
+
+    # Correctness first
+    assert await AuthService.verify_token(token) == USER_ID
+    assert jwks_fetches == 1 and remote_calls == 0
+    assert await AuthService.verify_token(make_token("key-1", expires_in=-3600)) is None
+    assert await AuthService.verify_token(make_token("key-1", audience="anon-app")) is None
+    assert await AuthService.verify_token("not-a-jwt") is None
+    assert remote_calls == 0
+
+    async def remote():
+        response = await supabase.auth.get_user(token)
+        assert response.user.id == USER_ID
+
+    async def local_uncached():
+        token_verifier.verified_tokens.clear()
+        assert await AuthService.verify_token(token) == USER_ID
+
+    async def local_cached():
+        assert await AuthService.verify_token(token) == USER_ID
+
+    print(f"\n📊 Auth cost per protected request ({LATENCY * 1000:.0f}ms simulated auth round trip)")
+    remote_cost = await timed("Remote get_user (before)", max(iterations // 100, 20), remote)
+    await timed("Local verify, signature check", iterations, local_uncached)
+    cached_cost = await timed("Local verify, LRU hit", iterations, local_cached)
+    print(f"   Speedup (LRU hit vs remote): {remote_cost / cached_cost:,.0f}x")
+
+    # Key rotation: a new kid triggers one JWKS refresh, then stays local
+    token_verifier._jwks_fetched_at -= token_verifier.JWKS_MIN_REFRESH_SECONDS
+    fetches_before, remote_before = jwks_fetches, remote_calls
+    new_key("key-2")
+    rotated = make_token("key-2")
+    for _ in range(100):
+        assert await AuthService.verify_token(rotated) == USER_ID
+    print(f"   Key rotation: {jwks_fetches - fetches_before} JWKS fetch, {remote_calls - remote_before} remote verifications")
+    assert jwks_fetches - fetches_before == 1 and remote_calls == remote_before
+
+    # A kid the auth server doesn't publish falls back to remote verification
+    signing_keys["unpublished"] = ec.generate_private_key(ec.SECP256R1())
+    unpublished = make_token("unpublished")
+    del signing_keys["unpublished"]
+    assert await AuthService.verify_token(unpublished) == USER_ID
+    assert remote_calls == remote_before + 1
+
+    await close_database()
+    print("✅ Local verification checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
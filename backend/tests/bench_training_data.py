@@ -0,0 +1,119 @@
+"""
+Benchmark: chunked training-data loader vs full read_csv + pd.merge
+Writes synthetic video_interactions.csv / mcq_assessments.csv exports (ROWS video rows, about
+as many MCQ rows) to a temp dir, then loads them both ways in fresh processes and reports
+wall time, peak RSS and the size of the merged frame. A small sample is also checked for
+identical rows, row order and values.
+
+Usage: python tests/bench_training_data.py [rows]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from training_data import MERGE_KEYS, MERGE_SUFFIXES, load_training_data
+
+
+def write_exports(directory: str, rows: int, seed: int = 0):
+    """Video rows plus MCQ rows for a random ~85% of them (some duplicated, some NaN mcq_correct)"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01")
+    video = pd.DataFrame({
+        "user_id": rng.integers(1, max(rows // 20, 2), rows),
+        "course_id": np.char.add("C", rng.integers(1, 400, rows).astype(str)),
+        "video_id": np.char.add("V", rng.integers(1, 5000, rows).astype(str)),
+        "timestamp": (start + pd.to_timedelta(rng.integers(0, 180 * 86400, rows), unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "device": rng.choice(["desktop", "mobile", "tablet"], rows, p=[0.5, 0.4, 0.1]),
+    })
+    length = rng.integers(120, 3600, rows)
+    completion = rng.uniform(0, 100, rows).round(1)
+    video["completion_percentage"] = completion
+    video["watch_time_sec"] = (length * completion / 100 * rng.uniform(0.8, 1.3, rows)).round(1)
+    video["video_length_sec"] = length
+    video["playback_speed"] = rng.choice([0.75, 1.0, 1.25, 1.5, 2.0], rows)
+
+    picked = rng.choice(rows, int(rows * 0.9), replace=True)
+    picked = np.unique(picked[rng.random(len(picked)) < 0.95])
+    picked = np.concatenate([picked, rng.choice(picked, len(picked) // 50)])  # A few duplicate attempts
+    mcq = video.iloc[picked][MERGE_KEYS].reset_index(drop=True)
+    count = len(mcq)
+    mcq["completion_percentage"] = completion[picked]
+    mcq["mcq_attempted"] = rng.random(count) < 0.75
+    mcq["mcq_correct"] = np.where(rng.random(count) < 0.02, np.nan, (rng.random(count) < 0.6).astype(float))
+    mcq["mcq_solve_rate"] = rng.random(count).round(3)
+    mcq = mcq.sample(frac=1, random_state=seed)
+
+    video_csv = os.path.join(directory, "video_interactions.csv")
+    mcq_csv = os.path.join(directory, "mcq_assessments.csv")
+    video.to_csv(video_csv, index=False)
+    mcq.to_csv(mcq_csv, index=False)
+    return video_csv, mcq_csv
+
+
+def naive_load(video_csv: str, mcq_csv: str):
+    """What murph_ml_pipeline.py used to do"""
+    started = time.perf_counter()
+    df = pd.merge(pd.read_csv(video_csv), pd.read_csv(mcq_csv), on=MERGE_KEYS, how='inner', suffixes=MERGE_SUFFIXES)
+    return time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, \
+        df.memory_usage(deep=True).sum() / 1e6, len(df)
+
+
+def chunked_load(video_csv: str, mcq_csv: str):
+    started = time.perf_counter()
+    df, _ = load_training_data(video_csv, mcq_csv, cache_path="", chunk_rows=500_000)
+    return time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, \
+        df.memory_usage(deep=True).sum() / 1e6, len(df)
+
+
+def measure(function, *args):
+    """Run in a fresh process so peak RSS belongs to this loader alone"""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(function, *args).result()
+
+
+def check_identical(directory: str):
+    video_csv, mcq_csv = write_exports(directory, 30_000, seed=1)
+    expected = pd.merge(pd.read_csv(video_csv), pd.read_csv(mcq_csv), on=MERGE_KEYS, how='inner', suffixes=MERGE_SUFFIXES)
+    actual, _ = load_training_data(video_csv, mcq_csv, cache_path="", chunk_rows=4000, partitions=5)
+
+    assert list(actual.columns) == list(expected.columns) and len(actual) == len(expected)
+    for name in expected.columns:
+        if name == "timestamp":
+            assert (pd.to_datetime(expected[name]).to_numpy() == actual[name].to_numpy()).all()
+        elif actual[name].dtype.kind == "f":
+            assert np.allclose(expected[name].to_numpy(float), actual[name].to_numpy(float), rtol=1e-6, equal_nan=True), name
+        else:
+            assert (expected[name].astype(str).to_numpy() == actual[name].astype(str).to_numpy()).all(), name
+
+
+def main(rows: int):
+    directory = tempfile.mkdtemp()
+    check_identical(directory)
+
+    started = time.perf_counter()
+    video_csv, mcq_csv = write_exports(directory, rows)
+    csv_mb = (os.path.getsize(video_csv) + os.path.getsize(mcq_csv)) / 1e6
+    print(f"\n📊 {rows:,} video rows, {csv_mb:.0f}MB of CSV (generated in {time.perf_counter() - started:.0f}s)")
+
+    results = {
+        "read_csv + pd.merge": measure(naive_load, video_csv, mcq_csv),
+        "chunked hash join": measure(chunked_load, video_csv, mcq_csv),
+    }
+    for name, (seconds, peak_mb, frame_mb, merged) in results.items():
+        print(f"   {name:22} {seconds:6.1f}s   peak RSS {peak_mb:6.0f}MB   merged frame {frame_mb:6.0f}MB ({merged:,} rows)")
+
+    naive, chunked = results["read_csv + pd.merge"], results["chunked hash join"]
+    print(f"   Peak memory: {naive[1] / chunked[1]:.1f}x lower, merged frame {naive[2] / chunked[2]:.1f}x smaller")
+    assert naive[3] == chunked[3]
+    print("✅ Chunked loader matches pd.merge")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
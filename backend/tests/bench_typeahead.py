@@ -0,0 +1,100 @@
+"""
+Benchmark: local typeahead latency over a synthetic course catalog
+Indexes COURSES courses (default 2000, title + category + 6 lecture titles each) and replays keystroke
+prefixes of real titles, reporting p50/p99 suggest latency and incremental update cost.
+
+Usage: python tests/bench_typeahead.py [courses]
+"""
+import os
+import sys
+import time
+import random
+import uuid
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from typeahead import TypeaheadIndex
+
+TOPICS = ["Python", "Data Structures", "Machine Learning", "React", "SQL", "Linear Algebra",
+          "Organic Chemistry", "World History", "Watercolor", "C++", "Operating Systems", "Statistics"]
+LEVELS = ["Beginner", "Intermediate", "Advanced", "Complete", "Crash Course", "Masterclass"]
+LECTURES = ["Introduction", "Core Concepts", "Hands-on Examples", "Advanced Topics", "Project", "Summary",
+            "Arrays and Strings", "Recursion", "Dynamic Programming", "Graphs", "Indexes", "Joins"]
+CATEGORIES = ["Programming", "DSA", "Data Science", "Web Development", "Science", "History", "Art"]
+
+
+def make_course(rng: random.Random):
+    topic = rng.choice(TOPICS)
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"{rng.choice(LEVELS)} {topic} {rng.randint(1, 999)}",
+        "category": rng.choice(CATEGORIES),
+        "is_active": True,
+        "average_rating": round(rng.uniform(1, 5), 1),
+        "content_structure": {"lectures": [
+            {"id": i + 1, "title": f"{rng.choice(LECTURES)}: {topic}"} for i in range(6)
+        ]}
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main(course_count: int):
+    rng = random.Random(11)
+    courses = [make_course(rng) for _ in range(course_count)]
+
+    index = TypeaheadIndex()
+    started = time.perf_counter()
+    for course in courses:
+        index.upsert_course(course)
+    index.suggest("warm")  # Builds the sorted token list
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Keystroke prefixes of real titles: "r", "re", "rea", "reac", "react", "react 1", ...
+    queries = []
+    for course in rng.sample(courses, 200):
+        title = course["title"].lower()
+        queries += [title[:n] for n in range(1, min(len(title), 18) + 1)]
+
+    # Cold: first time each prefix is seen; replay: the keystroke stream with repeats memoized
+    cold, latencies = [], []
+    seen = set()
+    for query in queries:
+        started = time.perf_counter()
+        index.suggest(query, 8)
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        if query not in seen:
+            seen.add(query)
+            cold.append(elapsed)
+
+    # Incremental update: re-index one edited course
+    edited = dict(courses[0], title="Renamed Quantum Computing Course")
+    started = time.perf_counter()
+    index.upsert_course(edited)
+    top = index.suggest("quantum comp", 3)
+    update_us = (time.perf_counter() - started) * 1e6
+
+    print(f"\n📊 {course_count} courses, {index.stats()}")
+    print(f"   Build: {build_ms:.0f}ms")
+    print(f"   Cold prefixes ({len(cold)}): p50 {percentile(cold, 0.5) * 1e6:.0f}µs  "
+          f"p99 {percentile(cold, 0.99) * 1e6:.0f}µs")
+    print(f"   Replay of {len(queries)} keystrokes: p50 {percentile(latencies, 0.5) * 1e6:.0f}µs  "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.0f}µs  max {max(latencies) * 1e6:.0f}µs")
+    print(f"   Edit one course + re-query: {update_us:.0f}µs")
+
+    assert top and top[0]["text"] == "Renamed Quantum Computing Course"
+    assert not any(s["text"] == courses[0]["title"] for s in index.suggest(courses[0]["title"], 20))
+    assert index.suggest("dynamic prog", 1)[0]["kind"] == "lecture"
+    assert percentile(cold, 0.5) < 0.001, "median uncached suggest should stay under 1ms"
+    assert percentile(latencies, 0.99) < 0.001, "p99 suggest latency should stay under 1ms"
+    print("✅ Typeahead checks passed")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
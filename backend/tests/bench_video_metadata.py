@@ -0,0 +1,99 @@
+"""
+Benchmark: YouTube `videos` calls and enrich latency with the shared metadata store
+Replays SEARCHES searches whose 8 results are drawn from a skewed pool of popular videos
+(students repeat the same topics). Before: one `videos` call per search. After: only IDs
+missing from the store are fetched, batched in chunks of 50, and concurrent lookups for
+the same IDs share one fetch.
+
+Usage: python tests/bench_video_metadata.py [searches]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import httpx
+
+os.environ.setdefault("YOUTUBE_API_KEY", "bench-key")
+os.environ["SEARCH_CACHE_DB_PATH"] = ""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ai_search_service
+import video_metadata
+import youtube_api
+
+LATENCY = 0.15  # Simulated `videos` round trip (seconds)
+POOL_SIZE = 2000
+ids_per_call = []
+
+
+async def handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(LATENCY)
+    ids = request.url.params["id"].split(",")
+    ids_per_call.append(len(ids))
+    return httpx.Response(200, json={"items": [{
+        "id": vid,
+        "snippet": {"title": f"Video {vid}", "description": "0:00 Intro\n2:30 Arrays", "channelTitle": "Murph"},
+        "contentDetails": {"duration": "PT12M30S"},
+        "statistics": {"viewCount": "4200"}
+    } for vid in ids]})
+
+
+def result_page(rng: random.Random):
+    """8 video results, popular videos far more likely (Zipf-like)"""
+    ids = set()
+    while len(ids) < 8:
+        ids.add(f"vid{int(rng.paretovariate(1.2)) % POOL_SIZE:05d}")
+    return [{"video_id": vid, "title": vid} for vid in ids]
+
+
+async def main(searches: int):
+    video_metadata.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    rng = random.Random(3)
+    pages = [result_page(rng) for _ in range(searches)]
+
+    started = time.perf_counter()
+    for page in pages:
+        await ai_search_service.enrich_video_data(page, [v["video_id"] for v in page])
+    elapsed = time.perf_counter() - started
+
+    calls = len(ids_per_call)
+    print(f"\n📊 {searches} searches x 8 results")
+    print(f"   videos calls: before {searches}  after {calls}  ({searches / max(calls, 1):.1f}x fewer quota units)")
+    print(f"   avg enrich latency: {elapsed / searches * 1000:.1f}ms (uncached: {LATENCY * 1000:.0f}ms)")
+    assert all("duration" in v for page in pages for v in page)
+
+    # Large batch: 120 uncached IDs -> 3 chunks of <= 50, fetched concurrently
+    ids_per_call.clear()
+    batch = [f"batch{i}" for i in range(120)]
+    started = time.perf_counter()
+    found = await video_metadata.get_video_metadata(batch, "bench-key")
+    print(f"   120 uncached IDs: {len(ids_per_call)} calls {sorted(ids_per_call)} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    assert len(found) == 120 and sorted(ids_per_call) == [20, 50, 50]
+
+    # Concurrent lookups of the same IDs share one fetch
+    ids_per_call.clear()
+    shared = [f"shared{i}" for i in range(8)]
+    await asyncio.gather(*(video_metadata.get_video_metadata(shared, "bench-key") for _ in range(10)))
+    print(f"   10 concurrent lookups of the same 8 IDs: {len(ids_per_call)} call")
+    assert len(ids_per_call) == 1
+
+    # Course creation reads the same store (no extra call for a video already seen in search)
+    ids_per_call.clear()
+    course = await youtube_api.fetch_video_metadata("https://www.youtube.com/watch?v=shared0")
+    assert course["duration_minutes"] == 12 and len(course["chapters"]) == 2 and not ids_per_call
+
+    # View counts expire sooner than details
+    video_metadata.video_stats.clear()
+    await video_metadata.get_video_metadata(shared, "bench-key", with_stats=False)
+    assert not ids_per_call
+    await video_metadata.get_video_metadata(shared, "bench-key")
+    assert len(ids_per_call) == 1
+
+    print(f"   Store stats: {video_metadata.stats()}")
+    await video_metadata.close_video_metadata_client()
+    print("✅ Metadata store checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,92 @@
+"""
+Offline reference-label evaluation of the local video ranker
+Runs the hand-authored result sets in tests/fixtures/ranking_fixtures.json (videos and
+"reference_order" written and labeled by hand, not captured from live searches) through
+rank_videos_locally and scores the ordering against the labels (Kendall tau, top-1, NDCG@3).
+
+--llm also ranks every fixture with rank_videos_with_ai (needs GROQ_API_KEY and network)
+and scores the local ranker against it for that run only; nothing is written back, so the
+committed fixtures stay label-only.
+
+Usage: python tests/eval_ranker_reference.py [--llm] [fixtures.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_ranker import rank_videos_locally, ranking_agreement
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ranking_fixtures.json")
+
+
+def local_order(fixture):
+    """Original indices in local-ranker order, plus time taken"""
+    videos = [{**video, "index": i} for i, video in enumerate(fixture["videos"])]
+    started = time.perf_counter()
+    ranked = rank_videos_locally(videos, fixture["query"], fixture["search_type"], fixture.get("keywords"))
+    return [video["index"] for video in ranked], time.perf_counter() - started
+
+
+async def llm_orders(fixtures):
+    """LLM ordering and latency for every fixture, for this run only"""
+    import ai_search_service
+
+    orders = []
+    for fixture in fixtures:
+        videos = [{**video, "index": i} for i, video in enumerate(fixture["videos"])]
+        started = time.perf_counter()
+        ranked = await ai_search_service.rank_videos_with_ai(videos, fixture["query"], fixture["search_type"])
+        orders.append(([video["index"] for video in ranked], round((time.perf_counter() - started) * 1000)))
+    await ai_search_service.close_search_client()
+    return orders
+
+
+def average(rows, key):
+    return sum(row[key] for row in rows) / max(len(rows), 1)
+
+
+def main(path, with_llm=False):
+    with open(path) as f:
+        fixtures = json.load(f)
+
+    llm = asyncio.run(llm_orders(fixtures)) if with_llm else [(None, None)] * len(fixtures)
+
+    local_order(fixtures[0])  # Warm-up (first numpy calls)
+    vs_reference, vs_llm, llm_vs_reference, latencies = [], [], [], []
+    print(f"\n📊 {len(fixtures)} hand-labeled result sets")
+    for fixture, (llm_order, _) in zip(fixtures, llm):
+        order, elapsed = local_order(fixture)
+        latencies.append(elapsed)
+
+        scores = ranking_agreement(order, fixture["reference_order"])
+        vs_reference.append(scores)
+        line = f"   {fixture['query']!r:32} local {order}  tau vs reference {scores['kendall_tau']:+.2f}"
+
+        if llm_order:
+            vs_llm.append(ranking_agreement(order, llm_order))
+            llm_vs_reference.append(ranking_agreement(llm_order, fixture["reference_order"]))
+            line += f"  tau vs LLM {vs_llm[-1]['kendall_tau']:+.2f}"
+        print(line)
+
+    print(f"\n   Local vs reference: tau {average(vs_reference, 'kendall_tau'):.2f}  "
+          f"top-1 {average(vs_reference, 'top1'):.2f}  NDCG@3 {average(vs_reference, 'ndcg@3'):.2f}")
+    if vs_llm:
+        llm_ms = [ms for _, ms in llm]
+        print(f"   Local vs LLM:       tau {average(vs_llm, 'kendall_tau'):.2f}  "
+              f"top-1 {average(vs_llm, 'top1'):.2f}  NDCG@3 {average(vs_llm, 'ndcg@3'):.2f}")
+        print(f"   LLM vs reference:   tau {average(llm_vs_reference, 'kendall_tau'):.2f}  "
+              f"top-1 {average(llm_vs_reference, 'top1'):.2f}  NDCG@3 {average(llm_vs_reference, 'ndcg@3'):.2f}")
+        print(f"   LLM ranking latency: avg {sum(llm_ms) / len(llm_ms):.0f}ms")
+    print(f"   Local ranking latency: avg {sum(latencies) / len(latencies) * 1e6:.0f}µs  max {max(latencies) * 1e6:.0f}µs")
+
+    assert average(vs_reference, "ndcg@3") >= 0.8, "local ranker regressed on the labeled fixtures"
+    print("✅ Ranker evaluation passed")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    main(args[0] if args else DEFAULT_FIXTURES, "--llm" in sys.argv)
@@ -0,0 +1,77 @@
+"""
+Load test for the async Supabase data-access layer
+Spins up a local PostgREST stand-in (every request sleeps LATENCY seconds) and fires
+concurrent WalletService.get_balance calls. With the async client they overlap, so total
+time stays close to a single call instead of growing with the number of requests.
+
+Usage: python tests/load_test_async_db.py [concurrent_requests]
+"""
+import sys
+import time
+import uuid
+import asyncio
+from postgrest_stand_in import start_stand_in
+
+LATENCY = 0.1  # Simulated PostgREST round trip (seconds)
+
+
+def ledger_row(method, path, body):
+    """Every query returns one balance row"""
+    return [{"id": str(uuid.uuid4()), "amount": 100, "balance": 100}]
+
+
+async def main(concurrency: int):
+    # Point the data-access layer at the stand-in before it is imported
+    start_stand_in(LATENCY, ledger_row)
+
+    from wallet_service import WalletService
+    from database import close_database
+
+    user_ids = [str(uuid.uuid4()) for _ in range(concurrency)]
+
+    # Event-loop responsiveness probe: should tick every 10ms while queries are in flight
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - before - 0.01)
+
+    probe = asyncio.create_task(ticker())
+
+    latencies = []
+
+    async def one_call(user_id: str):
+        started = time.perf_counter()
+        await WalletService.get_balance(user_id)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call(uid) for uid in user_ids))
+    elapsed = time.perf_counter() - started
+
+    running = False
+    await probe
+    await close_database()
+
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    serial_estimate = concurrency * LATENCY  # get_balance = 1 query
+
+    print("=" * 60)
+    print(f"Concurrent get_balance calls: {concurrency}")
+    print(f"Stand-in latency per query:   {LATENCY * 1000:.0f} ms")
+    print(f"Serial (blocking) estimate:   {serial_estimate:.2f} s")
+    print(f"Measured wall time:           {elapsed:.2f} s")
+    print(f"p99 call latency:             {p99 * 1000:.0f} ms")
+    print(f"Max event-loop lag:           {max_lag * 1000:.1f} ms")
+    print(f"Speedup vs serial:            {serial_estimate / elapsed:.1f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    asyncio.run(main(n))
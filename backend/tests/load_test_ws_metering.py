@@ -0,0 +1,131 @@
+"""
+Load test: server CPU per viewer, HTTP polling vs WebSocket metering
+Runs the API under uvicorn in a subprocess and measures its CPU time (utime + stime from
+/proc, Linux only) while VIEWERS simulated players each send HEARTBEATS heartbeats:
+
+  HTTP:      per heartbeat PATCH /api/sessions/{id}/metrics + GET /api/wallet/balance,
+             then POST /session/end
+  WebSocket: one /ws/session/{id} connection, one message per heartbeat, then "end"
+
+Uses the development test token so no request leaves the process (in production every
+HTTP call would also pay an auth round trip, which the WebSocket pays once).
+
+Usage: python tests/load_test_ws_metering.py [viewers] [heartbeats]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import subprocess
+import httpx
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "test-token-admin"
+USER_ID = "test-admin-001"
+CONCURRENCY = 50
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_cpu_seconds(pid: int) -> float:
+    """utime + stime of the server process"""
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+async def wait_for_server(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"{base_url}/api/wallet/balance-public", params={"user_id": USER_ID})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def http_viewer(client: httpx.AsyncClient, limiter: asyncio.Semaphore, index: int, heartbeats: int):
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    session_id = f"vs_http_{index}"
+    for beat in range(1, heartbeats + 1):
+        async with limiter:
+            await client.patch(
+                f"/api/sessions/{session_id}/metrics",
+                json={"duration_seconds": beat * 5, "completion_pct": beat},
+                headers=headers
+            )
+            await client.get("/api/wallet/balance", headers=headers)
+    async with limiter:
+        await client.post(
+            "/session/end",
+            json={"user_id": USER_ID, "session_id": session_id, "duration_seconds": heartbeats * 5},
+            headers=headers
+        )
+
+
+async def ws_viewer(ws_url: str, limiter: asyncio.Semaphore, index: int, heartbeats: int):
+    async with limiter:
+        async with websockets.connect(f"{ws_url}/ws/session/vs_ws_{index}?token={TOKEN}") as ws:
+            for beat in range(1, heartbeats + 1):
+                await ws.send(json.dumps({"type": "heartbeat", "duration_seconds": beat * 5, "completion_pct": beat}))
+                await ws.recv()
+            await ws.send(json.dumps({"type": "end", "duration_seconds": heartbeats * 5}))
+            await ws.recv()
+
+
+async def measure(pid: int, run) -> tuple:
+    before_cpu = server_cpu_seconds(pid)
+    started = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.2)  # Let the server finish post-response work (settlement after "end")
+    return server_cpu_seconds(pid) - before_cpu, elapsed
+
+
+async def main(viewers: int, heartbeats: int):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, SUPABASE_URL="http://127.0.0.1:9", SUPABASE_SERVICE_ROLE_KEY="load-test-key")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        await wait_for_server(base_url)
+        limiter = asyncio.Semaphore(CONCURRENCY)
+
+        async def run_http():
+            limits = httpx.Limits(max_connections=CONCURRENCY)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+                await asyncio.gather(*(http_viewer(client, limiter, i, heartbeats) for i in range(viewers)))
+
+        async def run_ws():
+            ws_url = f"ws://127.0.0.1:{port}"
+            await asyncio.gather(*(ws_viewer(ws_url, limiter, i, heartbeats) for i in range(viewers)))
+
+        http_cpu, http_wall = await measure(server.pid, run_http)
+        ws_cpu, ws_wall = await measure(server.pid, run_ws)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\n📊 {viewers} viewers x {heartbeats} heartbeats (server CPU time)")
+    print(f"   HTTP polling: {http_cpu * 1000:8.1f}ms CPU  {http_cpu / viewers * 1000:6.2f}ms/viewer  wall {http_wall:.2f}s")
+    print(f"   WebSocket:    {ws_cpu * 1000:8.1f}ms CPU  {ws_cpu / viewers * 1000:6.2f}ms/viewer  wall {ws_wall:.2f}s")
+    print(f"   CPU per viewer reduced {http_cpu / max(ws_cpu, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    viewers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    heartbeats = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    asyncio.run(main(viewers, heartbeats))
@@ -0,0 +1,96 @@
+"""
+Local PostgREST stand-in for load tests and benchmarks
+Every request sleeps `latency` seconds (simulated network + query time) and is answered
+by a responder callback, so service code can run unmodified against it.
+
+Usage (before importing any backend module):
+    from postgrest_stand_in import start_stand_in
+    stand_in = start_stand_in(latency=0.05, responder=lambda method, path, body: [...])
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+Responder = Callable[[str, str, Any], Any]
+
+
+class StandInError(Exception):
+    """Raise from a responder to answer with a PostgREST error (e.g. a constraint violation)"""
+
+    def __init__(self, message: str, code: str = "23514", status: int = 400):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"code": code, "message": message, "details": None, "hint": None}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StandIn:
+    """Handle to a running stand-in server"""
+
+    def __init__(self, server: ThreadingHTTPServer):
+        self.server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+    def reset_count(self) -> None:
+        with self._lock:
+            self.request_count = 0
+
+
+def start_stand_in(latency: float = 0.05, responder: Optional[Responder] = None) -> StandIn:
+    """
+    Start the stand-in in a background thread and point the backend at it
+    Sets SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY and puts backend/ on sys.path
+    """
+    respond = responder or (lambda method, path, body: [])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive so the client pool is exercised
+        disable_nagle_algorithm = True  # Headers and body are separate writes
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            stand_in.count_request()
+            time.sleep(latency)
+
+            status = 200
+            try:
+                payload = respond(self.command, self.path, json.loads(raw) if raw else None)
+            except StandInError as e:
+                status, payload = e.status, e.payload
+            body = json.dumps(payload, default=str).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _respond
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    stand_in = StandIn(server)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["SUPABASE_URL"] = stand_in.url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "stand-in-key"
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    return stand_in
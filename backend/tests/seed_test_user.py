@@ -16,7 +16,7 @@ async def seed_test_user():
     
     try:
         # Check if user exists
-        existing = supabase.table("users").select("id").eq("id", user_id).execute()
+        existing = await supabase.table("users").select("id").eq("id", user_id).execute()
         
         if existing.data:
             print(f"✓ User {user_id} already exists")
@@ -30,7 +30,7 @@ async def seed_test_user():
                 "is_active": True
             }
             
-            supabase.table("users").insert(user_data).execute()
+            await supabase.table("users").insert(user_data).execute()
             print(f"✓ Created test user: {user_id}")
         
         # Check current balance
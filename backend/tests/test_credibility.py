@@ -0,0 +1,91 @@
+"""
+Equivalence check: vectorized baseline_credibility vs the row-wise rules
+Random engineered-feature frames (plus boundary and NaN rows) are scored both ways with
+df.apply(baseline_credibility_row, axis=1) as the reference; results must be bit-identical.
+Stored scores (model or baseline) must also stay inside reviews.credibility_score's 0-1 CHECK.
+
+Usage: python tests/test_credibility.py   (or: pytest tests/test_credibility.py)
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from credibility import baseline_credibility, baseline_credibility_row
+from rating_service import clip_credibility
+
+ROWS = 50_000
+
+
+def engineered_frame(rng: np.random.Generator, rows: int) -> pd.DataFrame:
+    """Feature columns built the way murph_ml_pipeline.py builds them"""
+    completion = rng.uniform(0, 100, rows).round(rng.integers(0, 3))
+    length = rng.integers(60, 3600, rows).astype(float)
+    watch = length * completion / 100 * rng.uniform(0.5, 1.6, rows)
+    df = pd.DataFrame({
+        "completion_percentage_video": completion,
+        "watch_time_sec": watch,
+        "video_length_sec": length,
+        "mcq_attempted": rng.random(rows) < 0.7,
+        "mcq_solve_rate": rng.random(rows),
+    })
+    df["engagement_depth_score"] = 0.6 * (completion / 100) + 0.4 * np.minimum(watch / length, 1)
+    df["early_exit_flag"] = (df["completion_percentage_video"] < 10).astype(int)
+    df["mcq_participation_flag"] = df["mcq_attempted"].astype(int)
+    df["consistent_learner_score"] = np.where(completion > 60, 1.0, completion / 60)
+    df["time_investment_score"] = np.minimum(watch / (length * 0.8), 1.0)
+    df["assessment_performance_weight"] = df["mcq_solve_rate"]
+    return df
+
+
+def edge_frame() -> pd.DataFrame:
+    """Boundaries (10% / 60% completion, cap at 1.0), non-binary flags and missing values"""
+    return pd.DataFrame({
+        "early_exit_flag": [1, 0, 0, 0, 0, 0, 0, 2, 0, np.nan],
+        "engagement_depth_score": [0.9, 1.0, 1.0, 0.1, np.nan, 0.5, 2.0, 0.5, 0.3, 0.5],
+        "mcq_participation_flag": [1, 1, 0, 1, 1, np.nan, 1, 1, 2, 0],
+        "assessment_performance_weight": [1.0, 1.0, 1.0, np.nan, 0.5, 0.5, 1.0, 0.2, 0.9, 0.4],
+        "time_investment_score": [1.0, 1.0, 1.0, 0.2, 0.7, 0.4, 1.0, 0.3, 0.6, 0.5],
+        "consistent_learner_score": [1.0, 1.0, 1.0, 10 / 60, 1.0, 0.5, 1.0, 0.5, 1.0, 0.5],
+    })
+
+
+def assert_identical(df: pd.DataFrame):
+    expected = df.apply(baseline_credibility_row, axis=1).to_numpy(dtype=np.float64)
+    actual = baseline_credibility(df)
+    assert actual.dtype == np.float64 and actual.shape == expected.shape
+    same = (actual == expected) | (np.isnan(actual) & np.isnan(expected))
+    assert same.all(), df[~same].assign(expected=expected[~same], actual=actual[~same])
+
+
+def test_matches_row_rules_on_random_rows():
+    assert_identical(engineered_frame(np.random.default_rng(7), ROWS))
+
+
+def test_matches_row_rules_on_edge_cases():
+    assert_identical(edge_frame())
+
+
+def test_accepts_plain_arrays():
+    df = engineered_frame(np.random.default_rng(11), 1000)
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    assert np.array_equal(baseline_credibility(columns), baseline_credibility(df))
+
+
+def test_stored_scores_stay_in_range():
+    raw = np.array([-0.2, 0.0, 0.4567, 1.0, 1.3, np.nan, np.inf, -np.inf])
+    assert clip_credibility(raw).tolist() == [0.0, 0.0, 0.457, 1.0, 1.0, 0.0, 1.0, 0.0]
+    scores = clip_credibility(baseline_credibility(edge_frame()))
+    assert ((scores >= 0) & (scores <= 1)).all()
+
+
+if __name__ == "__main__":
+    test_matches_row_rules_on_random_rows()
+    test_matches_row_rules_on_edge_cases()
+    test_accepts_plain_arrays()
+    test_stored_scores_stay_in_range()
+    print("✅ Vectorized credibility matches the row-wise rules")
@@ -0,0 +1,118 @@
+"""
+Check: live metering survives socket drops and settles exactly once
+Drives /ws/session/{id} through the app (test user, so nothing touches the database):
+a drop followed by a reconnect keeps billing on the same meter, only "end" or an expired
+grace period settles, and malformed frames (bad JSON or bad values) get an error instead of
+closing the socket and never reach the metrics buffer.
+
+Usage: python tests/test_live_meter.py   (or: pytest tests/test_live_meter.py)
+"""
+import os
+import sys
+import json
+import asyncio
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from starlette.testclient import TestClient
+from main import app
+from metering_service import live_meters, settle_abandoned
+from metrics_service import MetricsService, session_metrics
+from wallet_service import TEST_USER_BALANCES
+
+TOKEN = "test-token-admin"
+USER_ID = "test-admin-001"
+
+
+def heartbeat(ws, seconds: int) -> dict:
+    ws.send_json({"type": "heartbeat", "duration_seconds": seconds, "completion_pct": 10})
+    return ws.receive_json()
+
+
+def test_reconnect_keeps_billing():
+    client = TestClient(app)  # No lifespan: the settle loop is driven by hand below
+    session_id = "vs_meter_reconnect"
+    url = f"/ws/session/{session_id}?token={TOKEN}&price_per_minute=2&locked_amount=30"
+
+    with client.websocket_connect(url) as ws:
+        assert heartbeat(ws, 60)["current_cost"] == 2.0
+    # Dropped without "end": nothing settled yet, the meter waits for a reconnect
+    meter = live_meters[session_id]
+    assert meter.settlement is None and meter.detached_at is not None
+    assert asyncio.run(settle_abandoned()) == 0
+
+    with client.websocket_connect(url) as ws:
+        assert live_meters[session_id] is meter and meter.detached_at is None
+        update = heartbeat(ws, 300)
+        assert update["current_cost"] == 10.0
+        ws.send_json({"type": "end", "duration_seconds": 300})
+        settled = ws.receive_json()
+    assert settled["type"] == "settled" and settled["amount_charged"] == 10.0
+    assert session_id not in live_meters
+
+
+def test_abandoned_session_settles_after_grace():
+    client = TestClient(app)
+    session_id = "vs_meter_abandoned"
+    balance = TEST_USER_BALANCES.get(USER_ID)
+
+    with client.websocket_connect(f"/ws/session/{session_id}?token={TOKEN}") as ws:
+        heartbeat(ws, 120)
+    meter = live_meters[session_id]
+    assert asyncio.run(settle_abandoned(grace=0)) == 1
+    assert meter.settlement["amount_charged"] == 4.0 and session_id not in live_meters
+    if balance is not None:
+        assert TEST_USER_BALANCES[USER_ID] == round(balance - 4.0, 2)
+
+
+def test_malformed_frames_keep_the_socket():
+    client = TestClient(app)
+    session_id = "vs_meter_frames"
+
+    bad_values = [
+        {"type": "heartbeat", "duration_seconds": 40, "completion_pct": "abc"},
+        {"type": "heartbeat", "duration_seconds": 40, "completion_pct": float("nan")},
+        {"type": "heartbeat", "duration_seconds": 40, "completion_pct": 250},
+        {"type": "heartbeat", "duration_seconds": -5, "completion_pct": 10},
+        {"type": "heartbeat", "duration_seconds": 40, "completion_pct": 10, "current_lecture": 1.5},
+        {"type": "heartbeat", "duration_seconds": 40, "completion_pct": 10, "current_lecture": "intro"},
+        {"type": "end", "duration_seconds": "soon"},
+    ]
+
+    with client.websocket_connect(f"/ws/session/{session_id}?token={TOKEN}") as ws:
+        for frame in ("[1, 2]", "42", "not json", '"heartbeat"'):
+            ws.send_text(frame)
+            assert ws.receive_json()["type"] == "error"
+        assert heartbeat(ws, 30)["type"] == "meter"
+        buffered = dict(session_metrics[session_id])
+        for frame in bad_values:
+            ws.send_text(json.dumps(frame))  # json.dumps writes NaN as the bare token browsers can send
+            assert ws.receive_json()["type"] == "error"
+        # Rejected before the buffer is touched: nothing for the flush to choke on
+        assert session_metrics[session_id] == buffered
+        assert heartbeat(ws, 45)["duration_seconds"] == 45
+    assert live_meters[session_id].settlement is None
+    asyncio.run(settle_abandoned(grace=0))
+
+
+def test_record_heartbeat_validates_before_buffering():
+    MetricsService.record_heartbeat("vs_meter_direct", USER_ID, 10, 5.0)
+    before = dict(session_metrics["vs_meter_direct"])
+    for args in ((10, float("nan")), (10, "abc"), (10, 101), (-1, 5.0), (10.5, 5.0), (10, 5.0, "2")):
+        try:
+            MetricsService.record_heartbeat("vs_meter_direct", USER_ID, *args)
+            raise AssertionError(f"accepted {args}")
+        except ValueError:
+            pass
+    assert session_metrics["vs_meter_direct"] == before
+    MetricsService.discard("vs_meter_direct")
+
+
+if __name__ == "__main__":
+    test_reconnect_keeps_billing()
+    test_abandoned_session_settles_after_grace()
+    test_malformed_frames_keep_the_socket()
+    test_record_heartbeat_validates_before_buffering()
+    print("✅ Drops don't settle, reconnects resume billing, malformed frames are rejected")
@@ -0,0 +1,139 @@
+"""
+Property check: incremental StreakState vs full-history AnalyticsService.calculate_streak
+StreakState mirrors public.record_streak_activity (migrations/006) transition for transition,
+so checking it against the full recompute checks the deployed streak rules. Watch histories
+are generated by hypothesis and replayed session by session into StreakState.
+
+Usage: python tests/test_streak_tracker.py   (or: pytest tests/test_streak_tracker.py)
+Needs: hypothesis (dev dependency)
+"""
+import os
+import sys
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+from hypothesis import given, settings, strategies as st
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-key")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from analytics_service import AnalyticsService
+from streak_tracker import StreakState, local_date, valid_timezone
+
+TRIALS = 500
+TODAY = datetime.utcnow().date()
+ZONES = ["UTC", "Asia/Kolkata", "America/Los_Angeles", "Pacific/Kiritimati", "Australia/Lord_Howe"]
+
+# Completed sessions as (days before today, second of the UTC day) - dense runs, gaps, repeats
+sessions_strategy = st.lists(
+    st.tuples(st.integers(min_value=0, max_value=90), st.integers(min_value=0, max_value=86399)),
+    max_size=60
+)
+
+
+def end_times(sessions):
+    """Stored end_time values, in completion order"""
+    moments = [
+        datetime(TODAY.year, TODAY.month, TODAY.day, tzinfo=timezone.utc) - timedelta(days=days) + timedelta(seconds=second)
+        for days, second in sessions
+    ]
+    return sorted(moments)
+
+
+@settings(max_examples=TRIALS, deadline=None)
+@given(sessions_strategy)
+def test_incremental_matches_full_recompute(sessions):
+    moments = end_times(sessions)
+    state = StreakState()
+    for moment in moments:
+        state.record_activity(moment)
+
+    expected = asyncio.run(AnalyticsService.calculate_streak([{"end_time": m.isoformat()} for m in moments]))
+    assert state.to_dict(TODAY) == expected
+
+
+@settings(max_examples=TRIALS, deadline=None)
+@given(sessions_strategy, st.sampled_from(ZONES))
+def test_local_days_match_full_recompute(sessions, zone):
+    moments = end_times(sessions)
+    state = StreakState(timezone_name=zone)
+    for moment in moments:
+        state.record_activity(moment)
+
+    local_days = {local_date(moment, zone) for moment in moments}
+    longest = AnalyticsService.calculate_streak_from_dates(local_days)["longest_streak"] if local_days else 0
+    assert state.longest_streak == longest
+    assert state.last_active_date == (max(local_days) if local_days else None)
+
+
+@settings(max_examples=TRIALS, deadline=None)
+@given(st.lists(st.dates(min_value=date(2026, 1, 1), max_value=date(2026, 12, 31)), max_size=40))
+def test_replays_and_out_of_order_days_are_no_ops(days):
+    state = StreakState()
+    for day in sorted(days):
+        state.record_day(day)
+    recorded = (state.current_streak, state.longest_streak, state.last_active_date)
+    for day in days:
+        state.record_day(day)  # Every day is now <= last_active_date (same day or out of order)
+
+    assert (state.current_streak, state.longest_streak, state.last_active_date) == recorded
+    assert state.last_active_date == (max(days) if days else None)
+
+
+def test_same_day_is_counted_once():
+    state = StreakState()
+    day = datetime(2026, 1, 10, 8, tzinfo=timezone.utc)
+    for hours in range(5):
+        state.record_activity(day + timedelta(hours=hours))
+
+    assert state.to_dict(day.date()) == {"current_streak": 1, "longest_streak": 1}
+
+
+def test_streak_expires_after_missed_day():
+    state = StreakState()
+    start = datetime(2026, 1, 1).date()
+    for offset in range(4):
+        state.record_day(start + timedelta(days=offset))
+
+    assert state.current_streak_on(start + timedelta(days=4)) == 4   # yesterday still counts
+    assert state.current_streak_on(start + timedelta(days=5)) == 0
+    assert state.longest_streak == 4
+
+
+def test_timezone_day_boundary():
+    # 20:00 UTC Jan 1 and 02:00 UTC Jan 2 are two UTC days but one day in Asia/Kolkata (UTC+5:30)
+    first = datetime(2026, 1, 1, 20, 0, tzinfo=timezone.utc)
+    second = datetime(2026, 1, 2, 2, 0, tzinfo=timezone.utc)
+
+    assert local_date(first, "Asia/Kolkata") == local_date(second, "Asia/Kolkata")
+
+    utc_state = StreakState(timezone_name="UTC")
+    ist_state = StreakState(timezone_name="Asia/Kolkata")
+    for moment in (first, second):
+        utc_state.record_activity(moment)
+        ist_state.record_activity(moment)
+
+    assert utc_state.longest_streak == 2
+    assert ist_state.longest_streak == 1
+
+
+def test_unknown_timezone_falls_back_to_utc():
+    moment = datetime(2026, 1, 1, 23, 30, tzinfo=timezone.utc)
+    assert local_date(moment, "Not/AZone") == moment.date()
+
+
+def test_only_valid_timezones_are_stored():
+    assert valid_timezone("Asia/Kolkata") == "Asia/Kolkata"
+    assert valid_timezone("utc") == "UTC"
+    for name in (None, "", "Not/AZone", "../etc/passwd", "x" * 100):
+        assert valid_timezone(name) is None
+        assert asyncio.run(AnalyticsService.set_timezone("00000000-0000-0000-0000-000000000001", name)) is None
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"✅ All {len(tests)} streak checks passed ({TRIALS} generated histories per property)")
@@ -0,0 +1,137 @@
+"""
+Token Verifier - Local Supabase JWT verification
+Checks signature, expiry and audience in-process against a cached signing key
+(project JWT secret for HS256, or the auth server's JWKS for asymmetric keys),
+so protected requests no longer pay an auth server round trip each
+"""
+import os
+import time
+import json
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+import jwt
+from cache import TTLCache
+from database import SUPABASE_URL, SUPABASE_SERVICE_KEY, http_client
+
+
+# Verification configuration
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "authenticated")
+JWKS_CACHE_TTL_SECONDS = float(os.getenv("JWKS_CACHE_TTL_SECONDS", "600"))
+JWKS_MIN_REFRESH_SECONDS = 30.0  # Unknown kids can't force a JWKS fetch more often than this
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "4096"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+CLOCK_SKEW_SECONDS = 30
+
+JWKS_URL = f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+
+# sha256(token) -> user_id, kept no longer than the token's own expiry
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+# kid -> signing key, refreshed from the JWKS endpoint
+_signing_keys: Dict[str, Any] = {}
+_jwks_fetched_at = 0.0
+_jwks_lock = asyncio.Lock()
+
+
+class KeyUnavailable(Exception):
+    """No local key can check this token (unknown kid after refresh, or no secret configured)"""
+
+
+def token_key(access_token: str) -> str:
+    """Cache key that doesn't keep raw bearer tokens in memory"""
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+async def refresh_signing_keys() -> None:
+    """Fetch the JWKS and replace the cached signing keys"""
+    global _jwks_fetched_at
+
+    _jwks_fetched_at = time.monotonic()
+    response = await http_client.get(JWKS_URL, headers={"apikey": SUPABASE_SERVICE_KEY})
+    response.raise_for_status()
+
+    keys = {}
+    for jwk in response.json().get("keys", []):
+        if jwk.get("kid"):
+            keys[jwk["kid"]] = jwt.PyJWK.from_json(json.dumps(jwk)).key
+    _signing_keys.clear()
+    _signing_keys.update(keys)
+
+
+async def get_signing_key(kid: Optional[str]) -> Any:
+    """
+    Cached key for `kid`; an unknown kid (key rotation) triggers one JWKS refresh
+    Raises KeyUnavailable if the key still can't be found
+    """
+    age = time.monotonic() - _jwks_fetched_at
+    if kid in _signing_keys and age < JWKS_CACHE_TTL_SECONDS:
+        return _signing_keys[kid]
+
+    async with _jwks_lock:
+        # Another request may have refreshed while we waited
+        if time.monotonic() - _jwks_fetched_at >= JWKS_MIN_REFRESH_SECONDS or not _jwks_fetched_at:
+            try:
+                await refresh_signing_keys()
+            except Exception as e:
+                print(f"⚠️ JWKS refresh failed: {str(e)}")
+
+    if kid not in _signing_keys:
+        raise KeyUnavailable(f"Signing key {kid} not found")
+    return _signing_keys[kid]
+
+
+def remember(access_token: str, user_id: str, expires_at: Optional[float]) -> None:
+    """Cache a verified token until it expires (or TOKEN_CACHE_TTL_SECONDS, whichever is sooner)"""
+    ttl = TOKEN_CACHE_TTL_SECONDS
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    if ttl > 0:
+        verified_tokens.set(token_key(access_token), user_id, ttl=ttl)
+
+
+async def verify_locally(access_token: str) -> Optional[str]:
+    """
+    Verify a Supabase access token in-process and return its user_id
+    Returns None for invalid/expired tokens; raises KeyUnavailable when only the
+    auth server can decide (caller falls back to remote verification)
+    """
+    cached = verified_tokens.get(token_key(access_token))
+    if cached is not None:
+        return cached
+
+    try:
+        header = jwt.get_unverified_header(access_token)
+    except jwt.InvalidTokenError:
+        return None
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise KeyUnavailable("SUPABASE_JWT_SECRET not configured")
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        key = await get_signing_key(header.get("kid"))
+    else:
+        return None
+
+    try:
+        claims = jwt.decode(
+            access_token,
+            key,
+            algorithms=[algorithm],
+            audience=JWT_AUDIENCE,
+            leeway=CLOCK_SKEW_SECONDS,
+            options={"require": ["exp", "sub"]}
+        )
+    except jwt.InvalidSignatureError:
+        # Rotated secret/key or forged token - only the auth server can tell
+        raise KeyUnavailable("Signature does not match the cached key")
+    except jwt.InvalidTokenError:
+        return None
+
+    user_id = claims["sub"]
+    remember(access_token, user_id, claims.get("exp"))
+    return user_id
@@ -0,0 +1,242 @@
+"""
+Training Data - Chunked, low-memory loader for the ML pipeline's CSV exports
+video_interactions.csv and mcq_assessments.csv are read ML_CHUNK_ROWS rows at a time and
+compacted on the way in: strings become categories (one shared dictionary per column across
+both files), integers int32, floats float32, timestamps datetime64. The inner join on
+MERGE_KEYS is a partitioned hash join: both sides are hash-partitioned on user_id into spill
+files, then joined one partition at a time, so peak memory is one partition plus the output.
+Row order matches pd.merge(how="inner"). The merged frame can be cached as Parquet or Feather
+(ML_MERGED_CACHE, needs pyarrow) and is reused while both CSVs are unchanged.
+"""
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype, is_numeric_dtype
+
+
+ML_DATA_DIR = os.getenv("ML_DATA_DIR") or r"C:\Users\walecha\Downloads"
+ML_VIDEO_CSV = os.getenv("ML_VIDEO_CSV") or os.path.join(ML_DATA_DIR, "video_interactions.csv")
+ML_MCQ_CSV = os.getenv("ML_MCQ_CSV") or os.path.join(ML_DATA_DIR, "mcq_assessments.csv")
+ML_CHUNK_ROWS = int(os.getenv("ML_CHUNK_ROWS", "1000000"))
+ML_JOIN_PARTITIONS = int(os.getenv("ML_JOIN_PARTITIONS", "16"))
+ML_MERGED_CACHE = os.getenv("ML_MERGED_CACHE", "")  # e.g. merged.parquet / merged.feather; empty = no cache
+ML_SPILL_DIR = os.getenv("ML_SPILL_DIR") or None  # Partition spill files (default: system temp dir)
+
+MERGE_KEYS = ['user_id', 'course_id', 'video_id', 'timestamp', 'device']
+MERGE_SUFFIXES = ('_video', '_mcq')
+PARTITION_KEY = 'user_id'  # Rows that join share every key, so one key is enough to partition on
+TIMESTAMP_COLUMNS = {'timestamp'}
+LEFT_ROW, RIGHT_ROW = "__left_row", "__right_row"
+
+INT32 = np.iinfo(np.int32)
+
+
+class Dictionary:
+    """Append-only value -> code mapping for one string column, shared by every chunk"""
+
+    def __init__(self):
+        self.categories = pd.Index([], dtype=object)
+
+    def encode(self, values: pd.Series) -> pd.Categorical:
+        codes = self.categories.get_indexer(values)
+        unseen = values[(codes == -1) & values.notna()]
+        if len(unseen):
+            self.categories = self.categories.append(pd.Index(unseen.unique(), dtype=object))
+            codes = self.categories.get_indexer(values)
+        return pd.Categorical.from_codes(codes, categories=self.categories)
+
+
+def compact(chunk: pd.DataFrame, dictionaries: Dict[str, Dictionary]) -> pd.DataFrame:
+    """Smallest faithful dtype for every column of one CSV chunk"""
+    for name in chunk.columns:
+        column = chunk[name]
+        if name in TIMESTAMP_COLUMNS:
+            chunk[name] = pd.to_datetime(column).dt.as_unit("ns")
+        elif is_bool_dtype(column):
+            continue
+        elif is_integer_dtype(column):
+            if len(column) and column.min() >= INT32.min and column.max() <= INT32.max:
+                chunk[name] = column.astype(np.int32)
+        elif is_float_dtype(column):
+            chunk[name] = column.astype(np.float32)
+        else:
+            chunk[name] = dictionaries.setdefault(name, Dictionary()).encode(column)
+    return chunk
+
+
+def dictionary_for(name: str, dictionaries: Dict[str, Dictionary]) -> Dictionary:
+    """Dictionary of a column, also under its merge-suffixed name"""
+    if name not in dictionaries:
+        for suffix in MERGE_SUFFIXES:
+            if name.endswith(suffix) and name[:-len(suffix)] in dictionaries:
+                return dictionaries[name[:-len(suffix)]]
+    return dictionaries[name]
+
+
+def concat_compact(frames: List[pd.DataFrame], dictionaries: Dict[str, Dictionary]) -> pd.DataFrame:
+    """
+    Concatenate chunk-level frames without the usual upcasts
+    Categories are widened to the final dictionaries (codes stay valid, the lists only grow);
+    a column that is int in some chunks and float (NaN) in others ends up float64, so large
+    integer ids stay exact
+    """
+    for name in frames[0].columns:
+        dtypes = {frame[name].dtype for frame in frames}
+        if isinstance(frames[0][name].dtype, pd.CategoricalDtype):
+            dictionary = dictionary_for(name, dictionaries)
+            for frame in frames:
+                frame[name] = frame[name].cat.set_categories(dictionary.categories)
+        elif len(dtypes) > 1 and all(is_numeric_dtype(d) and not is_bool_dtype(d) for d in dtypes):
+            target = np.float64 if any(d.kind == "f" for d in dtypes) else np.int64
+            for frame in frames:
+                frame[name] = frame[name].astype(target)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def partition_ids(chunk: pd.DataFrame, partitions: int) -> np.ndarray:
+    key = chunk[PARTITION_KEY]
+    if is_integer_dtype(key):
+        key = key.astype(np.int64)
+    return (pd.util.hash_pandas_object(key, index=False).to_numpy() % partitions).astype(np.int32)
+
+
+def spill_csv(
+    path: str,
+    side: str,
+    row_column: str,
+    spill_dir: str,
+    dictionaries: Dict[str, Dictionary],
+    chunk_rows: int,
+    partitions: int
+) -> Tuple[List[List[str]], int, List[str]]:
+    """Stream one CSV into per-partition spill files; returns (files per partition, rows, columns)"""
+    files: List[List[str]] = [[] for _ in range(partitions)]
+    rows = 0
+    columns: List[str] = []
+    for number, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+        columns = list(chunk.columns)
+        chunk = compact(chunk, dictionaries)
+        chunk[row_column] = np.arange(rows, rows + len(chunk), dtype=np.int64)
+        rows += len(chunk)
+
+        ids = partition_ids(chunk, partitions)
+        for partition in np.unique(ids):
+            part_path = os.path.join(spill_dir, f"{side}-{partition}-{number}.pkl")
+            chunk[ids == partition].to_pickle(part_path)
+            files[partition].append(part_path)
+    return files, rows, columns
+
+
+def read_partition(paths: List[str], dictionaries: Dict[str, Dictionary]) -> Optional[pd.DataFrame]:
+    if not paths:
+        return None
+    return concat_compact([pd.read_pickle(path) for path in paths], dictionaries)
+
+
+def source_fingerprint(video_csv: str, mcq_csv: str) -> Dict[str, Any]:
+    def describe(path: str) -> List[Any]:
+        info = os.stat(path)
+        return [os.path.abspath(path), info.st_size, info.st_mtime_ns]
+    return {"video": describe(video_csv), "mcq": describe(mcq_csv), "merge_keys": MERGE_KEYS}
+
+
+def read_cache(cache_path: str, fingerprint: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    try:
+        with open(cache_path + ".json") as f:
+            if json.load(f) != fingerprint:
+                return None
+        if cache_path.endswith(".feather"):
+            return pd.read_feather(cache_path)
+        return pd.read_parquet(cache_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Ignoring merged-data cache {cache_path}: {str(e)}")
+        return None
+
+
+def write_cache(df: pd.DataFrame, cache_path: str, fingerprint: Dict[str, Any]) -> None:
+    try:
+        if cache_path.endswith(".feather"):
+            df.to_feather(cache_path)
+        else:
+            df.to_parquet(cache_path, index=False)
+        with open(cache_path + ".json", "w") as f:
+            json.dump(fingerprint, f)
+    except Exception as e:
+        print(f"⚠️ Could not cache merged data to {cache_path} (Parquet/Feather need pyarrow): {str(e)}")
+
+
+def load_training_data(
+    video_csv: Optional[str] = None,
+    mcq_csv: Optional[str] = None,
+    cache_path: Optional[str] = None,
+    chunk_rows: Optional[int] = None,
+    partitions: Optional[int] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Inner join of the video and MCQ exports on MERGE_KEYS, with compact dtypes
+    Same rows, row order and columns as pd.merge(video_df, mcq_df, on=MERGE_KEYS, how='inner',
+    suffixes=MERGE_SUFFIXES) on the full CSVs. Returns (merged frame, load report)
+    """
+    video_csv = video_csv or ML_VIDEO_CSV
+    mcq_csv = mcq_csv or ML_MCQ_CSV
+    cache_path = ML_MERGED_CACHE if cache_path is None else cache_path
+    chunk_rows = chunk_rows or ML_CHUNK_ROWS
+    partitions = max(1, partitions or ML_JOIN_PARTITIONS)
+    started = time.perf_counter()
+
+    fingerprint = source_fingerprint(video_csv, mcq_csv)
+    if cache_path:
+        cached = read_cache(cache_path, fingerprint)
+        if cached is not None:
+            return cached, {
+                "from_cache": True, "merged_rows": len(cached),
+                "seconds": round(time.perf_counter() - started, 2)
+            }
+
+    dictionaries: Dict[str, Dictionary] = {}
+    spill_dir = tempfile.mkdtemp(prefix="murph-join-", dir=ML_SPILL_DIR)
+    try:
+        video_files, video_rows, video_columns = spill_csv(
+            video_csv, "video", LEFT_ROW, spill_dir, dictionaries, chunk_rows, partitions
+        )
+        mcq_files, mcq_rows, mcq_columns = spill_csv(
+            mcq_csv, "mcq", RIGHT_ROW, spill_dir, dictionaries, chunk_rows, partitions
+        )
+
+        joined = []
+        for partition in range(partitions):
+            left = read_partition(video_files[partition], dictionaries)
+            right = read_partition(mcq_files[partition], dictionaries)
+            if left is None or right is None:
+                continue
+            joined.append(pd.merge(left, right, on=MERGE_KEYS, how='inner', suffixes=MERGE_SUFFIXES))
+            del left, right
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    if joined:
+        df = concat_compact(joined, dictionaries)
+        del joined
+        df = df.sort_values([LEFT_ROW, RIGHT_ROW], kind="stable", ignore_index=True)
+        df = df.drop(columns=[LEFT_ROW, RIGHT_ROW])
+    else:
+        df = pd.DataFrame(columns=MERGE_KEYS)
+
+    if cache_path:
+        write_cache(df, cache_path, fingerprint)
+
+    return df, {
+        "from_cache": False,
+        "video_rows": video_rows, "video_columns": video_columns,
+        "mcq_rows": mcq_rows, "mcq_columns": mcq_columns,
+        "merged_rows": len(df), "partitions": partitions,
+        "memory_mb": round(float(df.memory_usage(deep=True).sum()) / 1e6, 1),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
@@ -0,0 +1,262 @@
+"""
+Typeahead - Local prefix index over the course catalog
+Indexes course titles, categories and lecture titles (content_structure.lectures).
+Every query word is matched as a prefix through a sorted token list (bisect), so
+suggestions come back in microseconds without a YouTube round trip per keystroke.
+Built at startup, then refreshed incrementally from courses.updated_at.
+"""
+import os
+import re
+import time
+import heapq
+import asyncio
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set
+from database import supabase
+
+
+TYPEAHEAD_REFRESH_SECONDS = float(os.getenv("TYPEAHEAD_REFRESH_SECONDS", "60"))
+TYPEAHEAD_PAGE_SIZE = 1000  # PostgREST caps a response at max-rows (1000 by default)
+
+# Base score per suggestion kind (a course title beats a lecture title beats a category)
+KIND_WEIGHTS = {"course": 3.0, "lecture": 2.0, "category": 1.5}
+
+# Memoized suggestion lists (short prefixes like "p", "py" repeat across every user)
+TYPEAHEAD_RESULT_CACHE_SIZE = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (keeps + and # for C++ / C#)"""
+    return re.findall(r"[\w+#]+", text.lower())
+
+
+class TypeaheadIndex:
+    """
+    Token -> entry postings plus a sorted token list for prefix lookups
+    Entries are (text, kind, course_id, extra); courses can be replaced or removed one at a time
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.sorted_tokens: List[str] = []
+        self.course_entries: Dict[str, List[int]] = {}
+        self.category_courses: Dict[str, Set[str]] = {}
+        self.results: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._next_id = 0
+        self._tokens_dirty = False
+
+    def _add_entry(self, text: str, kind: str, course_id: Optional[str], extra: Dict[str, Any]) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        self.results.clear()
+
+        normalized = " ".join(tokenize(text))
+        self.entries[entry_id] = {
+            "text": text,
+            "normalized": normalized,
+            "kind": kind,
+            "course_id": course_id,
+            # Query-independent part of the score, computed once
+            "base_score": KIND_WEIGHTS[kind] + extra.get("popularity", 0.0) - len(normalized) / 1000,
+            **extra
+        }
+        for token in set(tokenize(text)):
+            if token not in self.postings:
+                self.postings[token] = set()
+                self._tokens_dirty = True
+            self.postings[token].add(entry_id)
+        return entry_id
+
+    def _remove_entry(self, entry_id: int) -> None:
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self.results.clear()
+        for token in set(entry["normalized"].split()):
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.postings[token]
+                    self._tokens_dirty = True
+
+    def remove_course(self, course_id: str) -> None:
+        """Drop a course's title/lecture entries and its category reference"""
+        for entry_id in self.course_entries.pop(course_id, []):
+            self._remove_entry(entry_id)
+
+        for category, course_ids in list(self.category_courses.items()):
+            course_ids.discard(course_id)
+            if not course_ids:
+                del self.category_courses[category]
+                for entry_id in [i for i, e in self.entries.items() if e["kind"] == "category" and e["text"] == category]:
+                    self._remove_entry(entry_id)
+
+    def upsert_course(self, course: Dict[str, Any]) -> None:
+        """(Re)index one courses row; inactive courses are removed"""
+        course_id = course["id"]
+        self.remove_course(course_id)
+        if not course.get("is_active", True):
+            return
+
+        popularity = float(course.get("average_rating") or 0) / 5
+        ids = [self._add_entry(course["title"], "course", course_id, {"popularity": popularity})]
+
+        lectures = (course.get("content_structure") or {}).get("lectures") or []
+        for lecture in lectures:
+            title = (lecture or {}).get("title")
+            if title:
+                ids.append(self._add_entry(title, "lecture", course_id, {
+                    "popularity": popularity,
+                    "course_title": course["title"],
+                    "lecture_id": lecture.get("id")
+                }))
+        self.course_entries[course_id] = ids
+
+        category = course.get("category")
+        if category:
+            if category not in self.category_courses:
+                self.category_courses[category] = set()
+                self._add_entry(category, "category", None, {"popularity": 0.0})
+            self.category_courses[category].add(course_id)
+
+    def _prefix_matches(self, prefix: str) -> Set[int]:
+        """Union of postings for every indexed token starting with prefix"""
+        if self._tokens_dirty:
+            self.sorted_tokens = sorted(self.postings)
+            self._tokens_dirty = False
+
+        matches: Set[int] = set()
+        position = bisect_left(self.sorted_tokens, prefix)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+            matches |= self.postings[self.sorted_tokens[position]]
+            position += 1
+        return matches
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        Ranked suggestions where every query word prefixes some word of the entry
+        Score = kind weight + phrase-prefix bonus + rating, shorter texts win ties
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        key = (tuple(words), limit)
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached
+
+        # Most selective word first keeps the intersection small
+        candidate_sets = sorted((self._prefix_matches(word) for word in words), key=len)
+        candidates = candidate_sets[0].intersection(*candidate_sets[1:]) if candidate_sets[0] else set()
+
+        phrase = " ".join(words)
+
+        entries = self.entries
+
+        def score(entry_id: int) -> float:
+            entry = entries[entry_id]
+            if entry["normalized"].startswith(phrase):
+                return entry["base_score"] + 2.0
+            return entry["base_score"]
+
+        best = heapq.nlargest(limit, candidates, key=score)
+        suggestions = []
+        for entry_id in best:
+            entry = self.entries[entry_id]
+            suggestion = {"text": entry["text"], "kind": entry["kind"], "course_id": entry["course_id"]}
+            if entry["kind"] == "lecture":
+                suggestion["course_title"] = entry["course_title"]
+                suggestion["lecture_id"] = entry["lecture_id"]
+            suggestions.append(suggestion)
+
+        if len(self.results) >= TYPEAHEAD_RESULT_CACHE_SIZE:
+            self.results.clear()
+        self.results[key] = suggestions
+        return suggestions
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "courses": len(self.course_entries),
+            "entries": len(self.entries),
+            "tokens": len(self.postings),
+            "cached_queries": len(self.results)
+        }
+
+
+course_typeahead = TypeaheadIndex()
+_last_updated_at: Optional[str] = None
+_last_course_id: Optional[str] = None  # Tie-breaker for rows sharing _last_updated_at
+_pending_refreshes: Set[asyncio.Task] = set()
+
+COURSE_INDEX_COLUMNS = "id, title, category, content_structure, is_active, average_rating, updated_at"
+
+
+async def refresh_course_index(course_id: Optional[str] = None, page_size: int = TYPEAHEAD_PAGE_SIZE) -> int:
+    """
+    Pull changed courses into the index
+    No course_id: every course updated since the last refresh (full load the first time),
+    keyset-paged on (updated_at, id) so the cursor only moves past rows actually received
+    Returns number of courses (re)indexed
+    """
+    global _last_updated_at, _last_course_id
+
+    if course_id:
+        result = await supabase.table("courses")\
+            .select(COURSE_INDEX_COLUMNS)\
+            .eq("id", course_id)\
+            .execute()
+        if result.data:
+            course_typeahead.upsert_course(result.data[0])
+        else:
+            course_typeahead.remove_course(course_id)
+        return len(result.data or [])
+
+    count = 0
+    while True:
+        query = supabase.table("courses").select(COURSE_INDEX_COLUMNS)
+        if _last_updated_at:
+            query = query.or_(
+                f'updated_at.gt."{_last_updated_at}",'
+                f'and(updated_at.eq."{_last_updated_at}",id.gt."{_last_course_id or ""}")'
+            )
+        result = await query\
+            .order("updated_at")\
+            .order("id")\
+            .limit(page_size)\
+            .execute()
+        rows = result.data or []
+
+        for row in rows:
+            course_typeahead.upsert_course(row)
+            if row.get("updated_at"):
+                _last_updated_at, _last_course_id = row["updated_at"], row["id"]
+        count += len(rows)
+
+        if len(rows) < page_size or not rows[-1].get("updated_at"):
+            return count  # Short page: caught up (rows without updated_at sort last and can't be paged past)
+
+
+async def run_refresh_loop(interval: float = TYPEAHEAD_REFRESH_SECONDS) -> None:
+    """Background task: initial build, then incremental refreshes"""
+    while True:
+        try:
+            started = time.perf_counter()
+            count = await refresh_course_index()
+            if count:
+                print(f"🔤 Typeahead indexed {count} course(s) in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"⚠️ Typeahead refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def schedule_course_refresh(course_id: str) -> None:
+    """Re-index one course soon (called from the course invalidation hook)"""
+    try:
+        task = asyncio.get_running_loop().create_task(refresh_course_index(course_id))
+    except RuntimeError:
+        return  # No event loop (scripts); the periodic refresh picks it up
+    _pending_refreshes.add(task)
+    task.add_done_callback(_pending_refreshes.discard)
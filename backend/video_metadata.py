@@ -0,0 +1,150 @@
+"""
+Video Metadata Store - Shared per-video YouTube metadata cache
+Keyed by video ID with separate TTLs: titles/durations rarely change, view counts do.
+Only cache misses reach the YouTube `videos` endpoint, batched in chunks of 50 IDs
+(1 quota unit per chunk). Used by ai_search_service and youtube_api.
+"""
+import os
+import asyncio
+import httpx
+from typing import Any, Dict, Iterable, List, Optional
+from cache import TTLCache
+
+
+YOUTUBE_VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+YOUTUBE_MAX_IDS_PER_CALL = 50
+
+VIDEO_DETAILS_TTL_SECONDS = float(os.getenv("VIDEO_DETAILS_TTL_SECONDS", "604800"))  # 7 days
+VIDEO_STATS_TTL_SECONDS = float(os.getenv("VIDEO_STATS_TTL_SECONDS", "21600"))  # 6 hours
+VIDEO_CACHE_MAX_ENTRIES = int(os.getenv("VIDEO_CACHE_MAX_ENTRIES", "20000"))
+
+# video_id -> {title, description, channel, published_at, duration_iso}
+video_details = TTLCache(maxsize=VIDEO_CACHE_MAX_ENTRIES, ttl=VIDEO_DETAILS_TTL_SECONDS)
+# video_id -> {views}
+video_stats = TTLCache(maxsize=VIDEO_CACHE_MAX_ENTRIES, ttl=VIDEO_STATS_TTL_SECONDS)
+
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(5.0, connect=2.0),
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=10)
+)
+
+# IDs currently being fetched -> future resolved when their chunk lands (joins concurrent lookups)
+_inflight: Dict[str, asyncio.Future] = {}
+counters = {"ids_requested": 0, "ids_fetched": 0, "api_calls": 0, "api_errors": 0}
+
+
+async def close_video_metadata_client() -> None:
+    """Release pooled YouTube connections (called on app shutdown)"""
+    await http_client.aclose()
+
+
+def cached_metadata(video_id: str, with_stats: bool) -> Optional[Dict[str, Any]]:
+    """Merged metadata if every requested part is cached, else None"""
+    details = video_details.get(video_id)
+    if details is None:
+        return None
+    if not with_stats:
+        return {"video_id": video_id, **details}
+
+    stats = video_stats.get(video_id)
+    if stats is None:
+        return None
+    return {"video_id": video_id, **details, **stats}
+
+
+async def fetch_chunk(video_ids: List[str], api_key: str) -> None:
+    """One `videos` call for up to 50 IDs; fills both caches"""
+    params = {
+        "part": "snippet,contentDetails,statistics",
+        "id": ",".join(video_ids),
+        "key": api_key
+    }
+
+    counters["api_calls"] += 1
+    try:
+        response = await http_client.get(YOUTUBE_VIDEOS_URL, params=params)
+        response.raise_for_status()
+        items = response.json().get("items", [])
+
+        counters["ids_fetched"] += len(items)
+        for item in items:
+            snippet = item.get("snippet", {})
+            video_details.set(item["id"], {
+                "title": snippet.get("title", ""),
+                "description": snippet.get("description", ""),
+                "channel": snippet.get("channelTitle", ""),
+                "published_at": snippet.get("publishedAt"),
+                "duration_iso": item.get("contentDetails", {}).get("duration", "PT0S")
+            })
+            video_stats.set(item["id"], {
+                "views": int(item.get("statistics", {}).get("viewCount", 0))
+            })
+    except Exception as e:
+        counters["api_errors"] += 1
+        print(f"❌ YouTube videos lookup failed for {len(video_ids)} ID(s): {e}")
+    finally:
+        for video_id in video_ids:
+            future = _inflight.pop(video_id, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+async def get_video_metadata(
+    video_ids: Iterable[str],
+    api_key: Optional[str],
+    with_stats: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Metadata for each known video ID (unknown/deleted videos are omitted)
+    Cached IDs are answered locally; misses are fetched in chunks of 50 concurrently,
+    and IDs already being fetched by another request are awaited instead of refetched
+    """
+    ids = list(dict.fromkeys(vid for vid in video_ids if vid))
+    counters["ids_requested"] += len(ids)
+
+    results = {}
+    missing = []
+    waiting = []
+    for video_id in ids:
+        found = cached_metadata(video_id, with_stats)
+        if found is not None:
+            results[video_id] = found
+        elif video_id in _inflight:
+            waiting.append(_inflight[video_id])
+        else:
+            missing.append(video_id)
+
+    if missing and api_key:
+        loop = asyncio.get_running_loop()
+        for video_id in missing:
+            _inflight[video_id] = loop.create_future()
+
+        chunks = [missing[i:i + YOUTUBE_MAX_IDS_PER_CALL] for i in range(0, len(missing), YOUTUBE_MAX_IDS_PER_CALL)]
+        try:
+            await asyncio.gather(*(fetch_chunk(chunk, api_key) for chunk in chunks))
+        finally:
+            # Never leave waiters hanging if this request was cancelled mid-fetch
+            for video_id in missing:
+                future = _inflight.pop(video_id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    if waiting:
+        await asyncio.gather(*(asyncio.shield(future) for future in waiting))
+
+    for video_id in ids:
+        if video_id not in results:
+            found = cached_metadata(video_id, with_stats)
+            if found is not None:
+                results[video_id] = found
+
+    return results
+
+
+def stats() -> Dict[str, Any]:
+    """Cache and quota counters for monitoring"""
+    return {
+        **counters,
+        "details_cache": video_details.stats(),
+        "stats_cache": video_stats.stats()
+    }
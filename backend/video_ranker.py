@@ -0,0 +1,145 @@
+"""
+Video Ranker - Local re-ranking of YouTube results for educational relevance
+Scores each video on keyword overlap with the query (plus optimize_search_query keywords),
+views, duration fit for the search type, channel priors, educational title cues and
+YouTube's own order, as one feature matrix times a weight vector. Runs in microseconds,
+so the Groq ranking call is only needed for the opt-in quality mode.
+"""
+import re
+import math
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+# Feature weights (columns of the feature matrix, in this order)
+RANKER_FEATURES = [
+    "title_overlap", "description_overlap", "phrase_in_title", "popularity",
+    "duration_fit", "channel_prior", "educational_cue", "noise", "youtube_position"
+]
+RANKER_WEIGHTS = np.array([3.0, 1.0, 1.5, 0.8, 1.2, 1.0, 0.6, -2.0, 0.8])
+
+# Preferred duration window (seconds) per search_type from optimize_search_query
+DURATION_WINDOWS = {
+    "tutorial": (8 * 60, 45 * 60),
+    "lecture": (30 * 60, 120 * 60),
+    "course": (60 * 60, 12 * 3600),
+    "educational": (5 * 60, 60 * 60),
+    "general": (3 * 60, 30 * 60)
+}
+
+# Channels with a track record of solid teaching content (lowercase title -> prior in [0, 1])
+CHANNEL_PRIORS = {
+    "freecodecamp.org": 1.0, "mit opencourseware": 1.0, "khan academy": 1.0, "cs50": 1.0,
+    "3blue1brown": 1.0, "crashcourse": 0.9, "statquest with josh starmer": 0.9,
+    "corey schafer": 0.9, "traversy media": 0.8, "the organic chemistry tutor": 0.9,
+    "programming with mosh": 0.8, "fireship": 0.7, "abdul bari": 0.9, "neso academy": 0.8,
+    "stanford online": 1.0, "sentdex": 0.7, "net ninja": 0.8, "the net ninja": 0.8,
+    "tech with tim": 0.7, "simplilearn": 0.5, "edureka!": 0.5, "geeksforgeeks": 0.6
+}
+
+EDUCATIONAL_CUES = {"tutorial", "course", "lecture", "explained", "learn", "beginners", "beginner",
+                    "introduction", "intro", "guide", "lesson", "crash", "fundamentals", "basics"}
+NOISE_CUES = {"shorts", "reaction", "reacts", "meme", "memes", "prank", "funny", "compilation", "tiktok"}
+STOPWORDS = {"a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "how", "what",
+             "is", "are", "i", "me", "my", "want", "learn", "about", "video", "videos"}
+
+
+def terms(text: str) -> Set[str]:
+    """Lowercase word set with trailing plural 's' dropped"""
+    words = re.findall(r"[\w+#]+", (text or "").lower())
+    return {word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words}
+
+
+def query_terms(user_query: str, keywords: Optional[Iterable[str]] = None) -> Set[str]:
+    """Content terms of the query plus optimizer keywords"""
+    found = terms(user_query)
+    for keyword in keywords or []:
+        if isinstance(keyword, str):
+            found |= terms(keyword)
+    return found - STOPWORDS
+
+
+def feature_matrix(
+    videos: List[Dict[str, Any]],
+    user_query: str,
+    search_type: str = "educational",
+    keywords: Optional[Iterable[str]] = None
+) -> np.ndarray:
+    """(videos x RANKER_FEATURES) matrix, every column scaled to about [0, 1]"""
+    wanted = query_terms(user_query, keywords)
+    phrase = " ".join(re.findall(r"[\w+#]+", user_query.lower()))
+    count = len(videos)
+
+    overlap = np.zeros((count, 2))
+    cues = np.zeros((count, 3))
+    views = np.zeros(count)
+    durations = np.zeros(count)
+    channel = np.zeros(count)
+    for i, video in enumerate(videos):
+        title = video.get("title") or ""
+        title_terms = terms(title)
+        if wanted:
+            overlap[i, 0] = len(wanted & title_terms) / len(wanted)
+            overlap[i, 1] = len(wanted & terms(video.get("description"))) / len(wanted)
+        cues[i, 0] = bool(phrase) and phrase in title.lower()
+        cues[i, 1] = bool(title_terms & EDUCATIONAL_CUES)
+        cues[i, 2] = bool(title_terms & NOISE_CUES)
+        views[i] = video.get("views") or 0
+        durations[i] = video.get("duration") or 0
+        channel[i] = CHANNEL_PRIORS.get((video.get("channel") or "").strip().lower(), 0.0)
+
+    popularity = np.clip(np.log10(views + 1) / 7, 0, 1)  # 10M views ~ 1.0
+
+    # 1 inside the window, decaying with log-distance outside it; unknown duration is neutral
+    low, high = DURATION_WINDOWS.get(search_type, DURATION_WINDOWS["educational"])
+    safe = np.maximum(durations, 1)
+    distance = np.maximum(np.log(low / safe), 0) + np.maximum(np.log(safe / high), 0)
+    duration_fit = np.where(durations > 0, np.exp(-distance ** 2), 0.5)
+
+    position = 1 - np.arange(count) / max(count, 1)
+
+    return np.column_stack([
+        overlap[:, 0], overlap[:, 1], cues[:, 0], popularity,
+        duration_fit, channel, cues[:, 1], cues[:, 2], position
+    ])
+
+
+def rank_videos_locally(
+    videos: List[Dict[str, Any]],
+    user_query: str,
+    search_type: str = "educational",
+    keywords: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """Videos sorted by local relevance score (best first, ties keep YouTube order)"""
+    if len(videos) <= 1:
+        return list(videos)
+    scores = feature_matrix(videos, user_query, search_type, keywords) @ RANKER_WEIGHTS
+    order = np.argsort(-scores, kind="stable")
+    return [videos[i] for i in order]
+
+
+def ranking_agreement(order: List[int], reference: List[int], k: int = 3) -> Dict[str, float]:
+    """
+    How closely `order` matches `reference` (both lists of original indices, best first)
+    Kendall tau, top-1 match, and NDCG@k with reference position as graded relevance
+    """
+    n = len(reference)
+    position = {item: rank for rank, item in enumerate(order)}
+    concordant = discordant = 0
+    for a in range(n):
+        for b in range(a + 1, n):
+            if position[reference[a]] < position[reference[b]]:
+                concordant += 1
+            else:
+                discordant += 1
+    pairs = max(concordant + discordant, 1)
+
+    relevance = {item: n - rank for rank, item in enumerate(reference)}
+    dcg = sum(relevance[item] / math.log2(rank + 2) for rank, item in enumerate(order[:k]))
+    ideal = sum(relevance[item] / math.log2(rank + 2) for rank, item in enumerate(reference[:k]))
+
+    return {
+        "kendall_tau": (concordant - discordant) / pairs,
+        "top1": float(order[0] == reference[0]),
+        f"ndcg@{k}": dcg / ideal if ideal else 0.0
+    }
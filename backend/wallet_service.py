@@ -2,12 +2,23 @@
 Wallet Service - Manages user wallet balance and video session payments
 Integrates with existing session and payment infrastructure
 """
+import os
 import uuid
+import hashlib
 import random
+import asyncio
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from cache import TTLCache
 from database import supabase
+from ledger_writer import ledger_writer
 from payment_service import PaymentService
+from course_service import CourseService
+
+
+# Settlement dedupe: how long a settled session's result is replayed to repeat end requests
+SETTLEMENT_DEDUPE_TTL_SECONDS = int(os.getenv("SETTLEMENT_DEDUPE_TTL_SECONDS", "86400"))
+SETTLEMENT_CACHE_MAX_ENTRIES = int(os.getenv("SETTLEMENT_CACHE_MAX_ENTRIES", "10000"))
 
 
 def calculate_price_from_rating(rating: float) -> float:
@@ -31,6 +42,22 @@ def generate_random_rating() -> float:
 # This persists during server runtime but resets on restart
 TEST_USER_BALANCES: Dict[str, float] = {}
 
+# Settlement key -> end_session result (this process); settlement_idempotency is the shared tier
+settled_sessions = TTLCache(maxsize=SETTLEMENT_CACHE_MAX_ENTRIES, ttl=SETTLEMENT_DEDUPE_TTL_SECONDS)
+_settling: Dict[str, asyncio.Future] = {}
+
+
+def settlement_key(user_id: str, session_id: str) -> str:
+    """Dedupe key for one settlement: one per user and session, whatever Idempotency-Key is sent"""
+    return f"{user_id}:{session_id}"
+
+
+def check_idempotency_key(settled: Dict[str, Any], idempotency_key: Optional[str]) -> None:
+    """A client key only has to agree with the one the session was settled under (if both were sent)"""
+    recorded = settled.get("idempotency_key")
+    if idempotency_key and recorded and idempotency_key != recorded:
+        raise ValueError(f"Session {settled.get('session_id')} was already settled under a different Idempotency-Key")
+
 
 class WalletService:
     """Manages user wallet operations for video streaming payments"""
@@ -50,7 +77,7 @@ class WalletService:
     @staticmethod
     async def get_balance(user_id: str, auto_create_initial: bool = True) -> float:
         """
-        Calculate user's current wallet balance
+        Get user's current wallet balance (O(1) materialized read)
         Balance = Total deposits - Total charges + Total refunds
         NOTE: Locks are NOT counted as charges - they are temporary holds
               that get converted to charges when session ends
@@ -68,49 +95,39 @@ class WalletService:
             return balance
         
         try:
-            # Get all deposit transactions
-            deposits = supabase.table("payments")\
-                .select("amount")\
-                .eq("to_user_id", user_id)\
-                .eq("payment_type", "deposit")\
-                .execute()
-            
-            total_deposits = sum(p["amount"] for p in deposits.data) if deposits.data else 0
-            
-            # Get only actual charges (NOT locks - locks are temporary)
-            # Locks get "released" via refund when session ends
-            charges = supabase.table("payments")\
-                .select("amount")\
-                .eq("from_user_id", user_id)\
-                .eq("payment_type", "charge")\
-                .execute()
-            
-            total_charges = sum(p["amount"] for p in charges.data) if charges.data else 0
-            
-            # Get all refunds received
-            refunds = supabase.table("payments")\
-                .select("amount")\
-                .eq("to_user_id", user_id)\
-                .eq("payment_type", "refund")\
+            # Single-row read from the materialized balance (kept in sync by the
+            # payments insert trigger, see migrations/003_wallet_balances.sql)
+            result = await supabase.table("wallet_balances")\
+                .select("balance")\
+                .eq("user_id", user_id)\
+                .limit(1)\
                 .execute()
             
-            total_refunds = sum(p["amount"] for p in refunds.data) if refunds.data else 0
-            
-            # If user has NO transactions at all, create initial deposit
-            if total_deposits == 0 and total_charges == 0 and total_refunds == 0 and auto_create_initial:
-                print(f"📥 Creating initial deposit of ₹{WalletService.INITIAL_BALANCE} for new user: {user_id}")
-                await WalletService.create_initial_deposit(user_id)
-                return WalletService.INITIAL_BALANCE
-            
-            # Calculate final balance
-            # Balance = deposits - charges + refunds (locks are ignored)
-            balance = total_deposits - total_charges + total_refunds
+            # No row means the user has never had a deposit/charge/refund
+            if not result.data:
+                if auto_create_initial:
+                    print(f"📥 Creating initial deposit of ₹{WalletService.INITIAL_BALANCE} for new user: {user_id}")
+                    await WalletService.create_initial_deposit(user_id)
+                    return WalletService.INITIAL_BALANCE
+                return 0.0
             
-            return round(balance, 2)
+            return round(float(result.data[0]["balance"]), 2)
             
         except Exception as e:
             raise ValueError(f"Failed to calculate balance: {str(e)}")
     
+    @staticmethod
+    async def reconcile_balances(fix: bool = False) -> List[Dict[str, Any]]:
+        """
+        Compare materialized balances against the full payments ledger
+        Returns mismatched users; with fix=True the stored balances are rewritten
+        """
+        try:
+            result = await supabase.rpc("reconcile_wallet_balances", {"fix": fix}).execute()
+            return result.data or []
+        except Exception as e:
+            raise ValueError(f"Failed to reconcile balances: {str(e)}")
+    
     @staticmethod
     async def create_initial_deposit(user_id: str) -> None:
         """
@@ -133,7 +150,7 @@ class WalletService:
                 "completed_at": datetime.utcnow().isoformat()
             }
             
-            supabase.table("payments").insert(payment_data).execute()
+            await ledger_writer.write(payment_data)
             print(f"✅ Initial deposit created for user {user_id}: ₹{WalletService.INITIAL_BALANCE}")
         except Exception as e:
             print(f"⚠️ Failed to create initial deposit: {str(e)}")
@@ -148,7 +165,7 @@ class WalletService:
             raise ValueError("Deposit amount must be positive")
         
         # Verify user exists
-        user = supabase.table("users").select("id").eq("id", user_id).execute()
+        user = await supabase.table("users").select("id").eq("id", user_id).execute()
         if not user.data:
             raise ValueError(f"User {user_id} not found")
         
@@ -164,13 +181,13 @@ class WalletService:
             "completed_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table("payments").insert(payment_data).execute()
+        payment = await ledger_writer.write(payment_data)
         
         # Get updated balance
         new_balance = await WalletService.get_balance(user_id)
         
         return {
-            "payment_id": result.data[0]["id"],
+            "payment_id": payment["id"],
             "amount": amount,
             "gateway_tx_id": gateway_tx_id,
             "new_balance": new_balance,
@@ -198,7 +215,7 @@ class VideoSessionService:
         Assigns random rating if not yet rated
         """
         try:
-            course = supabase.table("courses")\
+            course = await supabase.table("courses")\
                 .select("id, title, rating, total_duration_minutes")\
                 .eq("id", course_id)\
                 .single()\
@@ -212,11 +229,14 @@ class VideoSessionService:
             # Assign random rating if not yet rated (first access)
             if course_data.get("rating") is None:
                 new_rating = generate_random_rating()
-                supabase.table("courses")\
+                await supabase.table("courses")\
                     .update({"rating": new_rating})\
                     .eq("id", course_id)\
                     .execute()
                 course_data["rating"] = new_rating
+                
+                # Rating changed - drop stale catalog payloads for this course
+                CourseService.invalidate_course(course_id)
             
             rating = float(course_data["rating"])
             price_per_minute = calculate_price_from_rating(rating)
@@ -283,7 +303,7 @@ class VideoSessionService:
                 "completed_at": datetime.utcnow().isoformat()
             }
             
-            supabase.table("payments").insert(lock_payment).execute()
+            await ledger_writer.write(lock_payment)
         else:
             print(f"Skipping lock payment insert for non-UUID user: {user_id}")
         
@@ -301,7 +321,7 @@ class VideoSessionService:
             
             # Try to insert into sessions table (if schema allows)
             try:
-                supabase.table("sessions").insert(session_record).execute()
+                await supabase.table("sessions").insert(session_record).execute()
             except:
                 pass  # Session table might have different schema
         else:
@@ -322,13 +342,69 @@ class VideoSessionService:
         session_id: Optional[str] = None,
         duration_seconds: int = 0,
         price_per_minute: float = 2.0,
-        locked_amount: float = 30.0
+        locked_amount: float = 30.0,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        End video session and process payment
+        End video session and process payment, at most once per session
         Frontend sends: duration watched, price rate, locked amount
         Backend calculates: final charge, refund
+        Repeats (beacon + /session/end, socket close, retries) get the first result back with "replayed": True
+        An Idempotency-Key never picks the settlement; a repeat sending a different one is rejected
         """
+        is_valid_user = WalletService.is_valid_uuid(user_id)
+        
+        # No session id: settle the user's open session instead of inventing a new one
+        if not session_id and is_valid_user:
+            active = await VideoSessionService.get_active_session(user_id)
+            if active:
+                session_id = active["session_id"]
+        if not session_id:
+            # Nothing open either: retries with the same client key still land on one "vs_" id
+            suffix = hashlib.sha256(idempotency_key.encode()).hexdigest() if idempotency_key else uuid.uuid4().hex
+            session_id = f"vs_{suffix[:16]}"
+        
+        key = settlement_key(user_id, session_id)
+        
+        # Fast path: settled (or being settled) by this process
+        cached = settled_sessions.get(key)
+        if cached is not None:
+            check_idempotency_key(cached, idempotency_key)
+            print(f"♻️ Replaying settlement {key}")
+            return {**cached, "replayed": True}
+        if key in _settling:
+            result = await asyncio.shield(_settling[key])
+            check_idempotency_key(result, idempotency_key)
+            return {**result, "replayed": True}
+        
+        future = asyncio.get_running_loop().create_future()
+        _settling[key] = future
+        try:
+            result = await VideoSessionService._settle(
+                user_id, session_id, duration_seconds, price_per_minute, locked_amount, key, idempotency_key
+            )
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; nobody has to
+            raise
+        finally:
+            _settling.pop(key, None)
+        
+        settled_sessions.set(key, {**result, "replayed": False})
+        future.set_result({**result, "replayed": False})
+        return result
+    
+    @staticmethod
+    async def _settle(
+        user_id: str,
+        session_id: str,
+        duration_seconds: int,
+        price_per_minute: float,
+        locked_amount: float,
+        key: str,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Charge and refund one session; the DB path settles once per key (migrations/010)"""
         end_time = datetime.utcnow()
         
         # Calculate charge amount based on actual watch time
@@ -343,12 +419,8 @@ class VideoSessionService:
         final_charge = max(0, final_charge)
         refund_amount = max(0, refund_amount)
         
-        # Generate session_id if not provided
-        if not session_id:
-            session_id = f"vs_{uuid.uuid4().hex[:16]}"
-        
-        # Check if user has valid UUID
         is_valid_user = WalletService.is_valid_uuid(user_id)
+        replayed = False
         
         # For TEST USERS: Deduct from in-memory balance
         if not is_valid_user:
@@ -359,57 +431,56 @@ class VideoSessionService:
             TEST_USER_BALANCES[user_id] = round(old_balance - final_charge, 2)
             print(f"🧪 TEST USER CHARGE: {user_id} charged ₹{final_charge} | Balance: ₹{old_balance} → ₹{TEST_USER_BALANCES[user_id]}")
         
-        # Record charge payment (only for valid UUID users in DB)
-        if final_charge > 0 and is_valid_user:
-            charge_tx_id = PaymentService.generate_tx_id("charge")
-            
-            charge_payment = {
-                "session_id": session_id,
-                "payment_type": "charge",
-                "amount": final_charge,
-                "from_user_id": user_id,
-                "gateway_tx_id": charge_tx_id,
-                "gateway_status": "completed",
-                "completed_at": end_time.isoformat()
-            }
-            
-            supabase.table("payments").insert(charge_payment).execute()
-            print(f"💳 DB CHARGE: {user_id} charged ₹{final_charge}")
-        
-        # Record refund (release remaining locked amount)
-        if refund_amount > 0 and is_valid_user:
-            refund_tx_id = PaymentService.generate_tx_id("refund")
-            
-            refund_payment = {
-                "session_id": session_id,
-                "payment_type": "refund",
-                "amount": refund_amount,
-                "to_user_id": user_id,
-                "gateway_tx_id": refund_tx_id,
-                "gateway_status": "completed",
-                "completed_at": end_time.isoformat()
-            }
-            
-            supabase.table("payments").insert(refund_payment).execute()
-        
-        # Update session record in database (only for valid UUID users)
+        # For DB USERS: settle in one transaction (see migrations/009_atomic_session_settlement.sql)
+        # Ledger rows, session update, teacher earnings, activity rollup and the new balance;
+        # a key settled before (any worker) returns its stored result without touching payments
         if is_valid_user:
             try:
-                supabase.table("sessions")\
-                    .update({
-                        "status": "completed",
-                        "end_time": end_time.isoformat(),
-                        "duration_seconds": duration_seconds,
-                        "final_cost": final_charge,
-                        "amount_refunded": refund_amount
-                    })\
-                    .eq("id", session_id)\
-                    .execute()
-            except:
-                pass  # Session might not exist in DB
-        
-        # Calculate final balance
-        final_balance = await WalletService.get_balance(user_id)
+                settled = await supabase.rpc("settle_session_once", {
+                    "p_idempotency_key": key,
+                    "p_ttl_seconds": SETTLEMENT_DEDUPE_TTL_SECONDS,
+                    "p_session_id": session_id,
+                    "p_student_id": user_id,
+                    "p_duration_seconds": duration_seconds,
+                    "p_price_per_minute": price_per_minute,
+                    "p_locked_amount": locked_amount,
+                    "p_charge_tx_id": PaymentService.generate_tx_id("charge"),
+                    "p_refund_tx_id": PaymentService.generate_tx_id("refund"),
+                    "p_client_key": idempotency_key
+                }).execute()
+            except Exception as e:
+                raise ValueError(f"Failed to settle session: {str(e)}")
+            
+            settlement = settled.data
+            final_charge = round(float(settlement["amount_charged"]), 2)
+            refund_amount = round(float(settlement["refund"]), 2)
+            if settlement.get("ended_at"):
+                end_time = settlement["ended_at"]
+            # The database settles at the session's own price and lock, not the request's
+            if settlement.get("price_per_minute") is not None:
+                price_per_minute = float(settlement["price_per_minute"])
+            if settlement.get("locked_amount") is not None:
+                locked_amount = float(settlement["locked_amount"])
+            replayed = bool(settlement.get("replayed"))
+            idempotency_key = settlement.get("idempotency_key") or idempotency_key
+            if replayed:
+                # Report the settlement that was recorded, not this request's numbers
+                session_id = settlement.get("session_id") or session_id
+                duration_seconds = int(settlement.get("duration_seconds", duration_seconds))
+                duration_minutes = duration_seconds / 60
+                print(f"♻️ Settlement {key} already recorded, replaying it")
+            elif settlement.get("already_settled"):
+                print(f"♻️ Session {session_id} was already settled, nothing charged again")
+            else:
+                print(f"💳 DB CHARGE: {user_id} charged ₹{final_charge}")
+            
+            # NULL balance = no wallet row yet; get_balance creates the initial deposit
+            if settlement.get("final_balance") is not None:
+                final_balance = round(float(settlement["final_balance"]), 2)
+            else:
+                final_balance = await WalletService.get_balance(user_id)
+        else:
+            final_balance = await WalletService.get_balance(user_id)
         
         return {
             "session_id": session_id,
@@ -420,14 +491,25 @@ class VideoSessionService:
             "amount_locked": locked_amount,
             "refund": refund_amount,
             "final_balance": final_balance,
-            "ended_at": end_time.isoformat()
+            "ended_at": end_time if isinstance(end_time, str) else end_time.isoformat(),
+            "idempotency_key": idempotency_key,
+            "replayed": replayed
         }
     
+    @staticmethod
+    async def purge_settlement_keys() -> int:
+        """Drop stored settlement results past their TTL (the claims stay); returns how many"""
+        try:
+            result = await supabase.rpc("purge_settlement_idempotency", {}).execute()
+            return result.data or 0
+        except Exception as e:
+            raise ValueError(f"Failed to purge settlement keys: {str(e)}")
+    
     @staticmethod
     async def get_active_session(user_id: str) -> Optional[Dict[str, Any]]:
         """Get user's active session from database if exists"""
         try:
-            result = supabase.table("sessions")\
+            result = await supabase.table("sessions")\
                 .select("*")\
                 .eq("student_id", user_id)\
                 .eq("status", "active")\
@@ -5,6 +5,7 @@ This utility can fetch real video data when YouTube API key is configured
 import os
 from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
+from video_metadata import get_video_metadata
 
 load_dotenv()
 
@@ -49,10 +50,11 @@ def parse_iso8601_duration(duration: str) -> int:
     return int(total_minutes)
 
 
-def fetch_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
+async def fetch_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
     """
     Fetch video metadata from YouTube Data API v3
     Requires YOUTUBE_API_KEY in environment variables
+    Reads through the shared video metadata store (no API call if already cached)
     
     Returns:
         {
@@ -67,41 +69,25 @@ def fetch_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        import requests
-        
         video_id = extract_video_id(video_url)
         
-        # YouTube Data API endpoint
-        api_url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet,contentDetails",
-            "id": video_id,
-            "key": YOUTUBE_API_KEY
-        }
-        
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
+        metadata = await get_video_metadata([video_id], YOUTUBE_API_KEY, with_stats=False)
+        video = metadata.get(video_id)
         
-        data = response.json()
-        
-        if not data.get("items"):
+        if not video:
             print(f"❌ No video found for ID: {video_id}")
             return None
         
-        video = data["items"][0]
-        snippet = video["snippet"]
-        content_details = video["contentDetails"]
-        
         # Parse duration
-        duration_minutes = parse_iso8601_duration(content_details["duration"])
+        duration_minutes = parse_iso8601_duration(video["duration_iso"])
         
         # Extract chapters from description (if video has chapters)
-        chapters = extract_chapters_from_description(snippet["description"])
+        chapters = extract_chapters_from_description(video["description"])
         
         return {
             "video_id": video_id,
-            "title": snippet["title"],
-            "description": snippet["description"],
+            "title": video["title"],
+            "description": video["description"],
             "duration_minutes": duration_minutes,
             "chapters": chapters
         }
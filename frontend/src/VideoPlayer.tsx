@@ -2,6 +2,7 @@
 import React, { useEffect, useRef, useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { ArrowLeft, Play, Search, Loader } from 'lucide-react';
+import { getBrowserTimezone } from './services/sessionAPI';
 
 interface YouTubeVideo {
   id: string;
@@ -116,7 +117,7 @@ const VideoPlayer = () => {
       const res = await fetch(`${BACKEND_URL}/session/start`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id: userId }),
+        body: JSON.stringify({ user_id: userId, timezone: getBrowserTimezone() }),
       });
 
       if (res.ok) {
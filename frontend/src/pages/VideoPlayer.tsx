@@ -2,6 +2,7 @@ import React, { useEffect, useRef, useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { ArrowLeft, Play, Search, Loader, MessageCircle, Send, Share2, X, CheckCircle, Wallet } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
+import { getBrowserTimezone } from '../services/sessionAPI';
 
 interface YouTubeVideo {
   id: string;
@@ -405,7 +406,8 @@ const VideoPlayer = () => {
               video_id: selectedVideo?.id,
               course_id: courseIdParam || null,
               lock_amount: lockAmount,
-              price_per_minute: pricePerMinute
+              price_per_minute: pricePerMinute,
+              timezone: getBrowserTimezone()
             }),
           });
 
@@ -9,6 +9,7 @@ export interface SessionCreateRequest {
   course_id: string;
   student_id: string;
   locked_amount: number;
+  timezone?: string;
 }
 
 export interface SessionCreateResponse {
@@ -63,6 +64,18 @@ const getAuthToken = (): string | null => {
   }
 };
 
+/**
+ * Browser IANA timezone (e.g. "Asia/Kolkata"), sent on session start so the backend
+ * counts streak days and daily activity on the student's calendar
+ */
+export const getBrowserTimezone = (): string | undefined => {
+  try {
+    return Intl.DateTimeFormat().resolvedOptions().timeZone || undefined;
+  } catch {
+    return undefined;
+  }
+};
+
 /**
  * Create a new session with locked payment
  */
@@ -83,6 +96,7 @@ export const createSession = async (
       course_id: courseId,
       student_id: studentId,
       locked_amount: lockedAmount,
+      timezone: getBrowserTimezone(),
     }),
   });
 